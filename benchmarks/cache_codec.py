@@ -0,0 +1,123 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+Compares the DataLoader cache codecs with the plain pickle format used before,
+on synthetic transcript batches shaped like the ones in the transcript
+collection (spliced exons, xrefs, nested slices).
+
+Run from the repository root:
+    python -m benchmarks.cache_codec [--transcripts 50 500 5000] [--repeat 5]
+"""
+
+import argparse
+import pickle
+import timeit
+
+from bson import ObjectId
+
+from common.cache_codec import ResultCodec
+
+
+def make_transcript(index):
+    def location(start, length):
+        return {
+            "start": start,
+            "end": start + length,
+            "length": length,
+        }
+
+    def region_slice(start, length):
+        return {
+            "region_id": "homo_sapiens_GCA_000001405_28_13",
+            "location": location(start, length),
+            "strand": {"code": "forward", "value": 1},
+            "default": True,
+        }
+
+    start = index * 1000
+    return {
+        "_id": ObjectId(),
+        "type": "Transcript",
+        "genome_id": "homo_sapiens_GCA_000001405_28",
+        "stable_id": f"ENST{index:011d}.1",
+        "unversioned_stable_id": f"ENST{index:011d}",
+        "gene_foreign_key": f"homo_sapiens_GCA_000001405_28_ENSG{index // 5:011d}.1",
+        "biotype": "protein_coding",
+        "slice": region_slice(start, 900),
+        "spliced_exons": [
+            {
+                "index": exon,
+                "relative_location": location(exon * 150, 100),
+                "exon": {
+                    "stable_id": f"ENSE{index * 10 + exon:011d}.1",
+                    "slice": region_slice(start + exon * 150, 100),
+                },
+            }
+            for exon in range(6)
+        ],
+        "external_references": [
+            {
+                "accession_id": f"XREF{index}_{xref}",
+                "name": f"Cross reference {xref}",
+                "description": "A synthetic cross reference",
+                "source": {"id": "RefSeq_mRNA", "name": "RefSeq mRNA"},
+            }
+            for xref in range(8)
+        ],
+    }
+
+
+def measure(encode, decode, docs, repeat):
+    encoded = encode(docs)
+    encode_seconds = min(timeit.repeat(lambda: encode(docs), number=1, repeat=repeat))
+    decode_seconds = min(
+        timeit.repeat(lambda: decode(encoded), number=1, repeat=repeat)
+    )
+    return len(encoded), encode_seconds, decode_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[-2])
+    parser.add_argument("--transcripts", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    codecs = {
+        "pickle (current)": (pickle.dumps, pickle.loads),
+    }
+    for serialization in ("bson", "pickle"):
+        for compression in ("none", "zlib"):
+            codec = ResultCodec(
+                serialization=serialization,
+                compression=compression,
+                max_bytes=1024**3,
+            )
+            codecs[f"{serialization}+{compression}"] = (codec.encode, codec.decode)
+
+    print(
+        f"{'transcripts':>11}  {'codec':<18}{'bytes':>12}{'encode ms':>11}{'decode ms':>11}"
+    )
+    for count in args.transcripts:
+        docs = [make_transcript(index) for index in range(count)]
+        for name, (encode, decode) in codecs.items():
+            size, encode_seconds, decode_seconds = measure(
+                encode, decode, docs, args.repeat
+            )
+            print(
+                f"{count:>11}  {name:<18}{size:>12}"
+                f"{encode_seconds * 1000:>11.2f}{decode_seconds * 1000:>11.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
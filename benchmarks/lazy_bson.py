@@ -0,0 +1,86 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+Compares eager (dict) and lazy (LazyDocument) decoding of the transcripts of
+a gene with hundreds of isoforms, as returned to gene -> transcripts. The
+resolvers only read a few fields: the stable id plus what the transcript
+ordering needs, as in `{ gene { transcripts { stable_id } } }`. The ordering
+either reads a precomputed display_rank or scores every transcript from its
+metadata, CDS and exon lengths.
+
+Run from the repository root:
+    python -m benchmarks.lazy_bson [--transcripts 100 500 2000] [--repeat 5]
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import bson
+from bson.codec_options import DEFAULT_CODEC_OPTIONS
+
+from benchmarks.cache_codec import make_transcript
+from common.lazy_bson import LAZY_CODEC_OPTIONS
+from graphql_service.resolver.transcript_order import sort_gene_transcripts
+
+
+def resolve(batch, codec_options):
+    "Decode a cursor batch and resolve `transcripts { stable_id }` on it"
+    transcripts = bson.decode_all(batch, codec_options)
+    return [
+        transcript["stable_id"] for transcript in sort_gene_transcripts(transcripts)
+    ]
+
+
+def measure(batch, codec_options, repeat):
+    cpu_seconds = []
+    for _ in range(repeat):
+        start = time.process_time()
+        resolve(batch, codec_options)
+        cpu_seconds.append(time.process_time() - start)
+
+    tracemalloc.start()
+    resolve(batch, codec_options)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(cpu_seconds), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[-2])
+    parser.add_argument("--transcripts", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    modes = {"dict": DEFAULT_CODEC_OPTIONS, "lazy": LAZY_CODEC_OPTIONS}
+    print(
+        f"{'transcripts':>11}  {'ordering':<14}{'decoding':<10}"
+        f"{'cpu ms':>10}{'peak KiB':>12}"
+    )
+    for count in args.transcripts:
+        for ordering in ("display_rank", "scored"):
+            transcripts = [make_transcript(index) for index in range(count)]
+            if ordering == "display_rank":
+                for rank, transcript in enumerate(transcripts):
+                    transcript["display_rank"] = rank
+            batch = b"".join(bson.encode(transcript) for transcript in transcripts)
+            for name, codec_options in modes.items():
+                cpu_seconds, peak = measure(batch, codec_options, args.repeat)
+                print(
+                    f"{count:>11}  {ordering:<14}{name:<10}"
+                    f"{cpu_seconds * 1000:>10.2f}{peak / 1024:>12.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+Backfills the overlap bins of a release database, see common.binning:
+    python -m common.backfill_bins release_111_1
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+
+from dotenv import load_dotenv
+
+from common.binning import backfill_release
+from common.db import MongoDbClient
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Backfill the overlap bins of a release database"
+    )
+    parser.add_argument("database", help="Release database, e.g. release_111_1")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv("connections.conf")
+    mongo_client = MongoDbClient(os.environ)
+    try:
+        await backfill_release(
+            mongo_client.async_mongo_client[args.database], args.batch_size
+        )
+    finally:
+        await mongo_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,176 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+Hierarchical binning of features (the UCSC/tabix scheme) so that overlap
+queries can use an index.
+
+`slice.location.start <= end and slice.location.end >= start` is a two-sided
+range that no B-tree index serves well: either bound alone matches half a
+chromosome. Instead every feature is stored in the smallest bin that contains
+it, bins being 128kb at the deepest level and 8 times larger at each level
+above. The features overlapping a window can only be in the bins overlapping
+it, a handful of contiguous ranges (one per level), so the index scan depends
+on the features near the window rather than on the size of the chromosome.
+
+The bins are backfilled offline, and the index created last, with the usual
+connections.conf:
+    python -m common.backfill_bins release_111_1
+overlap_region only uses the bins of the release databases having the index.
+
+Once a release has been backfilled, the SliceInput filters (biotypes, strand,
+length, canonical_only) need no index of their own: MongoDB evaluates them on
+the few features the bin index scan finds, so the features filtered out are
+neither returned nor counted against the overlap_region limit. Until then
+overlap_region falls back to the unbinned range query and the filters are
+evaluated on every feature of the region it scans.
+"""
+
+import logging
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+from pymongo import ASCENDING
+
+logger = logging.getLogger(__name__)
+
+BIN_FIELD = "slice.location.bin"
+BIN_INDEX_NAME = "overlap_bin"
+BINNED_COLLECTIONS = ("gene", "transcript")
+
+# 128kb bins at the deepest level, 6 levels cover 4Gb regions
+FIRST_SHIFT = 17
+NEXT_SHIFT = 3
+LEVELS = 6
+
+
+def level_offset(level: int) -> int:
+    "Number of bins above `level`, level 0 being the single top bin"
+    return ((1 << (NEXT_SHIFT * level)) - 1) // 7
+
+
+def level_shift(level: int) -> int:
+    return FIRST_SHIFT + NEXT_SHIFT * (LEVELS - 1 - level)
+
+
+def bin_for_feature(start: int, end: int) -> int:
+    """
+    Smallest bin containing the 1-based, inclusive [start, end] feature.
+    Features with end < start (across the origin of a circular region)
+    go to the top bin, which every query reads
+    """
+    if end < start:
+        return 0
+    first, last = start - 1, end - 1
+    for level in range(LEVELS - 1, 0, -1):
+        shift = level_shift(level)
+        if first >> shift == last >> shift:
+            return level_offset(level) + (first >> shift)
+    return 0
+
+
+def overlapping_bin_ranges(start: int, end: int) -> List[Tuple[int, int]]:
+    "Inclusive ranges of the bins a 1-based, inclusive [start, end] window overlaps"
+    first, last = max(start, 1) - 1, max(end, 1) - 1
+    return [
+        (
+            level_offset(level) + (first >> level_shift(level)),
+            level_offset(level) + (last >> level_shift(level)),
+        )
+        for level in range(LEVELS)
+    ]
+
+
+def bin_query(start: int, end: int) -> Dict[str, Any]:
+    "Filter on the bin field matching the features that may overlap a window"
+    return {
+        "$or": [
+            (
+                {BIN_FIELD: low}
+                if low == high
+                else {BIN_FIELD: {"$gte": low, "$lte": high}}
+            )
+            for low, high in overlapping_bin_ranges(start, end)
+        ]
+    }
+
+
+async def has_bin_index(database) -> bool:
+    "Whether every binned collection of a release database has been backfilled"
+    for collection in BINNED_COLLECTIONS:
+        indexes = await database[collection].index_information()
+        if BIN_INDEX_NAME not in indexes:
+            return False
+    return True
+
+
+async def write_bins(collection, ids_by_bin: Dict[int, List]) -> int:
+    "One update per bin, a batch of features has few distinct bins"
+    updated = 0
+    for feature_bin, ids in ids_by_bin.items():
+        result = await collection.update_many(
+            {"_id": {"$in": ids}}, {"$set": {BIN_FIELD: feature_bin}}
+        )
+        updated += result.modified_count
+    return updated
+
+
+async def backfill_collection(collection, batch_size: int = 1000) -> int:
+    "Set the bin of every feature of a collection, returns the number updated"
+    updated = 0
+    pending = 0
+    ids_by_bin: Dict[int, List] = defaultdict(list)
+    cursor = collection.find(
+        {"slice.location.start": {"$exists": True}},
+        {"slice.location.start": 1, "slice.location.end": 1, BIN_FIELD: 1},
+        batch_size=batch_size,
+    )
+    async for document in cursor:
+        location = document["slice"]["location"]
+        feature_bin = bin_for_feature(location["start"], location["end"])
+        if location.get("bin") == feature_bin:
+            continue
+        ids_by_bin[feature_bin].append(document["_id"])
+        pending += 1
+        if pending >= batch_size:
+            updated += await write_bins(collection, ids_by_bin)
+            ids_by_bin.clear()
+            pending = 0
+    updated += await write_bins(collection, ids_by_bin)
+    return updated
+
+
+async def backfill_release(database, batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Backfill the bins of a release database, then create the index that
+    switches overlap_region over to them. Safe to run again
+    """
+    updated = {}
+    for collection_name in BINNED_COLLECTIONS:
+        collection = database[collection_name]
+        updated[collection_name] = await backfill_collection(collection, batch_size)
+        await collection.create_index(
+            [
+                ("genome_id", ASCENDING),
+                ("slice.region_id", ASCENDING),
+                (BIN_FIELD, ASCENDING),
+                ("type", ASCENDING),
+            ],
+            name=BIN_INDEX_NAME,
+        )
+        logger.info(
+            "Binned %d features of %s.%s",
+            updated[collection_name],
+            database.name,
+            collection_name,
+        )
+    return updated
@@ -0,0 +1,126 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import logging
+import pickle
+import struct
+import zlib
+from typing import Dict, List, Optional
+
+import bson
+
+logger = logging.getLogger(__name__)
+
+# Every cache entry starts with MAGIC, the format version, the serialisation
+# format and the compression. Entries written by another version (or the old
+# headerless pickles) are treated as cache misses
+MAGIC = b"TC"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("!2sBBB")
+
+SERIALIZATIONS = {"bson": 1, "pickle": 2}
+COMPRESSIONS = {"none": 0, "zlib": 1}
+
+
+class ResultCodec:
+    """
+    Encodes lists of MongoDB documents for the DataLoader Redis cache.
+
+    BSON is the default as it is what the documents came from: it is compact,
+    round-trips ObjectIds and needs no extra dependency. Pickle is kept for
+    comparison only. Payloads over `compress_min_bytes` are zlib compressed
+    and results that still exceed `max_bytes` are not cached at all
+    """
+
+    def __init__(
+        self,
+        serialization: str = "bson",
+        compression: str = "zlib",
+        compress_min_bytes: int = 1024,
+        compression_level: int = 1,
+        max_bytes: int = 8 * 1024 * 1024,
+    ):
+        if serialization not in SERIALIZATIONS:
+            raise ValueError(f"Unknown cache serialization: {serialization}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown cache compression: {compression}")
+        self.serialization = serialization
+        self.compression = compression
+        self.compress_min_bytes = compress_min_bytes
+        self.compression_level = compression_level
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_config(cls, config) -> "ResultCodec":
+        return cls(
+            serialization=config.get("CACHE_SERIALIZATION", "bson"),
+            compression=config.get("CACHE_COMPRESSION", "zlib"),
+            max_bytes=int(config.get("CACHE_MAX_ENTRY_BYTES", 8 * 1024 * 1024)),
+        )
+
+    def encode(self, docs: List[Dict]) -> Optional[bytes]:
+        "Returns None if the encoded result is over the size cap"
+        if self.serialization == "bson":
+            # A BSON document must be a mapping at the top level
+            body = bson.encode({"docs": docs})
+        else:
+            body = pickle.dumps(docs, protocol=pickle.HIGHEST_PROTOCOL)
+
+        compression = "none"
+        if self.compression == "zlib" and len(body) >= self.compress_min_bytes:
+            body = zlib.compress(body, self.compression_level)
+            compression = "zlib"
+
+        if len(body) + HEADER.size > self.max_bytes:
+            logger.debug(
+                "Result of %d bytes is over the cache size cap, not caching",
+                len(body),
+            )
+            return None
+
+        header = HEADER.pack(
+            MAGIC,
+            FORMAT_VERSION,
+            SERIALIZATIONS[self.serialization],
+            COMPRESSIONS[compression],
+        )
+        return header + body
+
+    def decode(self, data: bytes) -> Optional[List[Dict]]:
+        """
+        Returns None for entries this codec cannot read, including entries
+        serialised other than as configured: a pickle is never loaded unless
+        this codec writes pickles itself
+        """
+        if len(data) < HEADER.size:
+            return None
+        magic, version, serialization, compression = HEADER.unpack_from(data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            return None
+        if serialization != SERIALIZATIONS[self.serialization]:
+            return None
+
+        body = data[HEADER.size :]
+        try:
+            if compression == COMPRESSIONS["zlib"]:
+                body = zlib.decompress(body)
+            elif compression != COMPRESSIONS["none"]:
+                return None
+
+            if self.serialization == "bson":
+                return bson.decode(body)["docs"]
+            return pickle.loads(body)
+        except (zlib.error, bson.errors.InvalidBSON, KeyError) as exc:
+            logger.debug("Unreadable cache entry: %s", exc)
+            return None
@@ -0,0 +1,276 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+Redis layout of the DataLoader query cache, and the admin operations on it.
+
+Every entry lives under a per-release namespace:
+    thoas:dl:v1:<release db>:<collection>:<sha256 of the canonical query>
+and the canonical query of each entry is recorded in the
+    thoas:dl:v1:<release db>:queries
+hash, so that a release can be pre-warmed by replaying them. Entries are
+cached per key, so the hash holds at most QUERY_INDEX_MAX_FIELDS queries:
+once it is full, the queries whose entry has expired are pruned (by one
+worker every QUERY_INDEX_PRUNE_INTERVAL seconds) and new queries are only
+recorded as room is made.
+
+As keys are scoped by release database, a release is cut over atomically by
+its routing: pre-warm the new release (optionally from the queries seen on
+the current one), publish it, then drop the old namespace. From the command
+line, with the usual connections.conf:
+    python -m common.dataloader_cache prewarm release_111_1 --from release_110_1
+    python -m common.dataloader_cache drop release_110_1
+"""
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import json_util
+from dotenv import load_dotenv
+
+from common.db import MongoDbClient
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "thoas:dl:v1"
+QUERY_INDEX_SUFFIX = "queries"
+QUERY_INDEX_MAX_FIELDS = 100000
+QUERY_INDEX_PRUNE_INTERVAL = 600
+
+
+def release_key_prefix(database_name: str) -> str:
+    return f"{KEY_PREFIX}:{database_name}:"
+
+
+def query_index_key(database_name: str) -> str:
+    return release_key_prefix(database_name) + QUERY_INDEX_SUFFIX
+
+
+def canonical_query(
+    query: Dict[str, Any], projection: Optional[Dict[str, int]] = None
+) -> str:
+    """
+    The same query always gives the same string, whatever its key order.
+    Projected queries are wrapped with their projection. Values such as
+    ObjectIds are written in extended JSON so that they can be replayed
+    """
+    if projection is not None:
+        query = {"$query": query, "$projection": sorted(projection)}
+    return json_util.dumps(query, sort_keys=True, separators=(",", ":"))
+
+
+def parse_canonical_query(canonical: str) -> Tuple[Dict, Optional[Dict[str, int]]]:
+    "The (filter, projection) of a canonical query"
+    query = json_util.loads(canonical)
+    if "$query" in query:
+        return query["$query"], {path: 1 for path in query["$projection"]}
+    return query, None
+
+
+def query_field(collection: str, canonical: str) -> str:
+    digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return f"{collection}:{digest}"
+
+
+def cache_key(database_name: str, collection: str, canonical: str) -> str:
+    return release_key_prefix(database_name) + query_field(collection, canonical)
+
+
+async def store_result(
+    cache,
+    database_name: str,
+    collection: str,
+    canonical: str,
+    data: bytes,
+    expiry: int,
+) -> None:
+    "Store an encoded result and record its query in the release index"
+    await store_results(cache, database_name, collection, [(canonical, data)], expiry)
+
+
+async def store_results(
+    cache,
+    database_name: str,
+    collection: str,
+    entries: List[Tuple[str, bytes]],
+    expiry: int,
+) -> None:
+    """
+    Store (canonical query, encoded result) pairs, and record their queries
+    in the release index while it has room
+    """
+    prefix = release_key_prefix(database_name)
+    index_key = query_index_key(database_name)
+    pipeline = cache.pipeline(transaction=False)
+    for canonical, data in entries:
+        pipeline.set(prefix + query_field(collection, canonical), data, ex=expiry)
+    pipeline.hlen(index_key)
+    *_, recorded = await pipeline.execute()
+
+    if recorded + len(entries) > QUERY_INDEX_MAX_FIELDS:
+        recorded -= await prune_query_index(cache, database_name)
+    room = QUERY_INDEX_MAX_FIELDS - recorded
+    if room <= 0:
+        return
+
+    pipeline = cache.pipeline(transaction=False)
+    for canonical, _ in entries[:room]:
+        pipeline.hset(index_key, query_field(collection, canonical), canonical)
+    pipeline.expire(index_key, expiry)
+    await pipeline.execute()
+
+
+async def prune_query_index(cache, database_name: str, batch_size: int = 1000) -> int:
+    """
+    Remove the recorded queries whose cache entry has expired, returns how
+    many. Only one caller prunes a release per QUERY_INDEX_PRUNE_INTERVAL,
+    the others return 0 straight away
+    """
+    index_key = query_index_key(database_name)
+    if not await cache.set(
+        f"{index_key}:pruned", 1, nx=True, ex=QUERY_INDEX_PRUNE_INTERVAL
+    ):
+        return 0
+
+    prefix = release_key_prefix(database_name)
+    pruned = 0
+    fields: List = []
+
+    async def prune(fields) -> int:
+        pipeline = cache.pipeline(transaction=False)
+        for field in fields:
+            name = field.decode("utf-8") if isinstance(field, bytes) else field
+            pipeline.exists(prefix + name)
+        expired = [
+            field
+            for field, exists in zip(fields, await pipeline.execute())
+            if not exists
+        ]
+        return await cache.hdel(index_key, *expired) if expired else 0
+
+    async for field, _ in cache.hscan_iter(index_key, count=batch_size):
+        fields.append(field)
+        if len(fields) >= batch_size:
+            pruned += await prune(fields)
+            fields = []
+    if fields:
+        pruned += await prune(fields)
+
+    logger.info("Pruned %d expired queries of %s", pruned, database_name)
+    return pruned
+
+
+async def drop_release(cache, database_name: str, batch_size: int = 1000) -> int:
+    "Remove every cached entry of a release database, returns the number of keys"
+    dropped = 0
+    keys = []
+    async for key in cache.scan_iter(
+        match=release_key_prefix(database_name) + "*", count=batch_size
+    ):
+        keys.append(key)
+        if len(keys) >= batch_size:
+            dropped += await cache.unlink(*keys)
+            keys = []
+    if keys:
+        dropped += await cache.unlink(*keys)
+
+    logger.info("Dropped %d cache keys of %s", dropped, database_name)
+    return dropped
+
+
+async def prewarm_release(
+    mongo_client,
+    database_name: str,
+    source_database_name: Optional[str] = None,
+    concurrency: int = 8,
+) -> int:
+    """
+    Run the queries recorded for `source_database_name` (by default the
+    release itself) against `database_name` and cache their results.
+    Returns the number of entries written
+    """
+    cache = mongo_client.async_cache
+    database = mongo_client.get_release_database(database_name)
+    index = await cache.hgetall(query_index_key(source_database_name or database_name))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def warm(field, canonical) -> bool:
+        if isinstance(field, bytes):
+            field = field.decode("utf-8")
+        if isinstance(canonical, bytes):
+            canonical = canonical.decode("utf-8")
+        collection = field.split(":", 1)[0]
+
+        async with semaphore:
+            query, projection = parse_canonical_query(canonical)
+            docs = (
+                await database[collection].find(query, projection).to_list(length=None)
+            )
+            data = await asyncio.to_thread(mongo_client.cache_codec.encode, docs)
+            if data is None:
+                return False
+            await store_result(
+                cache,
+                database_name,
+                collection,
+                canonical,
+                data,
+                mongo_client.redis_expiry,
+            )
+            return True
+
+    written = await asyncio.gather(
+        *[warm(field, canonical) for field, canonical in index.items()]
+    )
+    logger.info(
+        "Pre-warmed %d of %d queries into %s",
+        sum(written),
+        len(index),
+        database_name,
+    )
+    return sum(written)
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Drop or pre-warm the DataLoader cache of a release database"
+    )
+    parser.add_argument("operation", choices=["drop", "prewarm"])
+    parser.add_argument("database", help="Release database, e.g. release_111_1")
+    parser.add_argument(
+        "--from",
+        dest="source",
+        help="Pre-warm with the queries recorded for this release database",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv("connections.conf")
+    mongo_client = MongoDbClient(os.environ)
+    if not mongo_client.async_cache:
+        raise SystemExit("Redis is not available")
+
+    try:
+        if args.operation == "drop":
+            await drop_release(mongo_client.async_cache, args.database)
+        else:
+            await prewarm_release(mongo_client, args.database, args.source)
+    finally:
+        await mongo_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -12,12 +12,13 @@
    limitations under the License.
 """
 
+import asyncio
 import logging
-import re
 import time
 
 import pymongo
 import mongomock
+import mongomock_motor
 import grpc
 import redis
 import redis.asyncio as redis_async
@@ -31,9 +32,29 @@ from graphql_service.resolver.exceptions import (
 
 from yagrc import reflector as yagrc_reflector
 
+from common.binning import has_bin_index
+from common.cache_codec import ResultCodec
+from common.interval_index import IntervalIndexCache
+from common.lazy_bson import LAZY_CODEC_OPTIONS
+from common.tile_cache import OverlapTileCache
+from common.release_cache import (
+    ReleaseVersionCache,
+    FLUSH_ALL_MESSAGE,
+    invalidation_target,
+)
+from common.release_catalog import (
+    ReleaseCatalog,
+    is_release_database,
+    release_version_of,
+)
 from common.utils import process_release_version
 
 logger = logging.getLogger(__name__)
+# Redis key recording that a release database has been fully warmed
+WARMUP_MARKER_PREFIX = "warmup_done:"
+# Backoff of the invalidation listener while Redis is unavailable
+INVALIDATION_RETRY_MIN_SECONDS = 1
+INVALIDATION_RETRY_MAX_SECONDS = 60
 
 
 class MongoDbClient:
@@ -60,6 +81,47 @@ class MongoDbClient:
         self.warmup_cache_on_start = (
             self.config.get("WARMUP_CACHE_ON_START", "false").lower() == "true"
         )
+        # Warm-up tuning: release databases read in parallel, genome ids per pipeline
+        self.warmup_concurrency = int(self.config.get("WARMUP_CONCURRENCY", 4))
+        self.warmup_chunk_size = int(self.config.get("WARMUP_CHUNK_SIZE", 1000))
+        self.warmup_stats = {}
+        # Encoding of the DataLoader results cached in Redis
+        self.cache_codec = ResultCodec.from_config(self.config)
+        # Opt-in: hand out documents that only decode the fields resolvers read
+        self.lazy_bson_decoding = (
+            self.config.get("LAZY_BSON_DECODING", "false").lower() == "true"
+        )
+        # Release database name -> whether its overlap bins are backfilled
+        self.binned_databases = {}
+        # Optional in-memory interval indexes serving overlap_region
+        self.interval_indexes = IntervalIndexCache.from_config(self.config)
+        # Optional tile-aligned cache of overlap_region, see common.tile_cache
+        self.overlap_tiles = OverlapTileCache.from_config(self.config)
+
+        # Routing table built from the release databases themselves, refreshed
+        # every RELEASE_CATALOG_POLL_SECONDS (0 disables the watcher)
+        self.release_catalog = ReleaseCatalog()
+        self.release_catalog_poll_seconds = int(
+            self.config.get("RELEASE_CATALOG_POLL_SECONDS", 0)
+        )
+
+        # In-process L1 cache in front of Redis for genome_uuid -> release version.
+        # It is shared by the sync and async paths and works even without Redis
+        self.release_cache = ReleaseVersionCache(
+            max_size=int(self.config.get("RELEASE_CACHE_MAX_SIZE", 10000)),
+            ttl_seconds=int(self.config.get("RELEASE_CACHE_TTL_SECONDS", 600)),
+        )
+        # Optional Redis pub/sub channel used to invalidate the L1 cache of every worker
+        self.release_invalidation_channel = self.config.get(
+            "RELEASE_CACHE_INVALIDATION_CHANNEL", ""
+        )
+        self.background_tasks = []
+
+        # genome_uuid -> in-flight release lookup, see coalesced_release_lookup()
+        self.release_lookups = {}
+        # Optional cross-worker single-flight: hold a short Redis lock while
+        # asking gRPC so other workers wait for the cache write. 0 disables it
+        self.release_lookup_lock_ms = int(self.config.get("RELEASE_LOOKUP_LOCK_MS", 0))
 
         try:
             self.cache = redis.StrictRedis(host=self.redis_host, port=self.redis_port)
@@ -69,56 +131,233 @@ class MongoDbClient:
             self.cache.ping()  # Check Redis connection
             logger.debug(f"[MongoDbClient] Redis caching enabled")
 
-            if self.redis_cache_enabled and self.warmup_cache_on_start:
-                self.warmup_cache_from_mongo()
-
         except redis.RedisError as e:
             logger.warning(f"[MongoDbClient] Redis not available: {e}")
             self.cache = None
             self.async_cache = None
             self.redis_cache_enabled = False
 
+    def get_release_database(self, database_name):
+        "Async handle on a release database, decoding lazily if configured"
+        if self.lazy_bson_decoding:
+            return self.async_mongo_client.get_database(
+                database_name, codec_options=LAZY_CODEC_OPTIONS
+            )
+        return self.async_mongo_client[database_name]
+
+    async def has_overlap_bins(self, database):
+        """
+        Whether overlap queries on a release database can use its bin index.
+        Checked once per database: backfill before a release is published
+        """
+        if database.name not in self.binned_databases:
+            try:
+                self.binned_databases[database.name] = await has_bin_index(database)
+            except pymongo.errors.PyMongoError as exc:
+                logger.warning(
+                    "[MongoDbClient] Cannot read the indexes of %s: %s",
+                    database.name,
+                    exc,
+                )
+                return False
+        return self.binned_databases[database.name]
+
+    def get_local_release_version(self, uuid):
+        """
+        Release of a genome from the L1 cache, no I/O. The release catalog is
+        only a fallback for when gRPC has no answer, see catalog_fallback()
+        """
+        return self.release_cache.get(uuid)
+
+    def catalog_fallback(self, uuid, error):
+        """
+        The catalog route of a genome gRPC could not resolve, else `error`
+        is raised. Not cached: gRPC is asked again next time
+        """
+        release_version = self.release_catalog.get(uuid)
+        if not release_version:
+            raise error
+        logger.warning(
+            "[MongoDbClient] Routing %s from the release catalog: %s", uuid, error
+        )
+        return release_version
+
     async def get_cached_connection(self, uuid):
+        release_version = self.get_local_release_version(uuid)
+        if release_version:
+            chosen_db = process_release_version(release_version)
+            return self.get_release_database(chosen_db)
+
         if self.redis_cache_enabled and self.async_cache:
             try:
                 cached_version = await self.async_cache.get(uuid)
                 if cached_version:
-                    chosen_db = process_release_version(cached_version.decode("utf-8"))
-                    return self.async_mongo_client[chosen_db]
+                    release_version = cached_version.decode("utf-8")
+                    self.release_cache.set(uuid, release_version)
+                    chosen_db = process_release_version(release_version)
+                    return self.get_release_database(chosen_db)
             except redis.RedisError as e:
                 logger.warning(f"[MongoDbClient] Redis cache read failed: {e}")
         return None
 
-    async def get_async_database_conn(self, async_grpc_model, uuid):
+    async def get_async_database_conn(
+        self, async_grpc_model, uuid, release_version=None
+    ):
+        if release_version:
+            chosen_db = process_release_version(release_version)
+            return self.get_release_database(chosen_db)
+
         cached_connection = await self.get_cached_connection(uuid)
         if cached_connection is not None:
             return cached_connection
 
-        try:
-            grpc_response = await async_grpc_model.get_release_by_genome_uuid(uuid)
-        except Exception as grpc_exp:
-            raise FailedToConnectToGrpc(
-                f"Internal server error: Couldn't connect to gRPC Host, {str(grpc_exp)}"
-            )
+        release_version = await self.coalesced_release_lookup(async_grpc_model, uuid)
+        chosen_db = process_release_version(release_version)
 
-        if not grpc_response or not grpc_response.release_version:
-            logger.warning("[get_database_conn] Release not found")
-            raise GenomeNotFoundError({"genome_id": uuid})
+        logger.debug("[get_database_conn] Connected to '%s' MongoDB", chosen_db)
+        return self.get_release_database(chosen_db)
 
-        chosen_db = process_release_version(grpc_response.release_version)
-        if self.redis_cache_enabled and self.async_cache:
+    async def get_async_database_conns(self, async_grpc_model, uuids):
+        """
+        Batched get_async_database_conn, used as the batch function of the
+        request-scoped release DataLoader. The L1 cache is checked first, the
+        remaining genomes cost a single Redis MGET and the misses are fetched
+        from gRPC concurrently.
+
+        Returns one database (or the exception raised for it) per uuid, in
+        the order of `uuids`
+        """
+        release_versions = {
+            uuid: self.get_local_release_version(uuid) for uuid in uuids
+        }
+
+        uncached = [uuid for uuid, release in release_versions.items() if not release]
+        if uncached and self.redis_cache_enabled and self.async_cache:
             try:
-                await self.async_cache.set(
-                    uuid, grpc_response.release_version, ex=self.redis_expiry
+                cached_versions = await self.async_cache.mget(uncached)
+            except redis.RedisError as exc:
+                logger.warning("[MongoDbClient] Redis cache read failed: %s", exc)
+                cached_versions = [None] * len(uncached)
+            for uuid, cached_version in zip(uncached, cached_versions):
+                if cached_version:
+                    release_versions[uuid] = cached_version.decode("utf-8")
+                    self.release_cache.set(uuid, release_versions[uuid])
+
+        misses = [uuid for uuid, release in release_versions.items() if not release]
+        # There is no batched release RPC in the metadata service, so the
+        # misses go out concurrently (and coalesced with other requests)
+        fetched = await asyncio.gather(
+            *[self.coalesced_release_lookup(async_grpc_model, uuid) for uuid in misses],
+            return_exceptions=True,
+        )
+        release_versions.update(zip(misses, fetched))
+
+        connections = []
+        for uuid in uuids:
+            release = release_versions[uuid]
+            if isinstance(release, Exception):
+                connections.append(release)
+            else:
+                connections.append(
+                    self.get_release_database(process_release_version(release))
                 )
-            except redis.RedisError as e:
-                logger.warning(f"[MongoDbClient] Redis cache set failed: {e}")
+        return connections
 
-        if not chosen_db:
-            raise GenomeNotFoundError({"genome_id": uuid})
+    async def coalesced_release_lookup(self, async_grpc_model, uuid):
+        """
+        Single-flight wrapper around fetch_release_version: concurrent cache
+        misses for the same genome in this worker share one gRPC call and one
+        cache write
+        """
+        lookup = self.release_lookups.get(uuid)
+        if lookup is None:
+            lookup = asyncio.ensure_future(
+                self.fetch_release_version(async_grpc_model, uuid)
+            )
+            self.release_lookups[uuid] = lookup
+
+            def forget_lookup(done_lookup):
+                if self.release_lookups.get(uuid) is done_lookup:
+                    del self.release_lookups[uuid]
+
+            lookup.add_done_callback(forget_lookup)
+
+        # A cancelled request must not cancel the lookup other requests wait on
+        return await asyncio.shield(lookup)
+
+    async def fetch_release_version(self, async_grpc_model, uuid):
+        "Ask gRPC for the release of a genome and store it in the L1 and Redis caches"
+        lock_key = None
+        if (
+            self.release_lookup_lock_ms
+            and self.redis_cache_enabled
+            and self.async_cache
+        ):
+            lock_key = "release_lookup_lock:" + uuid
+            try:
+                acquired = await self.async_cache.set(
+                    lock_key, 1, nx=True, px=self.release_lookup_lock_ms
+                )
+            except redis.RedisError as exc:
+                logger.warning("[MongoDbClient] Redis lock failed: %s", exc)
+                acquired = True
+            if not acquired:
+                # Another worker is already asking gRPC, wait for its cache write
+                lock_key = None
+                cached_version = await self.wait_for_cached_release(uuid)
+                if cached_version:
+                    return cached_version
 
-        logger.debug("[get_database_conn] Connected to '%s' MongoDB", chosen_db)
-        return self.async_mongo_client[chosen_db]
+        try:
+            try:
+                grpc_response = await async_grpc_model.get_release_by_genome_uuid(uuid)
+            except Exception as grpc_exp:
+                error = FailedToConnectToGrpc(
+                    f"Internal server error: Couldn't connect to gRPC Host, {str(grpc_exp)}"
+                )
+                error.__cause__ = grpc_exp
+                return self.catalog_fallback(uuid, error)
+
+            if not grpc_response or not grpc_response.release_version:
+                logger.warning("[get_database_conn] Release not found")
+                return self.catalog_fallback(
+                    uuid, GenomeNotFoundError({"genome_id": uuid})
+                )
+
+            release_version = str(grpc_response.release_version)
+            self.release_cache.set(uuid, release_version)
+            if self.redis_cache_enabled and self.async_cache:
+                try:
+                    await self.async_cache.set(
+                        uuid, release_version, ex=self.redis_expiry
+                    )
+                except redis.RedisError as exc:
+                    logger.warning("[MongoDbClient] Redis cache set failed: %s", exc)
+            return release_version
+        finally:
+            if lock_key:
+                try:
+                    await self.async_cache.delete(lock_key)
+                except redis.RedisError as exc:
+                    logger.warning("[MongoDbClient] Redis unlock failed: %s", exc)
+
+    async def wait_for_cached_release(self, uuid):
+        "Poll Redis until the lock holder stored the release, or the lock expires"
+        waited_ms = 0
+        poll_interval_ms = 20
+        while waited_ms < self.release_lookup_lock_ms:
+            await asyncio.sleep(poll_interval_ms / 1000)
+            waited_ms += poll_interval_ms
+            try:
+                cached_version = await self.async_cache.get(uuid)
+            except redis.RedisError as exc:
+                logger.warning("[MongoDbClient] Redis cache read failed: %s", exc)
+                return None
+            if cached_version:
+                release_version = cached_version.decode("utf-8")
+                self.release_cache.set(uuid, release_version)
+                return release_version
+        return None
 
     def get_database_conn(self, grpc_model, uuid, release_version):
         grpc_response = None
@@ -128,6 +367,12 @@ class MongoDbClient:
             chosen_db = process_release_version(release_version)
             return self.mongo_client[chosen_db]
 
+        # Try the in-process caches first, they need no network round trip
+        cached_release = self.get_local_release_version(uuid)
+        if cached_release:
+            chosen_db = process_release_version(cached_release)
+            return self.mongo_client[chosen_db]
+
         # Try cache if enabled
         if self.redis_cache_enabled and self.cache:
             try:
@@ -136,7 +381,9 @@ class MongoDbClient:
                     logger.debug(
                         f"[MongoDbClient] Using cached version: {cached_version}"
                     )
-                    chosen_db = process_release_version(cached_version.decode("utf-8"))
+                    cached_release = cached_version.decode("utf-8")
+                    self.release_cache.set(uuid, cached_release)
+                    chosen_db = process_release_version(cached_release)
                     return self.mongo_client[chosen_db]
             except redis.RedisError as e:
                 logger.warning(f"[MongoDbClient] Redis cache read failed: {e}")
@@ -149,12 +396,20 @@ class MongoDbClient:
             logger.debug(
                 "[get_database_conn] Couldn't connect to gRPC Host: %s", grpc_exp
             )
-            raise FailedToConnectToGrpc(
-                "Internal server error: Couldn't connect to gRPC Host"
-            )
+            return self.mongo_client[
+                process_release_version(
+                    self.catalog_fallback(
+                        uuid,
+                        FailedToConnectToGrpc(
+                            "Internal server error: Couldn't connect to gRPC Host"
+                        ),
+                    )
+                )
+            ]
 
         if grpc_response and grpc_response.release_version:
             chosen_db = process_release_version(grpc_response.release_version)
+            self.release_cache.set(uuid, str(grpc_response.release_version))
 
             if self.redis_cache_enabled and self.cache:
                 try:
@@ -166,7 +421,9 @@ class MongoDbClient:
 
         else:
             logger.warning("[get_database_conn] Release not found")
-            raise GenomeNotFoundError({"genome_id": uuid})
+            chosen_db = process_release_version(
+                self.catalog_fallback(uuid, GenomeNotFoundError({"genome_id": uuid}))
+            )
 
         if chosen_db is not None:
             logger.debug("[get_database_conn] Connected to '%s' MongoDB", chosen_db)
@@ -174,63 +431,279 @@ class MongoDbClient:
             return data_database_connection
         raise GenomeNotFoundError({"genome_id": uuid})
 
-    def warmup_cache_from_mongo(self):
-        if not self.redis_cache_enabled or not self.cache:
+    async def warmup_cache_from_mongo(self):
+        """
+        Pre-load Redis with genome_id -> release version for every release
+        database. Runs as a background task so start-up is never blocked.
+        Databases are read concurrently, a genome found in several of them is
+        routed to the newest one (as by the release catalog), and the routes
+        are written in pipelined chunks. A per-release marker, expiring with
+        the entries, makes restarts skip the databases warmed recently
+        """
+        if not self.redis_cache_enabled or not self.async_cache:
             return
 
-        started = time.time()
-        total_keys = 0
+        started = time.monotonic()
+        self.warmup_stats = {
+            "databases_total": 0,
+            "databases_warmed": 0,
+            "databases_skipped": 0,
+            "keys": 0,
+            "seconds": None,
+        }
 
         try:
             # ex: ["release_110_1", "release_110_2", ..]
-            release_dbs = [
-                db_name
-                for db_name in self.mongo_client.list_database_names()
-                if re.compile(r"^release_\d+_\d+$").match(db_name)
-            ]
+            release_dbs = await self.list_release_databases()
+            self.warmup_stats["databases_total"] = len(release_dbs)
 
             logger.info(
-                "Starting genome id-> release version redis warm-up from MongoDB"
+                "Starting genome id-> release version redis warm-up from MongoDB "
+                "(%d release databases)",
+                len(release_dbs),
             )
 
-            for db_name in release_dbs:
-                # release_115_4 -> 115.4
-                # we could diretly store release_115_4 but sync resolvers use process_release_version
-                # to get db name
-                release_version = db_name[len("release_") :].replace("_", ".")
-                genome_collection = self.mongo_client[db_name]["genome"]
+            semaphore = asyncio.Semaphore(self.warmup_concurrency)
+
+            async def read_genome_ids(db_name):
+                "None if the database was warmed recently"
+                async with semaphore:
+                    if await self.async_cache.get(WARMUP_MARKER_PREFIX + db_name):
+                        self.warmup_stats["databases_skipped"] += 1
+                        logger.debug(
+                            "[warmup_cache_from_mongo] %s already warm", db_name
+                        )
+                        return None
+                    return await self.list_genome_ids(db_name)
+
+            results = await asyncio.gather(
+                *[read_genome_ids(db_name) for db_name in release_dbs],
+                return_exceptions=True,
+            )
+            genome_ids_by_db = {}
+            for db_name, result in zip(release_dbs, results):
+                if isinstance(result, Exception):
+                    logger.warning(
+                        "[warmup_cache_from_mongo] Warm-up of %s failed: %s",
+                        db_name,
+                        result,
+                    )
+                elif result is not None:
+                    genome_ids_by_db[db_name] = result
+
+            # Independent of the order the databases were read in
+            routes = ReleaseCatalog.build_routes(genome_ids_by_db)
+            items = list(routes.items())
+            for start in range(0, len(items), self.warmup_chunk_size):
+                await self.store_warmup_chunk(
+                    items[start : start + self.warmup_chunk_size]
+                )
 
-                db_keys = 0
-                cursor = genome_collection.find({})
-                try:
-                    for genome in cursor:
-                        genome_id = genome.get("genome_id")
-                        if not genome_id:
-                            continue
-
-                        # set only if there is no entry
-                        self.cache.set(genome_id, release_version, nx=True)
-                        db_keys += 1
-                finally:
-                    cursor.close()
-
-                total_keys += db_keys
-                logger.debug(
-                    "[warmup_cache_from_mongo] Stored %d entries from %s",
-                    db_keys,
-                    db_name,
+            # Only mark the databases once every chunk made it to Redis
+            pipeline = self.async_cache.pipeline(transaction=False)
+            for db_name in genome_ids_by_db:
+                pipeline.set(
+                    WARMUP_MARKER_PREFIX + db_name,
+                    release_version_of(db_name),
+                    ex=self.redis_expiry,
                 )
+            await pipeline.execute()
 
-            time_taken = time.time() - started
+            self.warmup_stats["databases_warmed"] = len(genome_ids_by_db)
+            self.warmup_stats["keys"] = len(routes)
+            self.warmup_stats["seconds"] = round(time.monotonic() - started, 3)
             logger.info(
-                "[warmup_cache_from_mongo] Redis warm-up completed: %d keys in %.2fs",
-                total_keys,
-                time_taken,
+                "[warmup_cache_from_mongo] Redis warm-up completed: %d keys from %d "
+                "databases (%d skipped) in %.2fs",
+                self.warmup_stats["keys"],
+                self.warmup_stats["databases_warmed"],
+                self.warmup_stats["databases_skipped"],
+                self.warmup_stats["seconds"],
             )
         except Exception as ex:
             logger.warning("[warmup_cache_from_mongo] Redis warm-up failed: %s", ex)
 
+    async def store_warmup_chunk(self, routes):
+        """
+        Write a chunk of (genome_id, release_version) routes in one round
+        trip, keeping existing entries
+        """
+        pipeline = self.async_cache.pipeline(transaction=False)
+        for genome_id, release_version in routes:
+            # set only if there is no entry
+            pipeline.set(genome_id, release_version, nx=True, ex=self.redis_expiry)
+        await pipeline.execute()
+        return len(routes)
+
+    async def list_release_databases(self):
+        # ex: ["release_110_1", "release_110_2", ..]
+        return [
+            db_name
+            for db_name in await self.async_mongo_client.list_database_names()
+            if is_release_database(db_name)
+        ]
+
+    async def list_genome_ids(self, db_name):
+        cursor = self.async_mongo_client[db_name]["genome"].find(
+            {}, {"genome_id": 1, "_id": 0}, batch_size=self.warmup_chunk_size
+        )
+        return [
+            genome["genome_id"] async for genome in cursor if genome.get("genome_id")
+        ]
+
+    async def refresh_release_catalog(self):
+        """
+        Rebuild the routing table if release databases were added or removed
+        since the last refresh, and push the changes to Redis (see
+        push_routes()). Returns True if the catalog changed
+        """
+        databases = await self.list_release_databases()
+        if not self.release_catalog.has_changed(databases):
+            return False
+
+        started = time.monotonic()
+        semaphore = asyncio.Semaphore(self.warmup_concurrency)
+
+        async def read_genome_ids(db_name):
+            async with semaphore:
+                return await self.list_genome_ids(db_name)
+
+        genome_ids = await asyncio.gather(*[read_genome_ids(db) for db in databases])
+        routes = ReleaseCatalog.build_routes(dict(zip(databases, genome_ids)))
+        changed, removed = self.release_catalog.diff(routes)
+        is_first_build = not self.release_catalog.databases
+        previous_databases = self.release_catalog.databases
+
+        if self.redis_cache_enabled and self.async_cache and (changed or removed):
+            try:
+                await self.push_routes(changed, removed)
+            except redis.RedisError as exc:
+                # The in-memory table is still usable by this worker
+                logger.warning("[MongoDbClient] Routing table push failed: %s", exc)
+
+        self.release_catalog.replace(databases, routes)
+
+        if not is_first_build:
+            # Entries routed elsewhere must not be served from the L1 cache
+            for genome_id in list(changed) + removed:
+                self.release_cache.invalidate(genome_id)
+
+        logger.info(
+            "[refresh_release_catalog] Release catalog rebuilt in %.2fs: %d genomes "
+            "in %d databases (added: %s, removed: %s, %d routes changed)",
+            time.monotonic() - started,
+            len(routes),
+            len(databases),
+            sorted(set(databases) - previous_databases),
+            sorted(previous_databases - set(databases)),
+            len(changed) + len(removed),
+        )
+        return True
+
+    async def push_routes(self, changed, removed):
+        """
+        Write the new or moved routes and delete the removed ones in one
+        MULTI/EXEC transaction. Routes expire like the entries of gRPC
+        lookups, so the metadata service takes over again after redis_expiry
+        """
+        pipeline = self.async_cache.pipeline(transaction=True)
+        for genome_id, release_version in changed.items():
+            pipeline.set(genome_id, release_version, ex=self.redis_expiry)
+        if removed:
+            pipeline.delete(*removed)
+        await pipeline.execute()
+
+    async def watch_release_catalog(self):
+        "Refresh the release catalog every release_catalog_poll_seconds"
+        while True:
+            try:
+                await self.refresh_release_catalog()
+            except Exception as exc:
+                logger.warning(
+                    "[MongoDbClient] Release catalog refresh failed: %s", exc
+                )
+            await asyncio.sleep(self.release_catalog_poll_seconds)
+
+    def start_background_tasks(self):
+        """
+        Start the long-running tasks of this client on the running event loop.
+        Called from the Starlette lifespan, the tasks are cancelled by close()
+        """
+        if self.release_invalidation_channel and self.async_cache:
+            self.background_tasks.append(
+                asyncio.create_task(self.listen_for_release_invalidations())
+            )
+        if self.redis_cache_enabled and self.warmup_cache_on_start:
+            self.background_tasks.append(
+                asyncio.create_task(self.warmup_cache_from_mongo())
+            )
+        if self.release_catalog_poll_seconds > 0:
+            self.background_tasks.append(
+                asyncio.create_task(self.watch_release_catalog())
+            )
+
+    async def listen_for_release_invalidations(self):
+        """
+        Drop the releases announced on the Redis invalidation channel. If
+        Redis goes away the subscription is retried with exponential backoff,
+        and the L1 cache is flushed once it is back as invalidations may have
+        been missed meanwhile
+        """
+        retry_seconds = INVALIDATION_RETRY_MIN_SECONDS
+        resubscribing = False
+        while True:
+            pubsub = self.async_cache.pubsub()
+            try:
+                await pubsub.subscribe(self.release_invalidation_channel)
+                logger.info(
+                    "[MongoDbClient] Listening for release cache invalidations on '%s'",
+                    self.release_invalidation_channel,
+                )
+                if resubscribing:
+                    self.release_cache.invalidate()
+                retry_seconds = INVALIDATION_RETRY_MIN_SECONDS
+                async for message in pubsub.listen():
+                    is_invalidation, genome_uuid = invalidation_target(message)
+                    if is_invalidation:
+                        self.invalidate_release(genome_uuid)
+            except redis.RedisError as exc:
+                logger.warning(
+                    "[MongoDbClient] Invalidation listener lost Redis, "
+                    "retrying in %ss: %s",
+                    retry_seconds,
+                    exc,
+                )
+            finally:
+                try:
+                    await pubsub.aclose()
+                except redis.RedisError:
+                    pass
+
+            resubscribing = True
+            await asyncio.sleep(retry_seconds)
+            retry_seconds = min(retry_seconds * 2, INVALIDATION_RETRY_MAX_SECONDS)
+
+    def invalidate_release(self, genome_uuid=None):
+        "Drop the L1 entry and the catalog route of a genome, or all of them"
+        self.release_cache.invalidate(genome_uuid)
+        self.release_catalog.invalidate(genome_uuid)
+
+    async def publish_release_invalidation(self, genome_uuid=None):
+        """
+        Tell every worker to forget the release of a genome, or of all genomes
+        if genome_uuid is None. The local caches are dropped straight away
+        """
+        self.invalidate_release(genome_uuid)
+        if self.release_invalidation_channel and self.async_cache:
+            await self.async_cache.publish(
+                self.release_invalidation_channel, genome_uuid or FLUSH_ALL_MESSAGE
+            )
+
     async def close(self):
+        for task in self.background_tasks:
+            task.cancel()
+        await asyncio.gather(*self.background_tasks, return_exceptions=True)
+
         if self.async_cache:
             try:
                 await self.async_cache.aclose()
@@ -307,13 +780,38 @@ class FakeMongoDbClient:
     def __init__(self):
         self.mongo_client = mongomock.MongoClient()
         self.mongo_db = self.mongo_client.db
+        # Async view over the same in-memory data, so tests can populate
+        # collections synchronously and resolvers can read them asynchronously
+        self.async_mongo_client = mongomock_motor.AsyncMongoMockClient(
+            mock_mongo_client=self.mongo_client
+        )
         self.redis_cache_enabled = False
+        self.redis_expiry = 6600
+        self.cache_codec = ResultCodec()
+        self.interval_indexes = None
+        self.overlap_tiles = None
+
+    def get_release_database(self, database_name):
+        return self.async_mongo_client[database_name]
+
+    async def has_overlap_bins(self, database):
+        return await has_bin_index(database)
 
     def get_database_conn(self, grpc_model, uuid, release_version):
         # we pretend that we did a gRPC call and got the chosen db
         chosen_db = "db"
         return self.mongo_client[chosen_db]
 
+    async def get_async_database_conn(
+        self, _async_grpc_model, _uuid, _release_version=None
+    ):
+        # we pretend that we did a gRPC call and got the chosen db
+        chosen_db = "db"
+        return self.async_mongo_client[chosen_db]
+
+    async def get_async_database_conns(self, _async_grpc_model, uuids):
+        return [self.async_mongo_client["db"] for _ in uuids]
+
 
 class GRPCServiceClient:
     def __init__(self, config):
@@ -0,0 +1,248 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+In-memory interval indexes of the genes and transcripts of a region, so that
+genome browser traffic (thousands of small windows on the same chromosomes)
+does not hit MongoDB with a range query per window.
+
+An index holds the start, end and ObjectId of every feature of one (release
+database, region, feature type), sorted by start, plus the length of the
+longest feature. The features overlapping [start, end] all start within
+[start - max_length, end]: two binary searches, then a filter on the ends.
+Features are sorted by (start, _id), the order Locus pages are served in.
+
+Indexes are built lazily from a single projected scan and kept in an LRU
+capped in bytes. With INTERVAL_INDEX_DIR set they are also written to flat
+files that every worker memory-maps, so the OS page cache holds one copy.
+Release databases do not change once published, the files never go stale.
+"""
+
+import asyncio
+import logging
+import mmap
+import os
+import re
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"TII1"
+# magic, number of features, length of the longest feature
+FILE_HEADER = struct.Struct("<4sqq")
+OBJECT_ID_BYTES = 12
+
+
+class IntervalIndex:
+    "Features of one region sorted by start, see the module docstring"
+
+    def __init__(
+        self,
+        starts: Union[array, memoryview],
+        ends: Union[array, memoryview],
+        ids: Union[bytes, memoryview],
+        max_length: int,
+        buffer=None,
+    ):
+        self.starts = starts
+        self.ends = ends
+        # ObjectIds, OBJECT_ID_BYTES each, in the order of `starts`
+        self.ids = ids
+        self.max_length = max_length
+        # The memory map the arrays are views of, if loaded from a file
+        self.buffer = buffer
+
+    @classmethod
+    def from_features(cls, features: List[Tuple[int, int, ObjectId]]):
+        "Build from (start, end, _id) tuples, in any order"
+        features = sorted(features, key=lambda feature: (feature[0], feature[2]))
+        return cls(
+            starts=array("q", [start for start, _, _ in features]),
+            ends=array("q", [end for _, end, _ in features]),
+            ids=b"".join(feature_id.binary for _, _, feature_id in features),
+            max_length=max((end - start for start, end, _ in features), default=0),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "IntervalIndex":
+        "Memory-map an index written by save()"
+        with open(path, "rb") as index_file:
+            buffer = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(buffer)
+        magic, count, max_length = FILE_HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError(f"Not an interval index: {path}")
+
+        offset = FILE_HEADER.size
+        starts = view[offset : offset + 8 * count].cast("q")
+        offset += 8 * count
+        ends = view[offset : offset + 8 * count].cast("q")
+        offset += 8 * count
+        ids = view[offset : offset + OBJECT_ID_BYTES * count]
+        return cls(starts, ends, ids, max_length, buffer)
+
+    def save(self, path: str) -> None:
+        "Write the index atomically, concurrent writers of the same file are fine"
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as index_file:
+            index_file.write(FILE_HEADER.pack(MAGIC, len(self), self.max_length))
+            index_file.write(bytes(memoryview(self.starts).cast("B")))
+            index_file.write(bytes(memoryview(self.ends).cast("B")))
+            index_file.write(bytes(self.ids))
+        os.replace(temporary_path, path)
+
+    def overlapping(self, start: int, end: int) -> List[ObjectId]:
+        "Ids of the features with start <= `end` and end >= `start`"
+        return [feature_id for _, feature_id in self.overlapping_entries(start, end)]
+
+    def overlapping_entries(self, start: int, end: int) -> List[Tuple[int, ObjectId]]:
+        "(start, _id) of the features overlapping [start, end], in that order"
+        first = bisect_left(self.starts, start - self.max_length)
+        last = bisect_right(self.starts, end)
+        return [
+            (
+                self.starts[i],
+                ObjectId(
+                    bytes(self.ids[i * OBJECT_ID_BYTES : (i + 1) * OBJECT_ID_BYTES])
+                ),
+            )
+            for i in range(first, last)
+            if self.ends[i] >= start
+        ]
+
+    @property
+    def nbytes(self) -> int:
+        return len(self) * (16 + OBJECT_ID_BYTES)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+
+class IntervalIndexCache:
+    """
+    LRU of IntervalIndexes keyed by (release database, region id, feature
+    type), holding at most `max_bytes` of them. Concurrent requests for an
+    index that is not built yet share one build
+    """
+
+    def __init__(self, max_bytes: int, directory: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.nbytes = 0
+        self.builds = 0
+        self.evictions = 0
+        self._indexes: OrderedDict = OrderedDict()
+        self._in_flight: Dict[Tuple, asyncio.Future] = {}
+
+    @classmethod
+    def from_config(cls, config) -> Optional["IntervalIndexCache"]:
+        "None unless INTERVAL_INDEX_MAX_BYTES is set"
+        max_bytes = int(config.get("INTERVAL_INDEX_MAX_BYTES", 0))
+        if max_bytes <= 0:
+            return None
+        return cls(max_bytes, config.get("INTERVAL_INDEX_DIR") or None)
+
+    async def get(
+        self, database, genome_id: str, region_id: str, feature_type: str
+    ) -> IntervalIndex:
+        key = (database.name, region_id, feature_type)
+        cached = self._indexes.get(key)
+        if cached is not None:
+            self._indexes.move_to_end(key)
+            return cached
+
+        build = self._in_flight.get(key)
+        if build is None:
+            build = asyncio.ensure_future(
+                self.load_or_build(database, genome_id, region_id, feature_type)
+            )
+            self._in_flight[key] = build
+
+            def forget_build(done_build):
+                if self._in_flight.get(key) is done_build:
+                    del self._in_flight[key]
+
+            build.add_done_callback(forget_build)
+
+        # A cancelled request must not cancel the build other requests wait on
+        index = await asyncio.shield(build)
+
+        if key not in self._indexes:
+            self._indexes[key] = index
+            self.nbytes += index.nbytes
+            # The index just added is kept even if it is over the cap alone
+            while self.nbytes > self.max_bytes and len(self._indexes) > 1:
+                _, evicted = self._indexes.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+        return index
+
+    def path(self, database_name: str, region_id: str, feature_type: str) -> str:
+        assert self.directory
+        name = re.sub(r"[^\w.-]", "_", f"{database_name}.{region_id}.{feature_type}")
+        return os.path.join(self.directory, f"{name}.idx")
+
+    async def load_or_build(
+        self, database, genome_id: str, region_id: str, feature_type: str
+    ) -> IntervalIndex:
+        path = None
+        if self.directory:
+            path = self.path(database.name, region_id, feature_type)
+            if os.path.exists(path):
+                return await asyncio.to_thread(IntervalIndex.load, path)
+
+        cursor = database[feature_type.lower()].find(
+            {
+                "type": feature_type,
+                "genome_id": genome_id,
+                "slice.region_id": region_id,
+            },
+            {"slice.location.start": 1, "slice.location.end": 1},
+        )
+        features = [
+            (
+                document["slice"]["location"]["start"],
+                document["slice"]["location"]["end"],
+                document["_id"],
+            )
+            async for document in cursor
+        ]
+        index = await asyncio.to_thread(IntervalIndex.from_features, features)
+        self.builds += 1
+        logger.info(
+            "Built the %s interval index of %s in %s: %d features",
+            feature_type,
+            region_id,
+            database.name,
+            len(index),
+        )
+
+        if path:
+            try:
+                await asyncio.to_thread(index.save, path)
+            except OSError as exc:
+                logger.warning("Cannot write interval index %s: %s", path, exc)
+        return index
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "indexes": len(self._indexes),
+            "bytes": self.nbytes,
+            "builds": self.builds,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,114 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from typing import Any, Iterator, Mapping, Optional
+
+from bson.codec_options import CodecOptions, DEFAULT_CODEC_OPTIONS
+from bson.raw_bson import RawBSONDocument
+
+_DELETED = object()
+
+
+class LazyDocument(RawBSONDocument):
+    """
+    A RawBSONDocument that resolvers can also write to.
+
+    pymongo hands over the raw BSON bytes of each document and nothing is
+    decoded until a field is read; then only the top level is, sub-documents
+    stay raw (as LazyDocuments) until they are read in turn. Resolvers that
+    annotate documents (e.g. cross reference URLs) write to an overlay that
+    takes precedence over the raw bytes. `raw` stays the bytes as fetched,
+    which is what the DataLoader cache stores.
+    """
+
+    __slots__ = ("_overlay",)
+
+    def __init__(
+        self,
+        bson_bytes: bytes,
+        codec_options: Optional[CodecOptions] = None,
+    ):
+        super().__init__(bson_bytes, codec_options or LAZY_CODEC_OPTIONS)
+
+    def _writable_overlay(self) -> dict:
+        # Created on the first write only, most documents are never written to
+        try:
+            return self._overlay
+        except AttributeError:
+            # pylint: disable=attribute-defined-outside-init
+            self._overlay: dict = {}
+            return self._overlay
+
+    def _in_raw(self, key: object) -> bool:
+        try:
+            super().__getitem__(key)  # type: ignore[index]
+        except KeyError:
+            return False
+        return True
+
+    def __getitem__(self, key: str) -> Any:
+        overlay = getattr(self, "_overlay", None)
+        if overlay and key in overlay:
+            value = overlay[key]
+            if value is _DELETED:
+                raise KeyError(key)
+            return value
+        return super().__getitem__(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._writable_overlay()[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+        self._writable_overlay()[key] = _DELETED
+
+    def __contains__(self, key: object) -> bool:
+        overlay = getattr(self, "_overlay", None)
+        if overlay and key in overlay:
+            return overlay[key] is not _DELETED
+        return self._in_raw(key)
+
+    def __iter__(self) -> Iterator[str]:
+        overlay = getattr(self, "_overlay", None) or {}
+        for key in super().__iter__():
+            if overlay.get(key) is not _DELETED:
+                yield key
+        for key, value in overlay.items():
+            if value is not _DELETED and not self._in_raw(key):
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def items(self):  # type: ignore[override]
+        return {key: self[key] for key in self}.items()
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Mapping):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+
+LAZY_CODEC_OPTIONS: CodecOptions = DEFAULT_CODEC_OPTIONS.with_options(
+    document_class=LazyDocument
+)
@@ -0,0 +1,129 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Message published on the invalidation channel to drop every entry
+FLUSH_ALL_MESSAGE = "*"
+
+
+def invalidation_target(message: Dict) -> Tuple[bool, Optional[str]]:
+    """
+    Whether a Redis pub/sub message is an invalidation, and the genome_uuid
+    it names (None for FLUSH_ALL_MESSAGE)
+    """
+    if message.get("type") != "message":
+        return False, None
+
+    payload = message.get("data")
+    if isinstance(payload, bytes):
+        payload = payload.decode("utf-8")
+    return True, None if payload == FLUSH_ALL_MESSAGE else payload
+
+
+class ReleaseVersionCache:
+    """
+    Bounded, in-process LRU map of genome_uuid -> release version (e.g. "110.1")
+
+    Sits in front of Redis so that resolving the release database of a genome
+    needs no network I/O at all in the common case. Entries expire after
+    `ttl_seconds` and the least recently used entry is evicted once
+    `max_size` is reached. A lock makes it safe to share between the sync and
+    async code paths of MongoDbClient.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        ttl_seconds: float = 600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, genome_uuid: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(genome_uuid)
+            if entry is not None:
+                release_version, expires_at = entry
+                if expires_at > self.clock():
+                    self._entries.move_to_end(genome_uuid)
+                    self.hits += 1
+                    return release_version
+                del self._entries[genome_uuid]
+            self.misses += 1
+            return None
+
+    def set(self, genome_uuid: str, release_version: str) -> None:
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._entries[genome_uuid] = (
+                release_version,
+                self.clock() + self.ttl_seconds,
+            )
+            self._entries.move_to_end(genome_uuid)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, genome_uuid: Optional[str] = None) -> None:
+        "Drop one genome, or every entry if no genome_uuid is given"
+        with self._lock:
+            if genome_uuid is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(genome_uuid, None)
+
+    def handle_invalidation_message(self, message: Dict) -> None:
+        """
+        Apply a Redis pub/sub message. The payload is either a genome_uuid
+        or FLUSH_ALL_MESSAGE
+        """
+        is_invalidation, genome_uuid = invalidation_target(message)
+        if is_invalidation:
+            logger.debug("[ReleaseVersionCache] Invalidation received: %s", message)
+            self.invalidate(genome_uuid)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,95 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+RELEASE_DB_PATTERN = re.compile(r"^release_(\d+)_(\d+)$")
+
+
+def is_release_database(db_name: str) -> bool:
+    return RELEASE_DB_PATTERN.match(db_name) is not None
+
+
+def release_version_of(db_name: str) -> str:
+    "release_115_4 -> 115.4, the format process_release_version() expects"
+    return db_name[len("release_") :].replace("_", ".")
+
+
+def release_sort_key(db_name: str) -> Tuple[int, int]:
+    match = RELEASE_DB_PATTERN.match(db_name)
+    if match is None:
+        raise ValueError(f"Not a release database: {db_name}")
+    return int(match.group(1)), int(match.group(2))
+
+
+class ReleaseCatalog:
+    """
+    In-memory snapshot of the deployed release databases and of the
+    genome_id -> release version routing table built from them.
+
+    A genome present in several releases is routed to the newest one. The
+    snapshot is replaced as a whole, so readers never see a half-built table
+    """
+
+    def __init__(self):
+        self.databases: FrozenSet[str] = frozenset()
+        self.routes: Dict[str, str] = {}
+
+    def get(self, genome_id: str) -> Optional[str]:
+        return self.routes.get(genome_id)
+
+    def has_changed(self, databases: Iterable[str]) -> bool:
+        return frozenset(databases) != self.databases
+
+    @staticmethod
+    def build_routes(genome_ids_by_db: Dict[str, Iterable[str]]) -> Dict[str, str]:
+        routes = {}
+        # Oldest first, so that newer releases overwrite older ones
+        for db_name in sorted(genome_ids_by_db, key=release_sort_key):
+            release_version = release_version_of(db_name)
+            for genome_id in genome_ids_by_db[db_name]:
+                routes[genome_id] = release_version
+        return routes
+
+    def diff(self, routes: Dict[str, str]) -> Tuple[Dict[str, str], List[str]]:
+        "Routes that are new or moved release, and genome ids no longer routable"
+        changed = {
+            genome_id: release_version
+            for genome_id, release_version in routes.items()
+            if self.routes.get(genome_id) != release_version
+        }
+        removed = [genome_id for genome_id in self.routes if genome_id not in routes]
+        return changed, removed
+
+    def invalidate(self, genome_uuid: Optional[str] = None) -> None:
+        """
+        Forget the route of one genome, or every route, until the databases
+        change again: invalidations let operators override the catalog
+        """
+        if genome_uuid is None:
+            self.routes = {}
+        else:
+            self.routes = {
+                genome_id: release_version
+                for genome_id, release_version in self.routes.items()
+                if genome_id != genome_uuid
+            }
+
+    def replace(self, databases: Iterable[str], routes: Dict[str, str]) -> None:
+        self.routes = routes
+        self.databases = frozenset(databases)
+
+    def __len__(self) -> int:
+        return len(self.routes)
@@ -0,0 +1,92 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import random
+
+import mongomock
+import mongomock_motor
+import pytest
+
+from common import binning
+
+
+def in_ranges(feature_bin, ranges):
+    return any(low <= feature_bin <= high for low, high in ranges)
+
+
+def test_bins_of_overlapping_features_are_queried():
+    rng = random.Random(42)
+    for _ in range(5000):
+        start = rng.randint(1, 250_000_000)
+        end = start + rng.choice([0, 100, 10_000, 1_000_000, 50_000_000])
+        window_start = rng.randint(start - 200_000, end)
+        window_end = max(window_start + rng.choice([0, 1000, 1_000_000]), start)
+
+        assert in_ranges(
+            binning.bin_for_feature(start, end),
+            binning.overlapping_bin_ranges(window_start, window_end),
+        )
+
+
+def test_bin_levels():
+    # Within a single 128kb bin of the deepest level
+    assert binning.bin_for_feature(1, 131_072) == binning.level_offset(5)
+    # Across the first 128kb boundary, one level up
+    assert binning.bin_for_feature(131_072, 131_073) == binning.level_offset(4)
+    # Wrapping around a circular region
+    assert binning.bin_for_feature(16_000, 100) == 0
+
+
+def test_bin_query():
+    query = binning.bin_query(1000, 200_000)
+
+    assert {binning.BIN_FIELD: 0} in query["$or"]
+    assert {binning.BIN_FIELD: {"$gte": 4681, "$lte": 4682}} in query["$or"]
+    assert len(query["$or"]) == binning.LEVELS
+
+
+@pytest.mark.asyncio
+async def test_backfill_release():
+    client = mongomock.MongoClient()
+    client.db.gene.insert_many(
+        [
+            {
+                "stable_id": "ENSG001.1",
+                "slice": {"location": {"start": 10, "end": 100}},
+            },
+            {
+                "stable_id": "ENSG002.1",
+                "slice": {"location": {"start": 131_000, "end": 132_000}},
+            },
+        ]
+    )
+    client.db.transcript.insert_one(
+        {"stable_id": "ENST001.1", "slice": {"location": {"start": 10, "end": 90}}}
+    )
+    database = mongomock_motor.AsyncMongoMockClient(mock_mongo_client=client)["db"]
+
+    assert not await binning.has_bin_index(database)
+    assert await binning.backfill_release(database) == {"gene": 2, "transcript": 1}
+    assert await binning.has_bin_index(database)
+    # Already binned features are left alone
+    assert await binning.backfill_release(database) == {"gene": 0, "transcript": 0}
+
+    bins = {
+        gene["stable_id"]: gene["slice"]["location"]["bin"]
+        for gene in client.db.gene.find()
+    }
+    assert bins == {
+        "ENSG001.1": binning.level_offset(5),
+        "ENSG002.1": binning.level_offset(4),
+    }
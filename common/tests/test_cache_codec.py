@@ -0,0 +1,93 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import pickle
+
+import pytest
+from bson import ObjectId
+
+from common.cache_codec import HEADER, ResultCodec
+
+DOCS = [
+    {
+        "_id": ObjectId(),
+        "type": "Transcript",
+        "stable_id": f"ENST{i:011d}.1",
+        "slice": {"location": {"start": i * 100, "end": i * 100 + 50}},
+        "spliced_exons": [
+            {"index": j, "relative_location": {"start": j}} for j in range(5)
+        ],
+    }
+    for i in range(20)
+]
+
+
+@pytest.mark.parametrize("serialization", ["bson", "pickle"])
+@pytest.mark.parametrize("compression", ["none", "zlib"])
+def test_round_trip(serialization, compression):
+    codec = ResultCodec(serialization=serialization, compression=compression)
+
+    assert codec.decode(codec.encode(DOCS)) == DOCS
+
+
+def test_small_payloads_are_not_compressed():
+    codec = ResultCodec(compress_min_bytes=1024 * 1024)
+    uncompressed = codec.encode(DOCS)
+    compressed = ResultCodec(compress_min_bytes=0).encode(DOCS)
+
+    assert len(compressed) < len(uncompressed)
+    assert codec.decode(compressed) == DOCS
+
+
+def test_size_cap():
+    assert ResultCodec(compression="none", max_bytes=100).encode(DOCS) is None
+    assert ResultCodec(max_bytes=100).encode([]) is not None
+
+
+def test_unknown_entries_decode_to_none():
+    codec = ResultCodec()
+    encoded = codec.encode(DOCS)
+
+    assert codec.decode(pickle.dumps(DOCS)) is None
+    assert codec.decode(b"") is None
+    # A different format version
+    assert codec.decode(encoded[:2] + b"\x09" + encoded[3:]) is None
+    assert len(encoded) > HEADER.size
+
+
+def test_other_serializations_are_not_decoded():
+    pickled = ResultCodec(serialization="pickle").encode(DOCS)
+
+    assert ResultCodec().decode(pickled) is None
+    assert (
+        ResultCodec(serialization="pickle").decode(ResultCodec().encode(DOCS)) is None
+    )
+
+
+def test_corrupt_entries_decode_to_none():
+    codec = ResultCodec(compress_min_bytes=0)
+    encoded = codec.encode(DOCS)
+
+    # Truncated zlib stream
+    assert codec.decode(encoded[:-10]) is None
+    uncompressed = ResultCodec(compression="none").encode(DOCS)
+    # Truncated BSON document
+    assert codec.decode(uncompressed[:-10]) is None
+
+
+def test_unknown_settings_are_rejected():
+    with pytest.raises(ValueError):
+        ResultCodec(serialization="yaml")
+    with pytest.raises(ValueError):
+        ResultCodec(compression="brotli")
@@ -0,0 +1,136 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import pytest
+from bson import ObjectId
+
+from common import dataloader_cache
+from common.db import FakeMongoDbClient
+from graphql_service.resolver import data_loaders
+from graphql_service.resolver.data_loaders import BatchLoaders
+from graphql_service.tests.test_db_client import FakeAsyncRedis
+
+
+def test_keys_are_canonical_and_release_scoped():
+    first = dataloader_cache.canonical_query({"type": "Region", "region_id": "1"})
+    second = dataloader_cache.canonical_query({"region_id": "1", "type": "Region"})
+
+    assert first == second
+    key = dataloader_cache.cache_key("release_110_1", "region", first)
+    assert key.startswith("thoas:dl:v1:release_110_1:region:")
+    assert key != dataloader_cache.cache_key("release_111_1", "region", first)
+
+
+def test_canonical_queries_round_trip_object_ids():
+    feature_id = ObjectId()
+    canonical = dataloader_cache.canonical_query({"type": "Gene", "_id": feature_id})
+
+    assert dataloader_cache.parse_canonical_query(canonical) == (
+        {"type": "Gene", "_id": feature_id},
+        None,
+    )
+
+
+@pytest.fixture(name="mongo_client")
+def fixture_mongo_client():
+    mongo_client = FakeMongoDbClient()
+    mongo_client.redis_cache_enabled = True
+    mongo_client.redis_expiry = 60
+    mongo_client.async_cache = FakeAsyncRedis()
+    for release, name in [("release_110_1", "old"), ("release_111_1", "new")]:
+        mongo_client.mongo_client[release].region.insert_one(
+            {"type": "Region", "region_id": "1_chr1", "name": name}
+        )
+    return mongo_client
+
+
+async def load_region(mongo_client, release):
+    loaders = BatchLoaders(mongo_client.async_mongo_client[release], mongo_client)
+    response = await loaders.batch_region_load(["1_chr1"])
+    await data_loaders.flush_cache_writes()
+    return response[0][0]["name"]
+
+
+@pytest.mark.asyncio
+async def test_identical_queries_on_two_releases_do_not_share_entries(
+    mongo_client,
+):
+    assert await load_region(mongo_client, "release_110_1") == "old"
+    assert await load_region(mongo_client, "release_111_1") == "new"
+    # Both are now served from their own cache entry
+    assert await load_region(mongo_client, "release_110_1") == "old"
+
+
+@pytest.mark.asyncio
+async def test_drop_release(mongo_client):
+    cache = mongo_client.async_cache
+    await load_region(mongo_client, "release_110_1")
+    await load_region(mongo_client, "release_111_1")
+
+    dropped = await dataloader_cache.drop_release(cache, "release_110_1")
+
+    assert dropped == 2
+    assert all("release_111_1" in key for key in cache.store)
+
+
+@pytest.mark.asyncio
+async def test_prewarm_release_from_another_release(mongo_client):
+    cache = mongo_client.async_cache
+    await load_region(mongo_client, "release_110_1")
+
+    written = await dataloader_cache.prewarm_release(
+        mongo_client, "release_111_1", "release_110_1"
+    )
+
+    assert written == 1
+    assert any(
+        key.startswith("thoas:dl:v1:release_111_1:region:") for key in cache.store
+    )
+    # Served from the pre-warmed entry even once MongoDB no longer has it
+    mongo_client.mongo_client["release_111_1"].region.delete_many({})
+    assert await load_region(mongo_client, "release_111_1") == "new"
+
+
+@pytest.mark.asyncio
+async def test_query_index_is_capped_and_pruned(monkeypatch):
+    monkeypatch.setattr(dataloader_cache, "QUERY_INDEX_MAX_FIELDS", 2)
+    cache = FakeAsyncRedis()
+    index_key = dataloader_cache.query_index_key("release_110_1")
+    canonicals = [
+        dataloader_cache.canonical_query({"type": "Region", "region_id": str(key)})
+        for key in range(4)
+    ]
+
+    async def store(canonical):
+        await dataloader_cache.store_results(
+            cache, "release_110_1", "region", [(canonical, b"[]")], 60
+        )
+
+    for canonical in canonicals[:3]:
+        await store(canonical)
+    # Full: the third query is cached but not recorded
+    assert sorted(cache.store[index_key].values()) == sorted(
+        canonical.encode("utf-8") for canonical in canonicals[:2]
+    )
+
+    # Once an entry expires, its query is pruned (at most once per interval)
+    # and makes room
+    del cache.store[
+        dataloader_cache.cache_key("release_110_1", "region", canonicals[0])
+    ]
+    del cache.store[f"{index_key}:pruned"]
+    await store(canonicals[3])
+    assert sorted(cache.store[index_key].values()) == sorted(
+        canonical.encode("utf-8") for canonical in (canonicals[1], canonicals[3])
+    )
@@ -0,0 +1,411 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import mongomock
+import mongomock_motor
+import pymongo
+import grpc
+import pytest
+import redis
+
+from common import db
+from common.lazy_bson import LazyDocument
+from graphql_service.resolver.exceptions import GenomeNotFoundError
+from graphql_service.tests.test_db_client import FakeAsyncRedis
+
+
+class CountingAsyncGrpcModel:
+    "Answers GetReleaseVersionByUUID slowly enough for requests to overlap"
+
+    def __init__(self, release_version="110.1"):
+        self.release_version = release_version
+        self.calls = 0
+
+    async def get_release_by_genome_uuid(self, _genome_uuid):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(release_version=self.release_version)
+
+
+def unavailable_redis(*_args, **_kwargs):
+    raise redis.ConnectionError("no redis in tests")
+
+
+@pytest.fixture(name="mongo_db_client")
+def fixture_mongo_db_client(monkeypatch):
+    "A MongoDbClient backed by mongomock, with Redis switched off at start-up"
+    monkeypatch.setattr(
+        db.MongoDbClient,
+        "connect_mongo",
+        staticmethod(lambda _: mongomock.MongoClient()),
+    )
+    monkeypatch.setattr(
+        db.MongoDbClient,
+        "connect_async_mongo",
+        staticmethod(lambda _: mongomock_motor.AsyncMongoMockClient()),
+    )
+    monkeypatch.setattr(db.redis, "StrictRedis", unavailable_redis)
+
+    return db.MongoDbClient({"MONGO_HOST": "localhost", "MONGO_PORT": "27017"})
+
+
+def enable_fake_redis(mongo_db_client):
+    mongo_db_client.async_cache = FakeAsyncRedis()
+    mongo_db_client.redis_cache_enabled = True
+    return mongo_db_client.async_cache
+
+
+@pytest.mark.asyncio
+async def test_l1_cache_avoids_grpc(mongo_db_client):
+    grpc_model = CountingAsyncGrpcModel()
+
+    first = await mongo_db_client.get_async_database_conn(grpc_model, "genome_1")
+    second = await mongo_db_client.get_async_database_conn(grpc_model, "genome_1")
+
+    assert first.name == second.name == "release_110_1"
+    assert grpc_model.calls == 1
+    assert mongo_db_client.release_cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_lookup(mongo_db_client):
+    cache = enable_fake_redis(mongo_db_client)
+    grpc_model = CountingAsyncGrpcModel()
+
+    connections = await asyncio.gather(
+        *[
+            mongo_db_client.get_async_database_conn(grpc_model, "genome_1")
+            for _ in range(20)
+        ]
+    )
+
+    assert {conn.name for conn in connections} == {"release_110_1"}
+    assert grpc_model.calls == 1
+    assert cache.store == {"genome_1": b"110.1"}
+    assert not mongo_db_client.release_lookups
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_failures(mongo_db_client):
+    grpc_model = CountingAsyncGrpcModel(release_version="")
+
+    results = await asyncio.gather(
+        *[
+            mongo_db_client.get_async_database_conn(grpc_model, "unknown")
+            for _ in range(5)
+        ],
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, GenomeNotFoundError) for result in results)
+    assert grpc_model.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_lock_holder_is_waited_for(mongo_db_client):
+    cache = enable_fake_redis(mongo_db_client)
+    mongo_db_client.release_lookup_lock_ms = 1000
+    grpc_model = CountingAsyncGrpcModel()
+
+    # Pretend another worker holds the lock and then stores the release
+    await cache.set("release_lookup_lock:genome_1", 1)
+
+    async def other_worker():
+        await asyncio.sleep(0.05)
+        await cache.set("genome_1", "111.1")
+
+    conn, _ = await asyncio.gather(
+        mongo_db_client.get_async_database_conn(grpc_model, "genome_1"),
+        other_worker(),
+    )
+
+    assert conn.name == "release_111_1"
+    assert grpc_model.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_redis_lock_is_released(mongo_db_client):
+    cache = enable_fake_redis(mongo_db_client)
+    mongo_db_client.release_lookup_lock_ms = 1000
+    grpc_model = CountingAsyncGrpcModel()
+
+    await mongo_db_client.get_async_database_conn(grpc_model, "genome_1")
+
+    assert grpc_model.calls == 1
+    assert "release_lookup_lock:genome_1" not in cache.store
+
+
+class MgetCountingRedis(FakeAsyncRedis):
+    def __init__(self):
+        super().__init__()
+        self.mget_calls = 0
+
+    async def mget(self, keys):
+        self.mget_calls += 1
+        return await super().mget(keys)
+
+
+@pytest.mark.asyncio
+async def test_batched_release_resolution(mongo_db_client):
+    cache = MgetCountingRedis()
+    mongo_db_client.async_cache = cache
+    mongo_db_client.redis_cache_enabled = True
+    await cache.set("in_redis", "109.1")
+    mongo_db_client.release_cache.set("in_l1", "108.1")
+    grpc_model = CountingAsyncGrpcModel()
+
+    connections = await mongo_db_client.get_async_database_conns(
+        grpc_model, ["in_l1", "in_redis", "in_grpc_1", "in_grpc_2"]
+    )
+
+    assert [conn.name for conn in connections] == [
+        "release_108_1",
+        "release_109_1",
+        "release_110_1",
+        "release_110_1",
+    ]
+    assert cache.mget_calls == 1
+    assert grpc_model.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_batched_release_resolution_returns_errors_per_genome(
+    mongo_db_client,
+):
+    mongo_db_client.release_cache.set("known", "110.1")
+    grpc_model = CountingAsyncGrpcModel(release_version="")
+
+    known, unknown = await mongo_db_client.get_async_database_conns(
+        grpc_model, ["known", "unknown"]
+    )
+
+    assert known.name == "release_110_1"
+    assert isinstance(unknown, GenomeNotFoundError)
+
+
+async def insert_release_genomes(mongo_db_client, db_name, count):
+    await mongo_db_client.async_mongo_client[db_name]["genome"].insert_many(
+        [{"genome_id": f"{db_name}_genome_{i}", "name": "x"} for i in range(count)]
+    )
+
+
+@pytest.mark.asyncio
+async def test_warmup_writes_chunked_pipelines(mongo_db_client):
+    cache = enable_fake_redis(mongo_db_client)
+    mongo_db_client.warmup_chunk_size = 2
+    await insert_release_genomes(mongo_db_client, "release_110_1", 3)
+    await insert_release_genomes(mongo_db_client, "release_111_1", 2)
+    await insert_release_genomes(mongo_db_client, "not_a_release", 1)
+
+    await mongo_db_client.warmup_cache_from_mongo()
+
+    assert cache.store["release_110_1_genome_2"] == b"110.1"
+    assert cache.store["release_111_1_genome_0"] == b"111.1"
+    assert "not_a_release_genome_0" not in cache.store
+    assert cache.store["warmup_done:release_110_1"] == b"110.1"
+    # The markers expire with the entries they vouch for
+    assert cache.expiries["warmup_done:release_110_1"] == mongo_db_client.redis_expiry
+    assert cache.expiries["release_110_1_genome_2"] == mongo_db_client.redis_expiry
+    # 5 routes in chunks of 2, plus the markers
+    assert cache.pipelines_executed == 4
+    assert mongo_db_client.warmup_stats["keys"] == 5
+    assert mongo_db_client.warmup_stats["databases_warmed"] == 2
+    assert mongo_db_client.warmup_stats["seconds"] is not None
+
+
+@pytest.mark.asyncio
+async def test_warmup_skips_warmed_databases_and_keeps_entries(mongo_db_client):
+    cache = enable_fake_redis(mongo_db_client)
+    await insert_release_genomes(mongo_db_client, "release_110_1", 2)
+    await insert_release_genomes(mongo_db_client, "release_111_1", 2)
+    # Warmed recently: the marker has not expired yet
+    await cache.set("warmup_done:release_110_1", "110.1", ex=60)
+    await cache.set("release_111_1_genome_0", "112.1")
+
+    await mongo_db_client.warmup_cache_from_mongo()
+
+    assert "release_110_1_genome_0" not in cache.store
+    assert cache.store["release_111_1_genome_0"] == b"112.1"
+    assert mongo_db_client.warmup_stats["databases_skipped"] == 1
+    assert mongo_db_client.warmup_stats["databases_warmed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_warmup_routes_shared_genomes_to_the_newest_release(mongo_db_client):
+    cache = enable_fake_redis(mongo_db_client)
+    # The newest release is the smallest, so it is read first
+    await insert_release_genomes(mongo_db_client, "release_110_1", 50)
+    for db_name in ("release_110_1", "release_111_1"):
+        await mongo_db_client.async_mongo_client[db_name]["genome"].insert_one(
+            {"genome_id": "shared"}
+        )
+
+    await mongo_db_client.warmup_cache_from_mongo()
+
+    assert cache.store["shared"] == b"111.1"
+
+
+@pytest.mark.asyncio
+async def test_warmup_runs_as_background_task(mongo_db_client):
+    cache = enable_fake_redis(mongo_db_client)
+    mongo_db_client.warmup_cache_on_start = True
+    await insert_release_genomes(mongo_db_client, "release_110_1", 1)
+
+    mongo_db_client.start_background_tasks()
+    await asyncio.gather(*mongo_db_client.background_tasks)
+
+    assert cache.store["release_110_1_genome_0"] == b"110.1"
+
+
+@pytest.mark.asyncio
+async def test_release_catalog_routes_new_releases(mongo_db_client):
+    cache = enable_fake_redis(mongo_db_client)
+    grpc_model = CountingAsyncGrpcModel()
+    await insert_release_genomes(mongo_db_client, "release_110_1", 1)
+
+    assert await mongo_db_client.refresh_release_catalog()
+    assert not await mongo_db_client.refresh_release_catalog()
+    assert cache.store["release_110_1_genome_0"] == b"110.1"
+
+    # A new release moves an existing genome and adds another one
+    await mongo_db_client.async_mongo_client["release_111_1"]["genome"].insert_many(
+        [{"genome_id": "release_110_1_genome_0"}, {"genome_id": "new_genome"}]
+    )
+    mongo_db_client.release_cache.set("release_110_1_genome_0", "110.1")
+    assert await mongo_db_client.refresh_release_catalog()
+
+    moved, new = await mongo_db_client.get_async_database_conns(
+        grpc_model, ["release_110_1_genome_0", "new_genome"]
+    )
+    assert (moved.name, new.name) == ("release_111_1", "release_111_1")
+    assert cache.store["new_genome"] == b"111.1"
+    assert grpc_model.calls == 0
+
+    # Dropping the release removes its routes
+    await mongo_db_client.async_mongo_client.drop_database("release_111_1")
+    assert await mongo_db_client.refresh_release_catalog()
+    assert "new_genome" not in cache.store
+    assert mongo_db_client.release_catalog.get("new_genome") is None
+
+
+@pytest.mark.asyncio
+async def test_release_catalog_pushes_expiring_routes(mongo_db_client):
+    "Routes overwrite stale entries and expire like those of gRPC lookups"
+    cache = enable_fake_redis(mongo_db_client)
+    mongo_db_client.redis_expiry = 60
+    await insert_release_genomes(mongo_db_client, "release_110_1", 1)
+    # A warm-up entry from before the genome moved release
+    await cache.set("release_110_1_genome_0", "109.1")
+
+    assert await mongo_db_client.refresh_release_catalog()
+
+    assert cache.store["release_110_1_genome_0"] == b"110.1"
+    assert cache.expiries["release_110_1_genome_0"] == 60
+
+
+class FailingAsyncGrpcModel:
+    async def get_release_by_genome_uuid(self, _genome_uuid):
+        raise grpc.RpcError("metadata service down")
+
+
+@pytest.mark.asyncio
+async def test_grpc_routes_before_the_release_catalog(mongo_db_client):
+    await insert_release_genomes(mongo_db_client, "release_110_1", 1)
+    assert await mongo_db_client.refresh_release_catalog()
+
+    (conn,) = await mongo_db_client.get_async_database_conns(
+        CountingAsyncGrpcModel(release_version="112.1"), ["release_110_1_genome_0"]
+    )
+    assert conn.name == "release_112_1"
+
+    # The catalog only answers when gRPC cannot
+    mongo_db_client.release_cache.invalidate()
+    (conn,) = await mongo_db_client.get_async_database_conns(
+        FailingAsyncGrpcModel(), ["release_110_1_genome_0"]
+    )
+    assert conn.name == "release_110_1"
+
+
+@pytest.mark.asyncio
+async def test_invalidation_drops_catalog_routes(mongo_db_client):
+    await insert_release_genomes(mongo_db_client, "release_110_1", 2)
+    assert await mongo_db_client.refresh_release_catalog()
+
+    await mongo_db_client.publish_release_invalidation("release_110_1_genome_0")
+    assert mongo_db_client.release_catalog.get("release_110_1_genome_0") is None
+    assert mongo_db_client.release_catalog.get("release_110_1_genome_1") == "110.1"
+
+    await mongo_db_client.publish_release_invalidation()
+    assert not mongo_db_client.release_catalog.routes
+
+
+class FlakyPubSub:
+    "Fails to subscribe the first time, then delivers `messages`"
+
+    attempts = 0
+
+    def __init__(self, messages):
+        self.messages = messages
+
+    async def subscribe(self, _channel):
+        FlakyPubSub.attempts += 1
+        if FlakyPubSub.attempts == 1:
+            raise redis.ConnectionError("Redis restarting")
+
+    async def listen(self):
+        for message in self.messages:
+            yield message
+        await asyncio.Event().wait()
+
+    async def aclose(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_invalidation_listener_survives_redis_restarts(
+    mongo_db_client, monkeypatch
+):
+    monkeypatch.setattr(db, "INVALIDATION_RETRY_MIN_SECONDS", 0)
+    monkeypatch.setattr(FlakyPubSub, "attempts", 0)
+    cache = enable_fake_redis(mongo_db_client)
+    cache.pubsub = lambda: FlakyPubSub([{"type": "message", "data": b"genome_1"}])
+    mongo_db_client.release_invalidation_channel = "invalidations"
+    mongo_db_client.release_cache.set("genome_1", "110.1")
+
+    listener = asyncio.create_task(mongo_db_client.listen_for_release_invalidations())
+    for _ in range(100):
+        if mongo_db_client.release_cache.get("genome_1") is None:
+            break
+        await asyncio.sleep(0)
+    listener.cancel()
+
+    assert FlakyPubSub.attempts == 2
+    assert mongo_db_client.release_cache.get("genome_1") is None
+
+
+def test_release_databases_decode_lazily_when_enabled(mongo_db_client):
+    # mongomock ignores codec options, a real client does not need a server here
+    mongo_db_client.async_mongo_client = pymongo.AsyncMongoClient(
+        "mongodb://localhost:1", connect=False
+    )
+    eager = mongo_db_client.get_release_database("release_110_1")
+    mongo_db_client.lazy_bson_decoding = True
+    lazy = mongo_db_client.get_release_database("release_110_1")
+
+    assert eager.codec_options.document_class is not LazyDocument
+    assert lazy.codec_options.document_class is LazyDocument
+    assert lazy.name == "release_110_1"
@@ -0,0 +1,137 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import asyncio
+import random
+
+import mongomock
+import mongomock_motor
+import pytest
+from bson import ObjectId
+
+from common.interval_index import IntervalIndex, IntervalIndexCache
+
+REGION_ID = "genome_1_1_chromosome"
+OTHER_REGION_ID = "genome_1_2_chromosome"
+
+
+def random_features(count, seed=7):
+    rng = random.Random(seed)
+    features = []
+    for _ in range(count):
+        start = rng.randint(1, 1_000_000)
+        end = start + rng.choice([0, 50, 5_000, 200_000])
+        features.append((start, end, ObjectId()))
+    # A feature across the origin of a circular region
+    features.append((999_000, 200, ObjectId()))
+    return features
+
+
+def brute_force(features, start, end):
+    return {
+        feature_id
+        for feature_start, feature_end, feature_id in features
+        if feature_start <= end and feature_end >= start
+    }
+
+
+@pytest.fixture(name="database")
+def fixture_database():
+    client = mongomock.MongoClient()
+    for region_id, seed in ((REGION_ID, 7), (OTHER_REGION_ID, 8)):
+        client.db.gene.insert_many(
+            [
+                {
+                    "_id": feature_id,
+                    "type": "Gene",
+                    "genome_id": "genome_1",
+                    "slice": {
+                        "region_id": region_id,
+                        "location": {"start": start, "end": end},
+                    },
+                }
+                for start, end, feature_id in random_features(200, seed)
+            ]
+        )
+    return mongomock_motor.AsyncMongoMockClient(mock_mongo_client=client)["db"]
+
+
+def test_overlapping_matches_a_scan():
+    features = random_features(2000)
+    index = IntervalIndex.from_features(features)
+    rng = random.Random(3)
+
+    for _ in range(300):
+        start = rng.randint(1, 1_000_000)
+        end = start + rng.choice([0, 100, 10_000])
+        found = index.overlapping(start, end)
+
+        assert set(found) == brute_force(features, start, end)
+        assert len(found) == len(set(found))
+
+
+def test_save_and_memory_map(tmp_path):
+    features = random_features(500)
+    index = IntervalIndex.from_features(features)
+    path = str(tmp_path / "genes.idx")
+
+    index.save(path)
+    loaded = IntervalIndex.load(path)
+
+    assert len(loaded) == len(index)
+    assert loaded.max_length == index.max_length
+    assert loaded.overlapping(5_000, 60_000) == index.overlapping(5_000, 60_000)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_build(database):
+    indexes = IntervalIndexCache(max_bytes=10**6)
+
+    first, second = await asyncio.gather(
+        indexes.get(database, "genome_1", REGION_ID, "Gene"),
+        indexes.get(database, "genome_1", REGION_ID, "Gene"),
+    )
+
+    assert first is second
+    assert len(first) == 201
+    assert indexes.stats()["builds"] == 1
+
+
+@pytest.mark.asyncio
+async def test_memory_cap_evicts_least_recently_used(database):
+    indexes = IntervalIndexCache(max_bytes=201 * 28 + 1)
+
+    await indexes.get(database, "genome_1", REGION_ID, "Gene")
+    await indexes.get(database, "genome_1", OTHER_REGION_ID, "Gene")
+    await indexes.get(database, "genome_1", REGION_ID, "Gene")
+
+    assert indexes.stats() == {
+        "indexes": 1,
+        "bytes": 201 * 28,
+        "builds": 3,
+        "evictions": 2,
+    }
+
+
+@pytest.mark.asyncio
+async def test_workers_share_the_index_files(database, tmp_path):
+    builder = IntervalIndexCache(max_bytes=10**6, directory=str(tmp_path))
+    other_worker = IntervalIndexCache(max_bytes=10**6, directory=str(tmp_path))
+
+    built = await builder.get(database, "genome_1", REGION_ID, "Gene")
+    loaded = await other_worker.get(database, "genome_1", REGION_ID, "Gene")
+
+    assert other_worker.stats()["builds"] == 0
+    assert loaded.buffer is not None
+    assert loaded.overlapping(1, 1_000_000) == built.overlapping(1, 1_000_000)
@@ -0,0 +1,85 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import pickle
+
+import bson
+
+from common.cache_codec import ResultCodec
+from common.lazy_bson import LAZY_CODEC_OPTIONS, LazyDocument
+from graphql_service.resolver.transcript_order import sort_gene_transcripts
+
+GENE = {
+    "stable_id": "ENSG00000139618.15",
+    "symbol": "BRCA2",
+    "metadata": {"name": {"accession_id": "HGNC:1101", "url": None}},
+    "transcripts": [{"stable_id": "ENST00000380152.8"}, {"stable_id": "ENST1"}],
+    "obsolete": None,
+}
+
+
+def lazy(document):
+    (decoded,) = bson.decode_all(bson.encode(document), LAZY_CODEC_OPTIONS)
+    return decoded
+
+
+def test_sub_documents_are_lazy():
+    gene = lazy(GENE)
+
+    assert isinstance(gene, LazyDocument)
+    assert isinstance(gene["metadata"], LazyDocument)
+    assert all(isinstance(t, LazyDocument) for t in gene["transcripts"])
+    assert gene["metadata"]["name"]["accession_id"] == "HGNC:1101"
+    assert dict(gene.items()) == GENE
+
+
+def test_writes_go_to_the_overlay():
+    gene = lazy(GENE)
+    gene["id"] = "ENSG00000139618"
+    gene["metadata"]["name"]["url"] = "https://www.genenames.org/"
+    for transcript in gene["transcripts"]:
+        transcript["gene"] = "BRCA2"
+    del gene["obsolete"]
+
+    assert gene["id"] == "ENSG00000139618"
+    assert gene["metadata"]["name"]["url"] == "https://www.genenames.org/"
+    assert [t["gene"] for t in gene["transcripts"]] == ["BRCA2", "BRCA2"]
+    assert "obsolete" not in gene
+    assert gene.get("obsolete", "missing") == "missing"
+    assert list(gene) == ["stable_id", "symbol", "metadata", "transcripts", "id"]
+    assert len(gene) == 5
+
+
+def test_cache_codec_and_pickle_read_lazy_documents():
+    gene = lazy(GENE)
+
+    assert ResultCodec().decode(ResultCodec().encode([gene])) == [GENE]
+    assert dict(pickle.loads(pickle.dumps(gene)).items()) == GENE
+
+
+def test_transcript_order_reads_lazy_documents():
+    transcripts = [
+        {"stable_id": "ENST2", "metadata": {"biotype": {"value": "lncRNA"}}},
+        {
+            "stable_id": "ENST1",
+            "metadata": {
+                "mane": {"value": "select"},
+                "biotype": {"value": "protein_coding"},
+            },
+        },
+    ]
+
+    ordered = sort_gene_transcripts([lazy(t) for t in transcripts])
+
+    assert [t["stable_id"] for t in ordered] == ["ENST1", "ENST2"]
@@ -0,0 +1,86 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from common.release_cache import ReleaseVersionCache, FLUSH_ALL_MESSAGE
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_hits_and_misses_are_counted():
+    cache = ReleaseVersionCache(max_size=10, ttl_seconds=60)
+
+    assert cache.get("genome_1") is None
+    cache.set("genome_1", "110.1")
+    assert cache.get("genome_1") == "110.1"
+
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 1, "evictions": 0}
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = ReleaseVersionCache(max_size=10, ttl_seconds=60, clock=clock)
+    cache.set("genome_1", "110.1")
+
+    clock.now = 59
+    assert cache.get("genome_1") == "110.1"
+    clock.now = 61
+    assert cache.get("genome_1") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ReleaseVersionCache(max_size=2, ttl_seconds=60)
+    cache.set("genome_1", "110.1")
+    cache.set("genome_2", "110.1")
+    # Touch genome_1 so that genome_2 becomes the least recently used
+    cache.get("genome_1")
+    cache.set("genome_3", "111.1")
+
+    assert cache.get("genome_2") is None
+    assert cache.get("genome_1") == "110.1"
+    assert cache.get("genome_3") == "111.1"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disabled_cache_never_stores():
+    cache = ReleaseVersionCache(max_size=0)
+    cache.set("genome_1", "110.1")
+
+    assert not cache.enabled
+    assert cache.get("genome_1") is None
+
+
+def test_invalidation_messages():
+    cache = ReleaseVersionCache(max_size=10, ttl_seconds=60)
+    cache.set("genome_1", "110.1")
+    cache.set("genome_2", "110.1")
+
+    # Subscription confirmations are ignored
+    cache.handle_invalidation_message({"type": "subscribe", "data": 1})
+    assert len(cache) == 2
+
+    cache.handle_invalidation_message({"type": "message", "data": b"genome_1"})
+    assert cache.get("genome_1") is None
+    assert cache.get("genome_2") == "110.1"
+
+    cache.handle_invalidation_message(
+        {"type": "message", "data": FLUSH_ALL_MESSAGE.encode("utf-8")}
+    )
+    assert len(cache) == 0
@@ -0,0 +1,57 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import pytest
+
+from common.release_catalog import (
+    ReleaseCatalog,
+    is_release_database,
+    release_sort_key,
+    release_version_of,
+)
+
+
+def test_release_database_names():
+    assert is_release_database("release_110_1")
+    assert not is_release_database("release_110")
+    assert not is_release_database("admin")
+    assert release_version_of("release_115_4") == "115.4"
+    # Numeric, not lexicographic, ordering
+    assert release_sort_key("release_9_1") < release_sort_key("release_10_1")
+    with pytest.raises(ValueError):
+        release_sort_key("admin")
+
+
+def test_newest_release_wins():
+    routes = ReleaseCatalog.build_routes(
+        {
+            "release_10_1": ["genome_1"],
+            "release_9_1": ["genome_1", "genome_2"],
+        }
+    )
+
+    assert routes == {"genome_1": "10.1", "genome_2": "9.1"}
+
+
+def test_diff_and_replace():
+    catalog = ReleaseCatalog()
+    catalog.replace(["release_9_1"], {"genome_1": "9.1", "genome_2": "9.1"})
+
+    assert not catalog.has_changed(["release_9_1"])
+    assert catalog.has_changed(["release_9_1", "release_10_1"])
+
+    changed, removed = catalog.diff({"genome_1": "10.1", "genome_3": "10.1"})
+    assert changed == {"genome_1": "10.1", "genome_3": "10.1"}
+    assert removed == ["genome_2"]
+    assert catalog.get("genome_2") == "9.1"
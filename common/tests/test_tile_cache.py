@@ -0,0 +1,54 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from bson import ObjectId
+
+from common.tile_cache import OverlapTileCache, decode_entries, encode_entries
+
+
+def test_tiles_of_a_window():
+    tile_cache = OverlapTileCache(tile_size=100)
+
+    assert list(tile_cache.tiles(1, 100)) == [0]
+    assert list(tile_cache.tiles(100, 101)) == [0, 1]
+    assert list(tile_cache.tiles(150, 420)) == [1, 2, 3, 4]
+    assert tile_cache.bounds(3) == (301, 400)
+
+
+def test_entries_round_trip():
+    entries = [(10, 100, ObjectId()), (2**40, 2**40 + 5, ObjectId())]
+
+    assert decode_entries(encode_entries(entries)) == entries
+    assert len(encode_entries(entries)) == 56
+    assert not decode_entries(b"")
+
+
+def test_least_recently_used_tiles_are_evicted():
+    tile_cache = OverlapTileCache(tile_size=100, max_tiles=2)
+    tile_cache.put(("release", "chr1", "Gene", 100, 0), [])
+    tile_cache.put(("release", "chr1", "Gene", 100, 1), [])
+    assert tile_cache.get(("release", "chr1", "Gene", 100, 0)) == []
+    tile_cache.put(("release", "chr1", "Gene", 100, 2), [])
+
+    assert tile_cache.get(("release", "chr1", "Gene", 100, 1)) is None
+    assert tile_cache.stats() == {"tiles": 2, "hits": 1, "misses": 1}
+
+
+def test_from_config():
+    assert OverlapTileCache.from_config({}) is None
+    assert OverlapTileCache.from_config({"OVERLAP_TILE_SIZE": "0"}) is None
+    tile_cache = OverlapTileCache.from_config(
+        {"OVERLAP_TILE_SIZE": "100000", "OVERLAP_TILE_CACHE_SIZE": "50"}
+    )
+    assert (tile_cache.tile_size, tile_cache.max_tiles) == (100000, 50)
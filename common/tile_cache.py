@@ -0,0 +1,114 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+Tile-aligned cache of overlap_region results.
+
+Genome browsers pan: every window is slightly shifted from the previous one,
+so whole-window results are never reused. Windows are instead split into
+fixed tiles (OVERLAP_TILE_SIZE bases) and the (start, end, _id) of the
+features overlapping each tile are cached, per (release database, region,
+feature type, tile). A shifted window mostly reads the tiles of the previous
+one; its features are the entries of its tiles, deduplicated, that overlap
+the window, loaded by id.
+
+Tile entries are kept in an in-process LRU in front of Redis, where they are
+stored packed (28 bytes per feature) under the release namespace of the
+DataLoader cache.
+"""
+
+import struct
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+# start, end, ObjectId
+TILE_ENTRY = struct.Struct("<qq12s")
+# Wider windows are not worth splitting: they hit the result limit anyway
+MAX_WINDOW_TILES = 32
+
+TileEntry = Tuple[int, int, ObjectId]
+
+
+def encode_entries(entries: List[TileEntry]) -> bytes:
+    return b"".join(
+        TILE_ENTRY.pack(start, end, feature_id.binary)
+        for start, end, feature_id in entries
+    )
+
+
+def decode_entries(data: bytes) -> List[TileEntry]:
+    return [
+        (start, end, ObjectId(feature_id))
+        for start, end, feature_id in TILE_ENTRY.iter_unpack(data)
+    ]
+
+
+class OverlapTileCache:
+    """
+    In-process LRU of the entries of at most `max_tiles` tiles of
+    `tile_size` bases. Release databases never change, entries never go stale
+    """
+
+    def __init__(self, tile_size: int, max_tiles: int = 10000):
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self.hits = 0
+        self.misses = 0
+        self._tiles: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config) -> Optional["OverlapTileCache"]:
+        "None unless OVERLAP_TILE_SIZE is set"
+        tile_size = int(config.get("OVERLAP_TILE_SIZE", 0))
+        if tile_size <= 0:
+            return None
+        return cls(tile_size, int(config.get("OVERLAP_TILE_CACHE_SIZE", 10000)))
+
+    def tiles(self, start: int, end: int) -> range:
+        "Tiles overlapping the 1-based, inclusive [start, end] window"
+        return range(
+            (max(start, 1) - 1) // self.tile_size,
+            (max(end, 1) - 1) // self.tile_size + 1,
+        )
+
+    def bounds(self, tile: int) -> Tuple[int, int]:
+        "1-based, inclusive coordinates of a tile"
+        return tile * self.tile_size + 1, (tile + 1) * self.tile_size
+
+    def key(
+        self, database_name: str, region_id: str, feature_type: str, tile: int
+    ) -> Tuple:
+        return (database_name, region_id, feature_type, self.tile_size, tile)
+
+    def get(self, key: Tuple) -> Optional[List[TileEntry]]:
+        with self._lock:
+            entries = self._tiles.get(key)
+            if entries is None:
+                self.misses += 1
+                return None
+            self._tiles.move_to_end(key)
+            self.hits += 1
+            return entries
+
+    def put(self, key: Tuple, entries: List[TileEntry]) -> None:
+        with self._lock:
+            self._tiles[key] = entries
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"tiles": len(self._tiles), "hits": self.hits, "misses": self.misses}
@@ -13,9 +13,6 @@
 """
 
 import logging
-from typing import List
-
-from graphql import GraphQLResolveInfo, FieldNode
 
 logger = logging.getLogger(__name__)
 
@@ -64,29 +61,3 @@ def process_release_version(grpc_release_version):
     release_version = str(grpc_release_version).replace(".", "_")
     logger.debug("[get_database_conn] release_version: %s", release_version)
     return "release_" + release_version
-
-
-def check_requested_fields(info: GraphQLResolveInfo, fields: List[str]) -> List[bool]:
-    """
-    Check if specific fields are requested in the GraphQL query.
-
-    Args:
-        info (GraphQLResolveInfo): The GraphQL resolve information containing query details.
-        fields (List[str]): A list of field names to check for in the query.
-
-    Returns:
-        List[bool]: A list of booleans indicating whether each field is present in the query.
-
-    Usage example:
-        fields_to_check = ["assembly", "dataset"]
-        is_assembly_present, is_dataset_present = check_requested_fields(info, fields_to_check)
-    """
-    requested_fields = []
-    if info.field_nodes:
-        selection_set = info.field_nodes[0].selection_set
-        if selection_set and selection_set.selections:
-            for field in selection_set.selections:
-                if isinstance(field, FieldNode) and field.name and field.name.value:
-                    requested_fields.append(field.name.value)
-
-    return [field in requested_fields for field in fields]
@@ -31,6 +31,7 @@ from graphql_service.resolver.gene_model import (
     ORGANISM_TYPE,
     SPECIES_TYPE,
     TRANSCRIPT_PAGE_TYPE,
+    LOCUS_TYPE,
 )
 
 
@@ -53,6 +54,7 @@ def prepare_executable_schema() -> GraphQLSchema:
         ORGANISM_TYPE,
         SPECIES_TYPE,
         TRANSCRIPT_PAGE_TYPE,
+        LOCUS_TYPE,
     )
 
 
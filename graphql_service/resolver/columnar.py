@@ -0,0 +1,249 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+Columnar binary response of the features of a slice, for genome browsers.
+
+GET /features?genome_id=...&region_name=13&start=...&end=...&feature_type=gene
+takes the arguments (and filters) of SliceInput. The features are appended
+column by column straight from the projected MongoDB cursor, no document is
+completed by GraphQL nor serialised as JSON, and the browser can view each
+column as a typed array without copying it.
+
+The body is little-endian, with the columns in this order so that each one
+is aligned for its typed array:
+    magic      4 bytes, b"TFC1"
+    n          uint32, number of features
+    m          uint32, number of distinct biotypes
+    starts     uint32[n]
+    ends       uint32[n]
+    id_offsets uint32[n + 1], stable id i is ids[id_offsets[i]:id_offsets[i + 1]]
+    bt_offsets uint32[m + 1], the same for the biotype dictionary
+    biotypes   uint16[n], index in the biotype dictionary, 0xFFFF if none
+    strands    int8[n], 1, -1 or 0 if unknown
+    ids        UTF-8 stable ids, concatenated
+    bt_names   UTF-8 biotype names, concatenated
+"""
+
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List
+
+from graphql import GraphQLError
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from graphql_service.resolver import gene_model
+from graphql_service.resolver.exceptions import SliceLimitExceededError
+
+MEDIA_TYPE = "application/vnd.ensembl.thoas.features"
+MAGIC = b"TFC1"
+HEADER = struct.Struct("<4sII")
+NO_BIOTYPE = 0xFFFF
+# Rows are a few dozen bytes, dense regions can be sent whole
+MAX_FEATURES = 50000
+FEATURE_TYPES = {"gene": "Gene", "transcript": "Transcript"}
+PROJECTION = {
+    "stable_id": 1,
+    "slice.location.start": 1,
+    "slice.location.end": 1,
+    "slice.strand.value": 1,
+    "metadata.biotype.value": 1,
+}
+
+
+class FeatureColumns:
+    "Columns of features, appended to one by one"
+
+    def __init__(self):
+        self.starts = array("I")
+        self.ends = array("I")
+        self.strands = array("b")
+        self.biotypes = array("H")
+        self.id_offsets = array("I", [0])
+        self.ids = bytearray()
+        self.biotype_codes: Dict[str, int] = {}
+
+    def append(self, feature: Dict) -> None:
+        feature_slice = feature["slice"]
+        self.starts.append(feature_slice["location"]["start"])
+        self.ends.append(feature_slice["location"]["end"])
+        self.strands.append((feature_slice.get("strand") or {}).get("value") or 0)
+
+        biotype = ((feature.get("metadata") or {}).get("biotype") or {}).get("value")
+        if biotype is None:
+            self.biotypes.append(NO_BIOTYPE)
+        else:
+            self.biotypes.append(
+                self.biotype_codes.setdefault(biotype, len(self.biotype_codes))
+            )
+
+        self.ids += feature["stable_id"].encode("utf-8")
+        self.id_offsets.append(len(self.ids))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def encode(self) -> bytes:
+        names = [name.encode("utf-8") for name in self.biotype_codes]
+        name_offsets = array("I", [0])
+        for name in names:
+            name_offsets.append(name_offsets[-1] + len(name))
+
+        columns = [
+            self.starts,
+            self.ends,
+            self.id_offsets,
+            name_offsets,
+            self.biotypes,
+            self.strands,
+        ]
+        if sys.byteorder == "big":
+            columns = [array(column.typecode, column) for column in columns]
+            for column in columns:
+                column.byteswap()
+        return b"".join(
+            [HEADER.pack(MAGIC, len(self), len(names))]
+            + [column.tobytes() for column in columns]
+            + [bytes(self.ids)]
+            + names
+        )
+
+
+def decode(data: bytes) -> Dict[str, List]:
+    "The columns of an encoded response, for Python clients and tests"
+    magic, count, biotype_count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a feature columns response")
+
+    offset = HEADER.size
+    columns = {}
+    for name, typecode, length in [
+        ("starts", "I", count),
+        ("ends", "I", count),
+        ("id_offsets", "I", count + 1),
+        ("biotype_offsets", "I", biotype_count + 1),
+        ("biotypes", "H", count),
+        ("strands", "b", count),
+    ]:
+        column = array(typecode)
+        column.frombytes(data[offset : offset + column.itemsize * length])
+        if sys.byteorder == "big":
+            column.byteswap()
+        columns[name] = column
+        offset += column.itemsize * length
+
+    ids = data[offset : offset + columns["id_offsets"][-1]]
+    offset += len(ids)
+    names = data[offset:]
+    biotype_names = [
+        names[start:end].decode("utf-8")
+        for start, end in zip(
+            columns["biotype_offsets"], columns["biotype_offsets"][1:]
+        )
+    ]
+    return {
+        "stable_ids": [
+            ids[start:end].decode("utf-8")
+            for start, end in zip(columns["id_offsets"], columns["id_offsets"][1:])
+        ],
+        "starts": list(columns["starts"]),
+        "ends": list(columns["ends"]),
+        "strands": list(columns["strands"]),
+        "biotypes": [
+            None if code == NO_BIOTYPE else biotype_names[code]
+            for code in columns["biotypes"]
+        ],
+    }
+
+
+def slice_arguments(request: Request) -> Dict[str, Any]:
+    "SliceInput from the query string, ValueError if it is not valid"
+    params = request.query_params
+    by_slice: Dict[str, Any] = {
+        "genome_id": params["genome_id"],
+        "region_name": params["region_name"],
+        "start": int(params["start"]),
+        "end": int(params["end"]),
+        "biotypes": params.getlist("biotype") or None,
+    }
+    for name in ("strand", "min_length", "max_length"):
+        if name in params:
+            by_slice[name] = int(params[name])
+    by_slice["canonical_only"] = params.get("canonical_only") == "true"
+    return by_slice
+
+
+async def fetch_feature_columns(
+    mongo_client, async_grpc_model, by_slice: Dict[str, Any], feature_type: str
+) -> bytes:
+    "The encoded features of a slice, see the module docstring"
+    genome_id = by_slice["genome_id"]
+    (connection,) = await mongo_client.get_async_database_conns(
+        async_grpc_model, [genome_id]
+    )
+    if isinstance(connection, Exception):
+        raise connection
+
+    query = gene_model.overlap_query(
+        genome_id,
+        gene_model.slice_region_id(genome_id, by_slice["region_name"]),
+        by_slice["start"],
+        by_slice["end"],
+        feature_type,
+        await mongo_client.has_overlap_bins(connection),
+        gene_model.slice_filters(by_slice),
+    )
+    columns = FeatureColumns()
+    cursor = (
+        connection[feature_type.lower()]
+        .find(query, PROJECTION)
+        .sort([("slice.location.start", 1), ("_id", 1)])
+        .limit(MAX_FEATURES)
+    )
+    async for feature in cursor:
+        columns.append(feature)
+    if len(columns) == MAX_FEATURES:
+        raise SliceLimitExceededError(MAX_FEATURES)
+    return columns.encode()
+
+
+def error_response(message: str, code: str) -> JSONResponse:
+    return JSONResponse(
+        {"errors": [{"message": message, "extensions": {"code": code}}]},
+        status_code=400,
+    )
+
+
+def features_endpoint(mongo_client, async_grpc_model):
+    "Starlette endpoint serving GET /features"
+
+    async def endpoint(request: Request) -> Response:
+        try:
+            by_slice = slice_arguments(request)
+            feature_type = FEATURE_TYPES[
+                request.query_params.get("feature_type", "gene")
+            ]
+        except (KeyError, ValueError) as exc:
+            return error_response(f"Invalid slice: {exc}", "BAD_USER_INPUT")
+
+        try:
+            body = await fetch_feature_columns(
+                mongo_client, async_grpc_model, by_slice, feature_type
+            )
+        except GraphQLError as exc:
+            extensions = exc.extensions or {}
+            return error_response(exc.message, extensions.get("code", "BAD_REQUEST"))
+        return Response(body, media_type=MEDIA_TYPE)
+
+    return endpoint
@@ -0,0 +1,52 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+Opaque continuation tokens of the Locus pages. A cursor is the position of
+the last feature of a page in the (slice.location.start, _id) order, so the
+next page is an index range scan starting right after it.
+"""
+
+import base64
+import binascii
+from typing import Dict, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from graphql_service.resolver.exceptions import InvalidCursorError
+
+
+def encode_cursor(start: int, feature_id: ObjectId) -> str:
+    position = f"{start}:{feature_id}".encode("ascii")
+    return base64.urlsafe_b64encode(position).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, ObjectId]:
+    "The (start, _id) of a cursor, InvalidCursorError if it is not one"
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        start, feature_id = base64.urlsafe_b64decode(padded).decode("ascii").split(":")
+        return int(start), ObjectId(feature_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError, InvalidId) as exc:
+        raise InvalidCursorError(cursor) from exc
+
+
+def after_cursor(position: Tuple[int, ObjectId]) -> Dict:
+    "Filter on the features after `position` in the (start, _id) order"
+    start, feature_id = position
+    return {
+        "$or": [
+            {"slice.location.start": {"$gt": start}},
+            {"slice.location.start": start, "_id": {"$gt": feature_id}},
+        ]
+    }
@@ -12,23 +12,76 @@
    limitations under the License.
 """
 
+import asyncio
+import functools
 import logging
 from collections import defaultdict
-from typing import List, Dict
+from typing import Any, Awaitable, List, Dict, Optional, Set, Tuple
 
+import redis
 from aiodataloader import DataLoader
+from bson import ObjectId
+from common.cache_codec import ResultCodec
+from common.dataloader_cache import cache_key, canonical_query, store_results
 from common.db import MongoDbClient
-import pickle
+from graphql_service.resolver import transcript_order
+from graphql_service.resolver.projection import (
+    TRANSCRIPT_SORT_FIELDS,
+    projection_covers,
+)
 
 logger = logging.getLogger(__name__)
 
+# Cached payloads and query results at least this large are (de)serialised in a
+# worker thread instead of on the event loop
+OFFLOAD_SERIALIZATION_BYTES = 64 * 1024
+OFFLOAD_SERIALIZATION_DOCS = 200
+
+# Write-behind cache SETs that have not completed yet
+PENDING_CACHE_WRITES: Set[asyncio.Task] = set()
+
+# Cached rankings of the transcripts of genes, see batch_transcript_rank_load()
+TRANSCRIPT_RANK_KEY = "transcript_rank"
+# Transcripts ranked on the fly are loaded with these fields only
+TRANSCRIPT_RANK_PROJECTION = {field: 1 for field in TRANSCRIPT_SORT_FIELDS}
+
+# Loader attribute -> collection, document type and foreign key of its query
+LOADER_QUERIES = {
+    "transcript_loader": ("transcript", "Transcript", "gene_foreign_key"),
+    "product_loader": ("protein", "Protein", "product_primary_key"),
+    "region_loader": ("region", "Region", "region_id"),
+    "region_by_assembly_loader": ("region", "Region", "assembly_id"),
+    "organism_loader": ("organism", "Organism", "organism_primary_key"),
+    "assembly_by_organism_loader": ("assembly", "Assembly", "organism_foreign_key"),
+    "species_loader": ("species", "Species", "species_primary_key"),
+    "organism_by_species_loader": ("organism", "Organism", "species_foreign_key"),
+    "gene_by_id_loader": ("gene", "Gene", "_id"),
+    "transcript_by_id_loader": ("transcript", "Transcript", "_id"),
+    "gene_by_stable_id_loader": ("gene", "Gene", "stable_id"),
+    "assembly_loader": ("assembly", "Assembly", "assembly_id"),
+}
+
+# Loaders whose keys are only unique within a genome, the genomes of a
+# release database may share stable ids
+GENOME_SCOPED_LOADERS = {"gene_by_stable_id_loader"}
+
+# Loaders serving documents the request already fetched when they have every
+# field asked for, see remember()
+REUSING_LOADERS = {"gene_by_stable_id_loader", "assembly_loader"}
+
 
 class BatchLoaders:
     """A collection of bulk data aggregators for "joins" in GraphQL"""
 
-    def __init__(self, database_conn, mongo_client: MongoDbClient):
+    def __init__(
+        self,
+        database_conn,
+        mongo_client: MongoDbClient,
+        genome_id: Optional[str] = None,
+    ):
         self.database_conn = database_conn
         self.mongo_client = mongo_client
+        self.genome_id = genome_id
 
         self.transcript_loader = DataLoader(
             batch_load_fn=self.batch_transcript_by_gene_load
@@ -46,6 +99,103 @@ class BatchLoaders:
         self.organism_by_species_loader = DataLoader(
             batch_load_fn=self.batch_organism_by_species_load
         )
+        self.gene_by_id_loader = DataLoader(batch_load_fn=self.batch_gene_by_id_load)
+        self.transcript_by_id_loader = DataLoader(
+            batch_load_fn=self.batch_transcript_by_id_load
+        )
+        self.transcript_rank_loader = DataLoader(
+            batch_load_fn=self.batch_transcript_rank_load
+        )
+        self.gene_by_stable_id_loader = DataLoader(
+            batch_load_fn=functools.partial(
+                self.load_reusing_loaded, "gene_by_stable_id_loader"
+            )
+        )
+        self.assembly_loader = DataLoader(
+            batch_load_fn=functools.partial(self.load_reusing_loaded, "assembly_loader")
+        )
+        # (loader attribute, projected fields) -> DataLoader, see projected()
+        self.projected_loaders: Dict[Tuple, DataLoader] = {}
+        # Loader attribute -> key -> (projection, documents), see remember()
+        self.loaded_docs: Dict[str, Dict[Any, Tuple]] = defaultdict(dict)
+
+    def projected(
+        self, loader_name: str, projection: Optional[Dict[str, int]] = None
+    ) -> DataLoader:
+        """
+        The `loader_name` loader, fetching only the fields of `projection`.
+        Every distinct projection gets its own DataLoader so that batches
+        never mix documents of different shapes
+        """
+        if projection is None:
+            return getattr(self, loader_name)
+
+        key = (loader_name, tuple(sorted(projection)))
+        if key not in self.projected_loaders and loader_name in REUSING_LOADERS:
+            self.projected_loaders[key] = DataLoader(
+                batch_load_fn=functools.partial(
+                    self.load_reusing_loaded, loader_name, projection=projection
+                )
+            )
+        if key not in self.projected_loaders:
+            doc_type, type_name, foreign_key = LOADER_QUERIES[loader_name]
+            self.projected_loaders[key] = DataLoader(
+                batch_load_fn=functools.partial(
+                    self.load_by_foreign_key,
+                    doc_type,
+                    type_name,
+                    foreign_key,
+                    projection=projection,
+                )
+            )
+        return self.projected_loaders[key]
+
+    def remember(
+        self, loader_name: str, projection: Optional[Dict[str, int]], docs: List[Dict]
+    ) -> None:
+        """
+        Record documents a resolver fetched itself (e.g. the gene of a root
+        `gene` query), so that `loader_name` loads of the same keys reuse them
+        rather than query MongoDB again, provided they were fetched with every
+        field the load asks for
+        """
+        _, _, foreign_key = LOADER_QUERIES[loader_name]
+        grouped_docs = defaultdict(list)
+        for doc in docs:
+            if doc.get(foreign_key) is not None:
+                grouped_docs[doc[foreign_key]].append(doc)
+        for key, key_docs in grouped_docs.items():
+            self.loaded_docs[loader_name][key] = (projection, key_docs)
+
+    async def load_reusing_loaded(
+        self,
+        loader_name: str,
+        keys: List[Any],
+        projection: Optional[Dict[str, int]] = None,
+    ) -> List[List]:
+        "load_by_foreign_key() for the keys remember() cannot serve"
+        doc_type, type_name, foreign_key = LOADER_QUERIES[loader_name]
+        loaded = self.loaded_docs[loader_name]
+        results = {
+            key: loaded[key][1]
+            for key in keys
+            if key in loaded and projection_covers(loaded[key][0], projection)
+        }
+        misses = [key for key in keys if key not in results]
+        if misses:
+            match = None
+            if loader_name in GENOME_SCOPED_LOADERS and self.genome_id is not None:
+                match = {"genome_id": self.genome_id}
+            fetched = await self.load_by_foreign_key(
+                doc_type,
+                type_name,
+                foreign_key,
+                misses,
+                projection=projection,
+                match=match,
+            )
+            results.update(zip(misses, fetched))
+        return [results[key] for key in keys]
 
     async def batch_transcript_by_gene_load(self, keys: List[str]) -> List[List]:
         """
@@ -53,54 +203,188 @@ class BatchLoaders:
         DataLoader will aggregate many single ID requests into 'keys' so we can
         perform bulk fetches
         """
-        query = {
-            "type": "Transcript",
-            "gene_foreign_key": {"$in": sorted(keys)},
-        }
-
-        data = await self.query_mongo(query=query, doc_type="transcript")
-        return self.collate_dataloader_output("gene_foreign_key", keys, data)
+        return await self.load_by_foreign_key(
+            "transcript", "Transcript", "gene_foreign_key", keys
+        )
 
     async def batch_product_load(self, keys: List[str]) -> List[List]:
         """
         Load a bunch of products/proteins by ID
         """
-        query = {
-            "type": "Protein",
-            "product_primary_key": {"$in": sorted(keys)},
-        }
-        data = await self.query_mongo(query=query, doc_type="protein")
-        return self.collate_dataloader_output("product_primary_key", keys, data)
+        return await self.load_by_foreign_key(
+            "protein", "Protein", "product_primary_key", keys
+        )
 
     async def batch_region_load(self, keys: List[str]) -> List[List]:
-        query = {"type": "Region", "region_id": {"$in": sorted(keys)}}
-        data = await self.query_mongo(query=query, doc_type="region")
-        return self.collate_dataloader_output("region_id", keys, data)
+        return await self.load_by_foreign_key("region", "Region", "region_id", keys)
 
     async def batch_region_by_assembly_load(self, keys: List[str]) -> List[List]:
-        query = {"type": "Region", "assembly_id": {"$in": sorted(keys)}}
-        data = await self.query_mongo(query=query, doc_type="region")
-        return self.collate_dataloader_output("assembly_id", keys, data)
+        return await self.load_by_foreign_key("region", "Region", "assembly_id", keys)
 
     async def batch_organism_load(self, keys: List[str]) -> List[List]:
-        query = {"type": "Organism", "organism_primary_key": {"$in": sorted(keys)}}
-        data = await self.query_mongo(query=query, doc_type="organism")
-        return self.collate_dataloader_output("organism_primary_key", keys, data)
+        return await self.load_by_foreign_key(
+            "organism", "Organism", "organism_primary_key", keys
+        )
 
     async def batch_assembly_by_organism_load(self, keys: List[str]) -> List[List]:
-        query = {"type": "Assembly", "organism_foreign_key": {"$in": sorted(keys)}}
-        data = await self.query_mongo(query=query, doc_type="assembly")
-        return self.collate_dataloader_output("organism_foreign_key", keys, data)
+        return await self.load_by_foreign_key(
+            "assembly", "Assembly", "organism_foreign_key", keys
+        )
 
     async def batch_species_load(self, keys: List[str]) -> List[List]:
-        query = {"type": "Species", "species_primary_key": {"$in": sorted(keys)}}
-        data = await self.query_mongo(query=query, doc_type="species")
-        return self.collate_dataloader_output("species_primary_key", keys, data)
+        return await self.load_by_foreign_key(
+            "species", "Species", "species_primary_key", keys
+        )
 
     async def batch_organism_by_species_load(self, keys: List[str]) -> List[List]:
-        query = {"type": "Organism", "species_foreign_key": {"$in": sorted(keys)}}
-        data = await self.query_mongo(query=query, doc_type="organism")
-        return self.collate_dataloader_output("species_foreign_key", keys, data)
+        return await self.load_by_foreign_key(
+            "organism", "Organism", "species_foreign_key", keys
+        )
+
+    async def batch_gene_by_id_load(self, keys: List[ObjectId]) -> List[List]:
+        "Genes by MongoDB _id, e.g. those an interval index found"
+        return await self.load_by_foreign_key("gene", "Gene", "_id", keys)
+
+    async def batch_transcript_by_id_load(self, keys: List[ObjectId]) -> List[List]:
+        return await self.load_by_foreign_key("transcript", "Transcript", "_id", keys)
+
+    async def batch_transcript_rank_load(self, keys: List[str]) -> List[List[str]]:
+        """
+        Stable ids of the transcripts of genes, in display order. Release data
+        never changes, so the ranking of a gene is computed once per release,
+        from the fields the order depends on, and cached in Redis next to the
+        DataLoader results. It is not recorded for the cache warm-up, which
+        replays MongoDB queries
+        """
+        rankings: Dict[str, List[str]] = {}
+        cache_keys = {
+            key: cache_key(
+                self.database_conn.name,
+                TRANSCRIPT_RANK_KEY,
+                canonical_query({"type": "Transcript", "gene_foreign_key": key}),
+            )
+            for key in keys
+        }
+        cache = None
+        if self.mongo_client.redis_cache_enabled:
+            cache = self.mongo_client.async_cache
+            try:
+                entries = await cache.mget([cache_keys[key] for key in keys])
+            except redis.RedisError as exc:
+                logger.warning("Redis cache read failed: %s", exc)
+                entries = [None] * len(keys)
+            for key, docs in zip(
+                keys, decode_all(self.mongo_client.cache_codec, entries)
+            ):
+                if docs is not None:
+                    rankings[key] = [doc["stable_id"] for doc in docs]
+
+        misses = [key for key in keys if key not in rankings]
+        if not misses:
+            return [rankings[key] for key in keys]
+
+        transcripts = (
+            await self.database_conn["transcript"]
+            .find(
+                {"type": "Transcript", "gene_foreign_key": {"$in": sorted(misses)}},
+                {field: 1 for field in TRANSCRIPT_SORT_FIELDS + ["gene_foreign_key"]},
+            )
+            .to_list(length=None)
+        )
+        ranked = transcript_order.rank_transcripts_by_gene(transcripts)
+        pipeline = cache.pipeline(transaction=False) if cache is not None else None
+        for key in misses:
+            rankings[key] = ranked.get(key, [])
+            if pipeline is not None:
+                data = self.mongo_client.cache_codec.encode(
+                    [{"stable_id": stable_id} for stable_id in rankings[key]]
+                )
+                if data is not None:
+                    pipeline.set(
+                        cache_keys[key], data, ex=self.mongo_client.redis_expiry
+                    )
+        if pipeline is not None:
+            schedule_cache_write(pipeline.execute())
+        return [rankings[key] for key in keys]
+
+    async def transcript_page_ids(
+        self, gene_primary_key: str, start: int, count: int
+    ) -> Tuple[List[str], int]:
+        """
+        Stable ids of the transcripts [start, start + count) of a gene in
+        display order, and the number of transcripts of the gene. The ranking
+        is cached with Redis, else the first start + count transcripts are
+        selected from their sort fields only. Either way the load is batched
+        across genes and shared by a page and its metadata
+        """
+        if self.mongo_client.redis_cache_enabled:
+            ranking = await self.transcript_rank_loader.load(gene_primary_key)
+            return ranking[start : start + count], len(ranking)
+
+        transcripts = await self.projected(
+            "transcript_loader", TRANSCRIPT_RANK_PROJECTION
+        ).load(gene_primary_key)
+        top = transcript_order.top_gene_transcripts(transcripts, start + count)
+        return [transcript["stable_id"] for transcript in top[start:]], len(transcripts)
+
+    def transcript_page_loader(
+        self, projection: Optional[Dict[str, int]] = None
+    ) -> DataLoader:
+        """
+        DataLoader of (gene_primary_key, page, per_page) -> the transcripts of
+        that page, fetching only the fields of `projection`
+        """
+        key = (
+            "transcript_page_loader",
+            None if projection is None else tuple(sorted(projection)),
+        )
+        if key not in self.projected_loaders:
+            self.projected_loaders[key] = DataLoader(
+                batch_load_fn=functools.partial(
+                    self.batch_transcript_page_load, projection=projection
+                )
+            )
+        return self.projected_loaders[key]
+
+    async def batch_transcript_page_load(
+        self, keys: List[Tuple[str, int, int]], projection=None
+    ) -> List[List[Dict]]:
+        """
+        The transcripts of pages of many genes: one batched ranking load and
+        one query for the transcripts of every page
+        """
+        page_ids = await asyncio.gather(
+            *[
+                self.transcript_page_ids(gene, (page - 1) * per_page, per_page)
+                for gene, page, per_page in keys
+            ]
+        )
+        genes = sorted({gene for (gene, _, _), (ids, _) in zip(keys, page_ids) if ids})
+        if not genes:
+            return [[] for _ in keys]
+
+        if projection is not None:
+            projection = {**projection, "gene_foreign_key": 1, "stable_id": 1}
+        query = {
+            "type": "Transcript",
+            "gene_foreign_key": {"$in": genes},
+            "stable_id": {"$in": sorted({sid for ids, _ in page_ids for sid in ids})},
+        }
+        logger.info(
+            "Getting %d transcript pages from DB: '%s'",
+            len(keys),
+            self.database_conn.name,
+        )
+        docs = (
+            await self.database_conn["transcript"]
+            .find(query, projection)
+            .to_list(length=None)
+        )
+        by_id = {(doc["gene_foreign_key"], doc["stable_id"]): doc for doc in docs}
+        return [
+            [by_id[(gene, sid)] for sid in ids if (gene, sid) in by_id]
+            for (gene, _, _), (ids, _) in zip(keys, page_ids)
+        ]
 
     @staticmethod
     def collate_dataloader_output(
@@ -123,37 +407,68 @@ class BatchLoaders:
 
         return [grouped_docs[fk] for fk in original_ids]
 
-    async def query_mongo(self, query: Dict, doc_type) -> List[Dict]:
+    async def load_by_foreign_key(
+        self,
+        doc_type: str,
+        type_name: str,
+        foreign_key: str,
+        keys: List[Any],
+        projection: Optional[Dict[str, int]] = None,
+        match: Optional[Dict[str, Any]] = None,
+    ) -> List[List]:
         """
-        Query function that exists solely to satisfy the vagaries of Python async.
-        batch_transcript_load expects a list of results, and *must* call a single
-        function in order to be valid.
+        Fetch the documents of `doc_type` (also the collection name) for every
+        foreign key value in `keys`, and return them as one list per key.
+        `match` narrows the query further, e.g. to a genome.
+
+        Results are cached per foreign key value rather than per batch, so a
+        batch {A, B, C} reuses what an earlier batch {A, B} cached: one MGET
+        covers the batch, only the misses go to MongoDB and their entries
+        (empty ones included) are backfilled write-behind. Entries of a
+        projected load are keyed by their projection too
         """
-
-        # The mongo db connection also gives access to the redis cache
-        # connection
+        if projection is not None:
+            # The foreign key is needed to collate the documents
+            projection = {**projection, foreign_key: 1}
+        results: Dict[Any, List[Dict]] = {}
+        canonicals = {}
+        cache = None
         if self.mongo_client.redis_cache_enabled:
-            cache = self.mongo_client.cache
-
-            # We use pickle to get a binary representation of the query object.
-            # Then we prepend doc_type and use this as a key
-            query_bin = pickle.dumps(query)
-            doc_type_bin = (doc_type + ":").encode("utf-8")
-            key = doc_type_bin + query_bin
-
-            # If we find the key, we return the associated result.
-            # If not, we fall through
-            data = cache.get(key)
-
-            if data is not None:
-                logger.debug("Found cache entry for key: %s", key)
-                # We recreate the object for the result
-                return pickle.loads(data)
-
-            logger.debug(f"No cache entry found for key: %s", key)
-
-        db = self.database_conn[doc_type]
-        assert db is not None
+            cache = self.mongo_client.async_cache
+
+            # One entry per key, named after the equivalent single-key query
+            canonicals = {
+                key: canonical_query(
+                    {**(match or {}), "type": type_name, foreign_key: key}, projection
+                )
+                for key in keys
+            }
+            cache_keys = [
+                cache_key(self.database_conn.name, doc_type, canonicals[key])
+                for key in keys
+            ]
+            try:
+                entries = await cache.mget(cache_keys)
+            except redis.RedisError as exc:
+                logger.warning("Redis cache read failed: %s", exc)
+                entries = [None] * len(keys)
+
+            # Entries in an older format decode to None and are refreshed
+            # from MongoDB
+            decoded = await decode_off_loop(self.mongo_client.cache_codec, entries)
+            for key, cached_docs in zip(keys, decoded):
+                if cached_docs is not None:
+                    results[key] = cached_docs
+            logger.debug(
+                "Found %d of %d '%s' keys in the cache",
+                len(results),
+                len(keys),
+                doc_type,
+            )
+
+        misses = [key for key in keys if key not in results]
+        if not misses:
+            return [results[key] for key in keys]
 
         # the collection name is the doc_type
         logger.info(
@@ -162,15 +477,90 @@ class BatchLoaders:
             self.database_conn.name,
             doc_type,
         )
-
-        # We need to fetch the full result because batch_transcript_load expects
-        # this, but also since we may want to cache it
-        result = list(db.find(query))
-
-        if self.mongo_client.redis_cache_enabled:
-            logger.debug(f"Storing result for key: %s", key)
-
-            # The result is a list of documents. We use pickle to serialize this
-            cache.set(key, pickle.dumps(result), ex=self.mongo_client.redis_expiry)
-
-        return result
+        query = {
+            **(match or {}),
+            "type": type_name,
+            foreign_key: {"$in": sorted(misses)},
+        }
+        docs = (
+            await self.database_conn[doc_type]
+            .find(query, projection)
+            .to_list(length=None)
+        )
+        fetched = self.collate_dataloader_output(foreign_key, misses, docs)
+        results.update(zip(misses, fetched))
+
+        if cache is not None:
+            # Encode before handing the documents to resolvers, which may
+            # modify them, but do not wait for the SETs themselves
+            encoded = await encode_off_loop(self.mongo_client.cache_codec, fetched)
+            backfill = [
+                (canonicals[key], data)
+                for key, data in zip(misses, encoded)
+                if data is not None
+            ]
+            if backfill:
+                schedule_cache_write(
+                    store_results(
+                        cache,
+                        self.database_conn.name,
+                        doc_type,
+                        backfill,
+                        self.mongo_client.redis_expiry,
+                    )
+                )
+
+        return [results[key] for key in keys]
+
+
+def decode_all(codec: ResultCodec, entries: List[Optional[bytes]]) -> List:
+    return [None if entry is None else codec.decode(entry) for entry in entries]
+
+
+def encode_all(codec: ResultCodec, results: List[List[Dict]]) -> List:
+    return [codec.encode(docs) for docs in results]
+
+
+async def decode_off_loop(
+    codec: ResultCodec, entries: List[Optional[bytes]]
+) -> List[Optional[List[Dict]]]:
+    "Decode cached entries, in a worker thread if they are large"
+    if sum(len(entry) for entry in entries if entry) >= OFFLOAD_SERIALIZATION_BYTES:
+        return await asyncio.to_thread(decode_all, codec, entries)
+    return decode_all(codec, entries)
+
+
+async def encode_off_loop(
+    codec: ResultCodec, results: List[List[Dict]]
+) -> List[Optional[bytes]]:
+    "Encode per-key results, in a worker thread if they hold many documents"
+    if sum(len(docs) for docs in results) >= OFFLOAD_SERIALIZATION_DOCS:
+        return await asyncio.to_thread(encode_all, codec, results)
+    return encode_all(codec, results)
+
+
+def schedule_cache_write(cache_write: Awaitable) -> None:
+    """
+    Write-behind cache population: the SET runs in its own task so that the
+    request never waits on it. A failed write only costs a later cache miss
+    """
+
+    async def write():
+        try:
+            await cache_write
+        except redis.RedisError as exc:
+            logger.warning("Redis cache set failed: %s", exc)
+
+    task = asyncio.create_task(write())
+    # The event loop only keeps weak references to tasks
+    PENDING_CACHE_WRITES.add(task)
+    task.add_done_callback(PENDING_CACHE_WRITES.discard)
+
+
+async def flush_cache_writes() -> None:
+    "Wait for the write-behind cache SETs still in flight, e.g. on shutdown"
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(
+        *[task for task in PENDING_CACHE_WRITES if task.get_loop() is loop],
+        return_exceptions=True,
+    )
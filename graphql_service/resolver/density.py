@@ -0,0 +1,158 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+Feature density of a region: the number of genes and transcripts, by
+biotype, starting in each fixed-size bin. One aggregation per feature type
+counts a whole chromosome, so zoomed-out views need neither thousands of
+documents nor overlap_region.
+
+Densities are cached in Redis per (release database, region, bin size),
+under the release namespace of the DataLoader cache so that they are dropped
+with it.
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, List
+
+import redis
+
+from common.dataloader_cache import release_key_prefix
+from graphql_service.resolver.data_loaders import schedule_cache_write
+from graphql_service.resolver.exceptions import InvalidBinSizeError
+
+logger = logging.getLogger(__name__)
+
+DENSITY_FEATURE_TYPES = ("Gene", "Transcript")
+MAX_DENSITY_BINS = 10000
+
+
+def density_cache_key(database_name: str, region_id: str, bin_size: int) -> str:
+    return f"{release_key_prefix(database_name)}density:{region_id}:{bin_size}"
+
+
+def density_pipeline(
+    genome_id: str, region_id: str, feature_type: str, bin_size: int
+) -> List[Dict]:
+    "Counts of the features of a region by (bin of their start, biotype)"
+    return [
+        {
+            "$match": {
+                "type": feature_type,
+                "genome_id": genome_id,
+                "slice.region_id": region_id,
+            }
+        },
+        {
+            "$group": {
+                "_id": {
+                    "bin": {
+                        "$floor": {
+                            "$divide": [
+                                {"$subtract": ["$slice.location.start", 1]},
+                                bin_size,
+                            ]
+                        }
+                    },
+                    "biotype": "$metadata.biotype.value",
+                },
+                "count": {"$sum": 1},
+            }
+        },
+    ]
+
+
+async def count_features(
+    database, genome_id: str, region_id: str, feature_type: str, bin_size: int
+) -> List[Dict]:
+    cursor = await database[feature_type.lower()].aggregate(
+        density_pipeline(genome_id, region_id, feature_type, bin_size)
+    )
+    return await cursor.to_list(length=None)
+
+
+def build_density(
+    length: int, bin_size: int, counts_by_type: Dict[str, List[Dict]]
+) -> Dict:
+    "Every bin of the region, empty ones included, with its sorted counts"
+    bin_count = max(-(-length // bin_size), 1)
+    counts: Dict[int, List[Dict]] = defaultdict(list)
+    for feature_type, groups in counts_by_type.items():
+        for group in groups:
+            # Features past the end of the region count in the last bin
+            feature_bin = min(int(group["_id"]["bin"]), bin_count - 1)
+            counts[feature_bin].append(
+                {
+                    "feature_type": feature_type,
+                    "biotype": group["_id"].get("biotype"),
+                    "count": group["count"],
+                }
+            )
+
+    return {
+        "bin_size": bin_size,
+        "bins": [
+            {
+                "start": feature_bin * bin_size + 1,
+                "end": min((feature_bin + 1) * bin_size, length),
+                "counts": sorted(
+                    counts[feature_bin],
+                    key=lambda count: (count["feature_type"], count["biotype"] or ""),
+                ),
+            }
+            for feature_bin in range(bin_count)
+        ],
+    }
+
+
+async def feature_density(mongo_client, database, region: Dict, bin_size: int) -> Dict:
+    """
+    The density of the genes and transcripts of `region` (a region document)
+    in `bin_size` bins, from the cache if possible
+    """
+    length = region["length"]
+    if bin_size < 1 or -(-length // bin_size) > MAX_DENSITY_BINS:
+        raise InvalidBinSizeError(bin_size, MAX_DENSITY_BINS)
+
+    cache = mongo_client.async_cache if mongo_client.redis_cache_enabled else None
+    key = density_cache_key(database.name, region["region_id"], bin_size)
+    if cache is not None:
+        try:
+            cached = await cache.get(key)
+        except redis.RedisError as exc:
+            logger.warning("Redis cache read failed: %s", exc)
+            cached = None
+        decoded = mongo_client.cache_codec.decode(cached) if cached else None
+        if decoded:
+            return decoded[0]
+
+    counts = await asyncio.gather(
+        *[
+            count_features(
+                database,
+                region["genome_id"],
+                region["region_id"],
+                feature_type,
+                bin_size,
+            )
+            for feature_type in DENSITY_FEATURE_TYPES
+        ]
+    )
+    density = build_density(length, bin_size, dict(zip(DENSITY_FEATURE_TYPES, counts)))
+
+    if cache is not None:
+        encoded = mongo_client.cache_codec.encode([density])
+        if encoded is not None:
+            schedule_cache_write(cache.set(key, encoded, ex=mongo_client.redis_expiry))
+    return density
@@ -12,7 +12,7 @@
    limitations under the License.
 """
 
-from typing import Optional, Dict
+from typing import Dict, List, Optional
 
 from graphql import GraphQLError
 
@@ -203,6 +203,45 @@ class SliceLimitExceededError(GraphQLError):
         super().__init__(message, extensions=self.extensions)
 
 
+class SliceGenomesMismatchError(GraphQLError):
+    """
+    Custom error to be raised if the slices of one query are of different genomes
+    """
+
+    extensions = {"code": "SLICE_GENOMES_MISMATCH"}
+
+    def __init__(self, genome_ids: List[str]):
+        message = f"All slices must be of the same genome, got {', '.join(genome_ids)}"
+        super().__init__(message, extensions=self.extensions)
+
+
+class InvalidCursorError(GraphQLError):
+    """
+    Custom error to be raised if a pagination cursor cannot be decoded
+    """
+
+    extensions = {"code": "INVALID_CURSOR"}
+
+    def __init__(self, cursor: str):
+        message = f"Invalid cursor: {cursor}"
+        super().__init__(message, extensions=self.extensions)
+
+
+class InvalidBinSizeError(GraphQLError):
+    """
+    Custom error to be raised if a density bin size is not positive or would
+    split a region into too many bins
+    """
+
+    extensions = {"code": "INVALID_BIN_SIZE"}
+
+    def __init__(self, bin_size: int, max_bins: int):
+        message = (
+            f"Bin size {bin_size} must be positive and give at most {max_bins} bins"
+        )
+        super().__init__(message, extensions=self.extensions)
+
+
 class InputFieldArgumentNumberError(GraphQLError):
     """
     Custom error to be raised if wrong number of input arguments are sent
@@ -13,18 +13,35 @@
 """
 
 import asyncio
+import bisect
 import configparser
 import logging
-from typing import Dict, Optional, List, Any, Mapping
+from collections import defaultdict
+from typing import Dict, Optional, List, Any, Mapping, Tuple
 
+from aiodataloader import DataLoader
 from ariadne import QueryType, ObjectType
-from graphql import GraphQLResolveInfo, GraphQLError, FieldNode
-from pymongo.database import Database, Collection
-
-from common import utils
-from graphql_service.resolver.data_loaders import BatchLoaders
+import redis
+from bson import ObjectId
+from graphql import GraphQLError, GraphQLObjectType, GraphQLResolveInfo
+from pymongo import ASCENDING
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.asynchronous.database import AsyncDatabase
+
+from common.binning import bin_query
+from common.dataloader_cache import release_key_prefix
+from common.interval_index import IntervalIndexCache
+from common.tile_cache import (
+    MAX_WINDOW_TILES,
+    OverlapTileCache,
+    TileEntry,
+    decode_entries,
+    encode_entries,
+)
+from graphql_service.resolver.data_loaders import BatchLoaders, schedule_cache_write
 
 from graphql_service.resolver.exceptions import (
+    SliceGenomesMismatchError,
     GeneNotFoundError,
     TranscriptNotFoundError,
     ProductNotFoundError,
@@ -44,11 +61,25 @@ from graphql_service.resolver.exceptions import (
     DatabaseNotFoundError,
     CollectionNotFoundError,
 )
-from graphql_service.resolver import transcript_order
-from grpc_service.grpc_model import GRPC_MODEL
+from graphql_service.resolver import cursors, density, transcript_order
+from graphql_service.resolver.projection import (
+    TRANSCRIPT_SORT_FIELDS,
+    collect_fields,
+    get_child_projection,
+    get_projection,
+    is_requested,
+    merge_projections,
+)
+from grpc_service.async_grpc_model import AsyncGrpcModel
 
 logger = logging.getLogger(__name__)
 
+# Locus queries matching this many features are rejected, and Locus pages
+# are at most this large
+OVERLAP_MAX_RESULTS = 1000
+# Optional arguments of SliceInput narrowing down the features of a locus
+SLICE_FILTERS = ("biotypes", "strand", "min_length", "max_length", "canonical_only")
+
 # Define Query types for GraphQL
 # Don't forget to import these into ariadne_app.py if you add a new type
 
@@ -64,11 +95,12 @@ ASSEMBLY_TYPE = ObjectType("Assembly")
 ORGANISM_TYPE = ObjectType("Organism")
 SPECIES_TYPE = ObjectType("Species")
 TRANSCRIPT_PAGE_TYPE = ObjectType("TranscriptsPage")
+LOCUS_TYPE = ObjectType("Locus")
 GENOME_TYPE = ObjectType("Genome")
 
 
 @QUERY_TYPE.field("gene")
-def resolve_gene(
+async def resolve_gene(
     _,
     info: GraphQLResolveInfo,
     byId: Optional[Dict[str, str]] = None,  # pylint: disable=invalid-name
@@ -96,13 +128,14 @@ def resolve_gene(
         "genome_id": by_id["genome_id"],
     }
 
-    set_db_conn_for_uuid(info, by_id["genome_id"])
+    await set_db_conn_for_uuid(info, by_id["genome_id"])
     connection_db = get_db_conn(info)
     gene_collection = connection_db["gene"]
 
     logger.info("[resolve_gene] Getting Gene from DB: '%s'", connection_db.name)
+    projection = get_projection(info)
     try:
-        result = gene_collection.find_one(query)
+        result = await gene_collection.find_one(query, projection)
     except Exception as db_exp:
         logging.error("Exception: %s", db_exp)
         raise (DatabaseNotFoundError(db_name=connection_db.name)) from db_exp
@@ -110,11 +143,13 @@ def resolve_gene(
     if not result:
         raise GeneNotFoundError(by_id=by_id)
 
+    # `transcripts { gene }` is the gene itself
+    get_data_loader(info).remember("gene_by_stable_id_loader", projection, [result])
     return result
 
 
 @QUERY_TYPE.field("genes")
-def resolve_genes(_, info: GraphQLResolveInfo, by_symbol: Dict[str, str]) -> List:
+async def resolve_genes(_, info: GraphQLResolveInfo, by_symbol: Dict[str, str]) -> List:
     """
     Load Genes via potentially ambiguous symbol
     Or
@@ -127,21 +162,22 @@ def resolve_genes(_, info: GraphQLResolveInfo, by_symbol: Dict[str, str]) -> Lis
         "symbol": by_symbol.get("symbol"),  # this makes symbol optional
     }
 
-    set_db_conn_for_uuid(info, by_symbol["genome_id"])
+    await set_db_conn_for_uuid(info, by_symbol["genome_id"])
     connection_db = get_db_conn(info)
     gene_collection = connection_db["gene"]
     logger.info("[resolve_genes] Getting Gene from DB: '%s'", connection_db.name)
 
+    projection = get_projection(info)
     try:
-        result = gene_collection.find(query)
+        # unpack cursor into a list. We're guaranteed relatively small results
+        result = await gene_collection.find(query, projection).to_list(length=None)
     except Exception as db_exp:
         logging.error("Exception: %s", db_exp)
         raise (DatabaseNotFoundError(db_name=connection_db.name)) from db_exp
 
-    # unpack cursor into a list. We're guaranteed relatively small results
-    result = list(result)
     if len(result) == 0:
         raise GeneNotFoundError(by_symbol=by_symbol)
+    get_data_loader(info).remember("gene_by_stable_id_loader", projection, result)
     return result
 
 
@@ -202,7 +238,7 @@ def insert_gene_name_urls(gene_metadata: Dict, info: GraphQLResolveInfo) -> Dict
 
 
 @QUERY_TYPE.field("transcript")
-def resolve_transcript(
+async def resolve_transcript(
     _,
     info: GraphQLResolveInfo,
     bySymbol: Optional[Dict[str, str]] = None,  # pylint: disable=invalid-name
@@ -246,7 +282,7 @@ def resolve_transcript(
 
     assert genome_id
 
-    set_db_conn_for_uuid(info, genome_id)
+    await set_db_conn_for_uuid(info, genome_id)
     connection_db = get_db_conn(info)
     transcript_collection = connection_db["transcript"]
     logger.info(
@@ -254,7 +290,7 @@ def resolve_transcript(
     )
 
     try:
-        transcript = transcript_collection.find_one(query)
+        transcript = await transcript_collection.find_one(query, get_projection(info))
     except Exception as db_exp:
         logging.error("Exception: %s", db_exp)
         raise (DatabaseNotFoundError(db_name=connection_db.name)) from db_exp
@@ -277,7 +313,7 @@ async def fetch_transcript(
     }
 
     try:
-        await set_async_db_conn_for_uuid(info, genome_id)
+        await set_db_conn_for_uuid(info, genome_id)
         connection_db = get_db_conn(info, genome_id)
         matches = await connection_db["transcript"].find(query).to_list(length=None)
         return sorted(matches, key=lambda transcript: transcript["stable_id"])
@@ -336,13 +372,32 @@ async def resolve_gene_transcripts(gene: Dict, info: GraphQLResolveInfo) -> List
     data_loader = get_data_loader(info)
 
     gene_primary_key = gene["gene_primary_key"]
-    # Get a dataloader from info
-    loader = data_loader.transcript_loader
-    # Tell DataLoader to get this request done when it feels like it
-    transcripts = await loader.load(key=gene_primary_key)
-    # Sort transcripts based on either rank (for human and mouse) or default sort (see `_transcript_value`)
-    sorted_transcripts = transcript_order.sort_gene_transcripts(transcripts)
-    return sorted_transcripts
+    # Get a dataloader from info, fetching only what the query and the sort need
+    loader = data_loader.projected(
+        "transcript_loader", get_projection(info, transcript_order_fields(info))
+    )
+    if not info.context["mongo_db_client"].redis_cache_enabled:
+        # Tell DataLoader to get this request done when it feels like it
+        transcripts = await loader.load(key=gene_primary_key)
+        # Sort transcripts based on either rank (for human and mouse) or default sort (see `_transcript_value`)
+        return transcript_order.sort_gene_transcripts(transcripts)
+
+    transcripts, ranking = await asyncio.gather(
+        loader.load(key=gene_primary_key),
+        data_loader.transcript_rank_loader.load(gene_primary_key),
+    )
+    return transcript_order.order_by_ranking(transcripts, ranking)
+
+
+def transcript_order_fields(info: GraphQLResolveInfo) -> List[str]:
+    """
+    The fields gene transcripts are loaded with to be put in order: their
+    stable id if the rankings are cached (with Redis), else every field
+    sort_gene_transcripts() reads
+    """
+    if info.context["mongo_db_client"].redis_cache_enabled:
+        return ["stable_id"]
+    return TRANSCRIPT_SORT_FIELDS
 
 
 @GENE_TYPE.field("transcripts_page")
@@ -362,46 +417,29 @@ async def resolve_gene_transcripts_page(
 async def resolve_transcripts_page_transcripts(
     transcripts_page: Dict, info: GraphQLResolveInfo
 ) -> List[Dict]:
-    "Load a page of transcripts"
-    query = {
-        "type": "Transcript",
-        "gene_foreign_key": transcripts_page["gene_primary_key"],
-    }
-    page, per_page = transcripts_page["page"], transcripts_page["per_page"]
-
-    connection_db = get_db_conn(info)
-    transcript_collection = connection_db["transcript"]
-    logger.info(
-        "[resolve_transcripts_page_transcripts] Getting Transcript from DB: '%s'",
-        connection_db.name,
+    "Load a page of transcripts, batched with the pages of the other genes"
+    loader = get_data_loader(info).transcript_page_loader(
+        get_projection(info, ["stable_id"])
+    )
+    return await loader.load(
+        (
+            transcripts_page["gene_primary_key"],
+            transcripts_page["page"],
+            transcripts_page["per_page"],
+        )
     )
-
-    all_transcripts = list(transcript_collection.find(query))
-    # Sort transcripts based on either rank (for human and mouse) or default sort (see `_transcript_value`)
-    # We are sorting all transcripts first before slicing/paginating
-    sorted_all = transcript_order.sort_gene_transcripts(all_transcripts)
-    start = (page - 1) * per_page
-    return sorted_all[start : start + per_page]
 
 
 @TRANSCRIPT_PAGE_TYPE.field("page_metadata")
 async def resolve_transcripts_page_metadata(
     transcripts_page: Dict, info: GraphQLResolveInfo
 ) -> Dict:
-    query = {
-        "type": "Transcript",
-        "gene_foreign_key": transcripts_page["gene_primary_key"],
-    }
-
-    connection_db = get_db_conn(info)
-    transcript_collection = connection_db["transcript"]
-    logger.info(
-        "[resolve_transcripts_page_metadata] Getting Transcript from DB: '%s'",
-        connection_db.name,
+    # The same request-scoped load as the page, no separate count
+    _, total_count = await get_data_loader(info).transcript_page_ids(
+        transcripts_page["gene_primary_key"], 0, 0
     )
-
     return {
-        "total_count": transcript_collection.count_documents(query),
+        "total_count": total_count,
         "page": transcripts_page["page"],
         "per_page": transcripts_page["per_page"],
     }
@@ -418,39 +456,26 @@ async def resolve_transcript_pgc(transcript: Dict, _: GraphQLResolveInfo) -> Lis
 
 @TRANSCRIPT_TYPE.field("gene")
 async def resolve_transcript_gene(transcript: Dict, info: GraphQLResolveInfo) -> Dict:
+    "Use a DataLoader to get the gene of the parent transcript"
     genome_id = transcript["genome_id"]
-    query = {
-        "type": "Gene",  # TODO: no need to select a type if we have collection per type anyway
-        "genome_id": genome_id,
-        "stable_id": transcript["gene"],
-    }
+    # The loader of the transcript's genome, transcript_search spans several
+    data_loader = get_request_context(info, genome_id)["data_loader"]
+    loader = data_loader.projected("gene_by_stable_id_loader", get_projection(info))
 
-    connection_db = get_db_conn(info, genome_id)
-    gene_collection = connection_db["gene"]
+    genes = await loader.load(key=transcript["gene"])
 
-    request_context = get_request_context(info, genome_id)
-    is_async_connection = request_context["is_async_connection"]
-    logger.info(
-        "[resolve_transcript_gene] Getting Gene from DB: '%s'", connection_db.name
-    )
-
-    if is_async_connection:
-        gene = await gene_collection.find_one(query)
-    else:
-        gene = gene_collection.find_one(query)
-
-    if not gene:
+    if not genes:
         raise GeneNotFoundError(
             by_id={
                 "genome_id": genome_id,
                 "stable_id": transcript["gene"],
             }
         )
-    return gene
+    return genes[0]
 
 
 @QUERY_TYPE.field("overlap_region")
-def resolve_overlap(
+async def resolve_overlap(
     _,
     info: GraphQLResolveInfo,
     genomeId: Optional[str] = None,  # pylint: disable=invalid-name
@@ -463,11 +488,13 @@ def resolve_overlap(
     Query Mongo for genes and transcripts lying between start and end
     """
 
+    filters: Dict[str, Any] = {}
     if by_slice:
         genome_id = by_slice["genome_id"]
         region_name = by_slice["region_name"]
         start = by_slice["start"]
         end = by_slice["end"]
+        filters = slice_filters(by_slice)
     else:
         genome_id = genomeId
         region_name = regionName
@@ -480,33 +507,602 @@ def resolve_overlap(
     # this is needed for mypy to pass
     assert genome_id and region_name and start and end
 
-    # Thoas only contains "chromosome"-type regions
-    region_id = "_".join([genome_id, region_name, "chromosome"])
-
-    set_db_conn_for_uuid(info, genome_id)
+    await set_db_conn_for_uuid(info, genome_id)
     connection_db = get_db_conn(info)
     logger.info(
         "[resolve_overlap] Getting Gene and Transcript Overlap from DB: '%s'",
         connection_db.name,
     )
+    return new_locus(
+        info,
+        genome_id,
+        slice_region_id(genome_id, region_name),
+        start,
+        end,
+        await info.context["mongo_db_client"].has_overlap_bins(connection_db),
+        filters,
+    )
+
+
+@QUERY_TYPE.field("overlap_regions")
+async def resolve_overlaps(
+    _, info: GraphQLResolveInfo, slices: List[Dict[str, Any]]
+) -> List[Dict]:
+    """
+    The loci of several slices of one genome, e.g. the tracks and flanks of
+    a genome browser viewport. The release database is looked up once and
+    the slices of a region share an overlap batch: one query per feature
+    type for all of their windows
+    """
+    genome_ids = sorted({by_slice["genome_id"] for by_slice in slices})
+    if not genome_ids:
+        return []
+    # Child resolvers read the release database of the root field
+    if len(genome_ids) > 1:
+        raise SliceGenomesMismatchError(genome_ids)
+
+    genome_id = genome_ids[0]
+    await set_db_conn_for_uuid(info, genome_id)
+    connection_db = get_db_conn(info)
+    logger.info(
+        "[resolve_overlaps] Getting %d Gene and Transcript Overlaps from DB: '%s'",
+        len(slices),
+        connection_db.name,
+    )
+    binned = await info.context["mongo_db_client"].has_overlap_bins(connection_db)
+
+    batches: Dict[Tuple, Dict] = {}
+    loci = []
+    for by_slice in slices:
+        region_id = slice_region_id(genome_id, by_slice["region_name"])
+        filters = slice_filters(by_slice)
+        locus = new_locus(
+            info,
+            genome_id,
+            region_id,
+            by_slice["start"],
+            by_slice["end"],
+            binned,
+            filters,
+        )
+        batch_key = (region_id, repr(sorted(filters.items())))
+        if batch_key not in batches:
+            batches[batch_key] = {
+                "genome_id": genome_id,
+                "region_id": region_id,
+                "binned": binned,
+                "filters": filters,
+                "windows": [],
+                "fetches": {},
+            }
+        locus["batch"] = batches[batch_key]
+        locus["batch"]["windows"].append((locus["start"], locus["end"]))
+        loci.append(locus)
+    return loci
+
+
+def slice_region_id(genome_id: str, region_name: str) -> str:
+    # Thoas only contains "chromosome"-type regions
+    return "_".join([genome_id, region_name, "chromosome"])
+
 
+def slice_filters(by_slice: Dict[str, Any]) -> Dict[str, Any]:
+    "The filters set in a SliceInput"
+    return {name: by_slice[name] for name in SLICE_FILTERS if by_slice.get(name)}
+
+
+def new_locus(
+    info: GraphQLResolveInfo,
+    genome_id: str,
+    region_id: str,
+    start: int,
+    end: int,
+    binned: bool,
+    filters: Dict[str, Any],
+) -> Dict:
+    "A Locus, its genes and transcripts are only fetched if selected"
+    locus = {
+        "genome_id": genome_id,
+        "region_id": region_id,
+        "start": start,
+        "end": end,
+        "binned": binned,
+        "filters": filters,
+    }
+    # Transcripts of the locus the genes' transcripts can be primed with, all
+    # of them only if they are not filtered
+    gene_transcripts_projection = (
+        False if filters else plan_locus_transcript_priming(info)
+    )
+    if gene_transcripts_projection is not False:
+        locus["gene_transcripts_projection"] = gene_transcripts_projection
+        # Every alias of `transcripts` shares one fetch, covering all of them
+        # and what the genes' transcripts need
+        locus["transcripts_projection"] = merge_projections(
+            get_child_projection(info, "transcripts", ["gene_foreign_key"]),
+            gene_transcripts_projection,
+        )
+        locus["transcripts_ready"] = asyncio.get_running_loop().create_future()
+    return locus
+
+
+def plan_locus_transcript_priming(info: GraphQLResolveInfo):
+    """
+    The projection `genes { transcripts }` will load transcripts with, if
+    the locus transcripts are selected too and can prime that DataLoader.
+    False otherwise, as None is the projection of whole documents
+    """
+    locus_fields = collect_fields(info)
+    if not locus_fields or "genes" not in locus_fields:
+        return False
+    if "transcripts" not in locus_fields:
+        return False
+
+    gene_type = info.schema.get_type("Gene")
+    assert isinstance(gene_type, GraphQLObjectType)
+    gene_fields = collect_fields(info, locus_fields["genes"], gene_type)
+    if not gene_fields or "transcripts" not in gene_fields:
+        return False
+    return get_projection(
+        info,
+        transcript_order_fields(info),
+        gene_fields["transcripts"],
+        gene_type.fields["transcripts"].type,
+    )
+
+
+@LOCUS_TYPE.field("genes")
+async def resolve_locus_genes(locus: Dict, info: GraphQLResolveInfo) -> List[Dict]:
+    """
+    The genes of the locus, fetched only if selected and concurrently with
+    the transcripts. Genes lying entirely in the locus have all of their
+    transcripts among the locus transcripts: those prime the transcript
+    DataLoader of `genes { transcripts }`
+    """
+    priming = "transcripts_ready" in locus
+    projection = get_projection(
+        info, ["slice.location", "gene_primary_key"] if priming else ()
+    )
+    genes = await find_overlapping(info, locus, "Gene", projection)
+    if not priming:
+        return genes
+
+    transcripts = await locus["transcripts_ready"]
+    if transcripts is None:
+        return genes
+    by_gene = defaultdict(list)
+    for transcript in transcripts:
+        by_gene[transcript.get("gene_foreign_key")].append(transcript)
+    loader = get_data_loader(info).projected(
+        "transcript_loader", locus["gene_transcripts_projection"]
+    )
+    for gene in genes:
+        location = gene["slice"]["location"]
+        if locus["start"] <= location["start"] <= location["end"] <= locus["end"]:
+            loader.prime(gene["gene_primary_key"], by_gene[gene["gene_primary_key"]])
+    return genes
+
+
+@LOCUS_TYPE.field("transcripts")
+async def resolve_locus_transcripts(
+    locus: Dict, info: GraphQLResolveInfo
+) -> List[Dict]:
+    "The transcripts of the locus, fetched only if selected"
+    if "transcripts_ready" not in locus:
+        return await find_overlapping(info, locus, "Transcript", get_projection(info))
+
+    fetch = locus.get("transcripts_fetch")
+    if fetch is None:
+        fetch = asyncio.ensure_future(
+            find_overlapping(info, locus, "Transcript", locus["transcripts_projection"])
+        )
+        locus["transcripts_fetch"] = fetch
+
+        def release_genes(done_fetch):
+            # The genes wait on these, whatever happens
+            failed = done_fetch.cancelled() or done_fetch.exception() is not None
+            locus["transcripts_ready"].set_result(
+                None if failed else done_fetch.result()
+            )
+
+        fetch.add_done_callback(release_genes)
+
+    # A cancelled alias must not cancel the fetch the others wait on
+    return await asyncio.shield(fetch)
+
+
+async def find_overlapping(
+    info: GraphQLResolveInfo,
+    locus: Dict,
+    feature_type: str,
+    projection: Optional[Dict[str, int]] = None,
+) -> List[Dict]:
+    """
+    The features of a locus, from the interval index if there is one, else
+    from the overlap tiles if they are cached
+    """
+    interval_indexes = info.context["mongo_db_client"].interval_indexes
+    if interval_indexes is not None and not locus.get("filters"):
+        return await indexed_overlap_region(
+            info,
+            interval_indexes,
+            locus["genome_id"],
+            locus["region_id"],
+            locus["start"],
+            locus["end"],
+            feature_type,
+            projection,
+        )
+    tile_cache = info.context["mongo_db_client"].overlap_tiles
+    if (
+        tile_cache is not None
+        and not locus.get("filters")
+        and len(tile_cache.tiles(locus["start"], locus["end"])) <= MAX_WINDOW_TILES
+    ):
+        return await tiled_overlap_region(
+            info, tile_cache, locus, feature_type, projection
+        )
+    if "batch" in locus:
+        features = await overlap_batch_features(
+            get_db_conn(info), locus["batch"], feature_type, projection
+        )
+        # None if the batch has too many features, the locus may not
+        if features is not None:
+            features = [
+                feature
+                for feature in features
+                if feature["slice"]["location"]["start"] <= locus["end"]
+                and feature["slice"]["location"]["end"] >= locus["start"]
+            ]
+            if len(features) >= OVERLAP_MAX_RESULTS:
+                raise SliceLimitExceededError(OVERLAP_MAX_RESULTS)
+            return features
+    return await overlap_region(
+        get_db_conn(info),
+        locus["genome_id"],
+        locus["region_id"],
+        locus["start"],
+        locus["end"],
+        feature_type,
+        projection,
+        locus["binned"],
+        locus.get("filters"),
+    )
+
+
+@LOCUS_TYPE.field("genes_page")
+async def resolve_locus_genes_page(
+    locus: Dict, info: GraphQLResolveInfo, first: int, after: Optional[str] = None
+) -> Dict:
+    return await overlap_page(info, locus, "Gene", "genes", first, after)
+
+
+@LOCUS_TYPE.field("transcripts_page")
+async def resolve_locus_transcripts_page(
+    locus: Dict, info: GraphQLResolveInfo, first: int, after: Optional[str] = None
+) -> Dict:
+    return await overlap_page(info, locus, "Transcript", "transcripts", first, after)
+
+
+async def overlap_page(
+    info: GraphQLResolveInfo,
+    locus: Dict,
+    feature_type: str,
+    feature_field: str,
+    first: int,
+    after: Optional[str] = None,
+) -> Dict:
+    """
+    Up to `first` features of a locus following the `after` cursor, in the
+    (start, _id) order. One more feature is fetched to tell whether there is
+    a next page, so a large region is streamed without ever hitting
+    OVERLAP_MAX_RESULTS
+    """
+    limit = min(max(first, 1), OVERLAP_MAX_RESULTS)
+    position = cursors.decode_cursor(after) if after else None
+    projection = get_child_projection(info, feature_field, ["slice.location.start"])
+    connection_db = get_db_conn(info)
+
+    # The interval indexes only hold coordinates, filtered loci are queried
+    if info.context["mongo_db_client"].interval_indexes is not None and not locus.get(
+        "filters"
+    ):
+        features = await indexed_overlap_page(
+            info, locus, feature_type, projection, position, limit + 1
+        )
+    else:
+        query = overlap_query(
+            locus["genome_id"],
+            locus["region_id"],
+            locus["start"],
+            locus["end"],
+            feature_type,
+            locus["binned"],
+            locus.get("filters"),
+        )
+        if position:
+            query = {"$and": [query, cursors.after_cursor(position)]}
+        features = (
+            await connection_db[feature_type.lower()]
+            .find(query, projection)
+            .sort([("slice.location.start", ASCENDING), ("_id", ASCENDING)])
+            .limit(limit + 1)
+            .to_list(length=None)
+        )
+
+    has_next_page = len(features) > limit
+    features = features[:limit]
+    end_cursor = after
+    if features:
+        last = features[-1]
+        end_cursor = cursors.encode_cursor(
+            last["slice"]["location"]["start"], last["_id"]
+        )
     return {
-        "genes": overlap_region(
-            connection_db, genome_id, region_id, start, end, "Gene"
-        ),
-        "transcripts": overlap_region(
-            connection_db, genome_id, region_id, start, end, "Transcript"
-        ),
+        feature_field: features,
+        "page_info": {"end_cursor": end_cursor, "has_next_page": has_next_page},
+    }
+
+
+async def indexed_overlap_page(
+    info: GraphQLResolveInfo,
+    locus: Dict,
+    feature_type: str,
+    projection: Optional[Dict[str, int]],
+    position: Optional[Tuple[int, ObjectId]],
+    limit: int,
+) -> List[Dict]:
+    "Up to `limit` features of a locus after `position`, by interval index"
+    index = await info.context["mongo_db_client"].interval_indexes.get(
+        get_db_conn(info), locus["genome_id"], locus["region_id"], feature_type
+    )
+    entries = index.overlapping_entries(locus["start"], locus["end"])
+    if position:
+        entries = entries[bisect.bisect_right(entries, position) :]
+    loader = get_data_loader(info).projected(
+        f"{feature_type.lower()}_by_id_loader", projection
+    )
+    found = await loader.load_many([feature_id for _, feature_id in entries[:limit]])
+    return [feature for by_id in found for feature in by_id]
+
+
+async def indexed_overlap_region(
+    info: GraphQLResolveInfo,
+    interval_indexes: IntervalIndexCache,
+    genome_id: str,
+    region_id: str,
+    start: int,
+    end: int,
+    feature_type: str,
+    projection: Optional[Dict[str, int]] = None,
+) -> List[Dict]:
+    """
+    overlap_region() answered by the in-memory interval index of the region:
+    the index finds the ids of the overlapping features and the documents
+    are loaded by id, so repeated windows share the cached documents
+    """
+    index = await interval_indexes.get(
+        get_db_conn(info), genome_id, region_id, feature_type
+    )
+    feature_ids = index.overlapping(start, end)
+    if len(feature_ids) >= OVERLAP_MAX_RESULTS:
+        raise SliceLimitExceededError(OVERLAP_MAX_RESULTS)
+
+    loader = get_data_loader(info).projected(
+        f"{feature_type.lower()}_by_id_loader", projection
+    )
+    features = await loader.load_many(feature_ids)
+    return [feature for found in features for feature in found]
+
+
+async def overlap_batch_features(
+    connection: AsyncDatabase,
+    batch: Dict,
+    feature_type: str,
+    projection: Optional[Dict[str, int]] = None,
+) -> Optional[List[Dict]]:
+    """
+    The features overlapping any window of an overlap_regions() batch, from
+    one query shared by the loci of the batch. None if there are as many as
+    OVERLAP_MAX_RESULTS per window: some window is over the limit
+    """
+    key = (
+        feature_type,
+        None if projection is None else tuple(sorted(projection.items())),
+    )
+    fetch = batch["fetches"].get(key)
+    if fetch is None:
+        fetch = asyncio.ensure_future(
+            fetch_overlap_batch(connection, batch, feature_type, projection)
+        )
+        batch["fetches"][key] = fetch
+    # A cancelled locus must not cancel the fetch the others wait on
+    return await asyncio.shield(fetch)
+
+
+async def fetch_overlap_batch(
+    connection: AsyncDatabase,
+    batch: Dict,
+    feature_type: str,
+    projection: Optional[Dict[str, int]] = None,
+) -> Optional[List[Dict]]:
+    # Overlapping and adjacent windows are queried as one
+    merged: List[List[int]] = []
+    for start, end in sorted(batch["windows"]):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    queries = [
+        overlap_query(
+            batch["genome_id"],
+            batch["region_id"],
+            start,
+            end,
+            feature_type,
+            batch["binned"],
+            batch["filters"],
+        )
+        for start, end in merged
+    ]
+    limit = OVERLAP_MAX_RESULTS * len(batch["windows"])
+    features = (
+        await connection[feature_type.lower()]
+        .find(
+            queries[0] if len(queries) == 1 else {"$or": queries},
+            merge_projections(projection, {"slice.location": 1}),
+        )
+        .limit(limit)
+        .to_list(length=None)
+    )
+    return None if len(features) == limit else features
+
+
+async def tiled_overlap_region(
+    info: GraphQLResolveInfo,
+    tile_cache: OverlapTileCache,
+    locus: Dict,
+    feature_type: str,
+    projection: Optional[Dict[str, int]] = None,
+) -> List[Dict]:
+    """
+    overlap_region() assembled from the cached tiles of the locus, see
+    common.tile_cache. Features spanning several tiles are loaded once
+    """
+    start, end = locus["start"], locus["end"]
+    by_tile = await overlap_tile_entries(info, tile_cache, locus, feature_type)
+    entries = sorted(
+        {
+            (entry_start, feature_id)
+            for tile_entries in by_tile.values()
+            for entry_start, entry_end, feature_id in tile_entries
+            if entry_start <= end and entry_end >= start
+        }
+    )
+    if len(entries) >= OVERLAP_MAX_RESULTS:
+        raise SliceLimitExceededError(OVERLAP_MAX_RESULTS)
+
+    loader = get_data_loader(info).projected(
+        f"{feature_type.lower()}_by_id_loader", projection
+    )
+    features = await loader.load_many([feature_id for _, feature_id in entries])
+    return [feature for found in features for feature in found]
+
+
+def overlap_tile_redis_key(key: Tuple) -> str:
+    database_name, *tile = key
+    return f"{release_key_prefix(database_name)}tile:{':'.join(map(str, tile))}"
+
+
+async def overlap_tile_entries(
+    info: GraphQLResolveInfo,
+    tile_cache: OverlapTileCache,
+    locus: Dict,
+    feature_type: str,
+) -> Dict[int, List[TileEntry]]:
+    "Entries of the tiles of a locus, from memory, else Redis, else MongoDB"
+    mongo_client = info.context["mongo_db_client"]
+    connection_db = get_db_conn(info)
+    keys = {
+        tile: tile_cache.key(connection_db.name, locus["region_id"], feature_type, tile)
+        for tile in tile_cache.tiles(locus["start"], locus["end"])
     }
+    by_tile = {}
+    for tile, key in keys.items():
+        entries = tile_cache.get(key)
+        if entries is not None:
+            by_tile[tile] = entries
+
+    missing = [tile for tile in keys if tile not in by_tile]
+    cache = mongo_client.async_cache if mongo_client.redis_cache_enabled else None
+    if missing and cache is not None:
+        try:
+            cached = await cache.mget(
+                [overlap_tile_redis_key(keys[tile]) for tile in missing]
+            )
+        except redis.RedisError as exc:
+            logger.warning("Redis cache read failed: %s", exc)
+            cached = [None] * len(missing)
+        for tile, data in zip(missing, cached):
+            # An empty tile is cached as b""
+            if data is not None:
+                by_tile[tile] = decode_entries(data)
+                tile_cache.put(keys[tile], by_tile[tile])
+        missing = [tile for tile in missing if tile not in by_tile]
+
+    if missing:
+        fetched = await fetch_overlap_tiles(
+            connection_db, tile_cache, locus, feature_type, missing
+        )
+        pipeline = cache.pipeline(transaction=False) if cache is not None else None
+        for tile in missing:
+            by_tile[tile] = fetched[tile]
+            tile_cache.put(keys[tile], fetched[tile])
+            if pipeline is not None:
+                pipeline.set(
+                    overlap_tile_redis_key(keys[tile]),
+                    encode_entries(fetched[tile]),
+                    ex=mongo_client.redis_expiry,
+                )
+        if pipeline is not None:
+            schedule_cache_write(pipeline.execute())
+    return by_tile
+
+
+async def fetch_overlap_tiles(
+    connection: AsyncDatabase,
+    tile_cache: OverlapTileCache,
+    locus: Dict,
+    feature_type: str,
+    tiles: List[int],
+) -> Dict[int, List[TileEntry]]:
+    """
+    Entries of `tiles`, in order, from a single query over their contiguous
+    runs, so that the cached tiles between two missing ones are not re-read
+    """
+    runs: List[List[int]] = []
+    for tile in tiles:
+        if runs and tile == runs[-1][-1] + 1:
+            runs[-1].append(tile)
+        else:
+            runs.append([tile])
+    queries = [
+        overlap_query(
+            locus["genome_id"],
+            locus["region_id"],
+            tile_cache.bounds(run[0])[0],
+            tile_cache.bounds(run[-1])[1],
+            feature_type,
+            locus["binned"],
+        )
+        for run in runs
+    ]
+    by_tile: Dict[int, List[TileEntry]] = {tile: [] for tile in tiles}
+    cursor = connection[feature_type.lower()].find(
+        queries[0] if len(queries) == 1 else {"$or": queries},
+        {"slice.location.start": 1, "slice.location.end": 1},
+    )
+    async for feature in cursor:
+        location = feature["slice"]["location"]
+        for tile in tiles:
+            tile_start, tile_end = tile_cache.bounds(tile)
+            if location["start"] <= tile_end and location["end"] >= tile_start:
+                by_tile[tile].append(
+                    (location["start"], location["end"], feature["_id"])
+                )
+    return by_tile
 
 
-def overlap_region(
-    connection: Database,
+async def overlap_region(
+    connection: AsyncDatabase,
     genome_id: str,
     region_id: str,
     start: int,
     end: int,
     feature_type: str,
+    projection: Optional[Dict[str, int]] = None,
+    binned: bool = False,
+    filters: Optional[Dict[str, Any]] = None,
 ) -> List[Dict]:
     """
     Query backend for a feature type using slice parameters:
@@ -514,7 +1110,38 @@ def overlap_region(
     start coordinate
     end coordinate
     feature type
+    and optionally the projection of the returned documents. `binned` narrows
+    the query down to the overlapping bins, see common.binning. `filters` are
+    those of SliceInput, applied before the result limit
     """
+    query = overlap_query(
+        genome_id, region_id, start, end, feature_type, binned, filters
+    )
+    max_results_size = OVERLAP_MAX_RESULTS
+    feature_type_collection = connection[feature_type.lower()]
+    print(
+        f"[INFO] Getting Overlap Region from DB: '{connection.name}', Collection: '{feature_type.lower()}'"
+    )
+    results = (
+        await feature_type_collection.find(query, projection)
+        .limit(max_results_size)
+        .to_list(length=None)
+    )
+    if len(results) == max_results_size:
+        raise SliceLimitExceededError(max_results_size)
+    return results
+
+
+def overlap_query(
+    genome_id: str,
+    region_id: str,
+    start: int,
+    end: int,
+    feature_type: str,
+    binned: bool = False,
+    filters: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    "MongoDB filter of the features overlapping [start, end]"
     query = {
         "type": feature_type,
         "genome_id": genome_id,
@@ -526,15 +1153,35 @@ def overlap_region(
         "slice.location.start": {"$lte": end},
         "slice.location.end": {"$gte": start},
     }
-    max_results_size = 1000
-    feature_type_collection = connection[feature_type.lower()]
-    print(
-        f"[INFO] Getting Overlap Region from DB: '{connection.name}', Collection: '{feature_type.lower()}'"
-    )
-    results = list(feature_type_collection.find(query).limit(max_results_size))
-    if len(results) == max_results_size:
-        raise SliceLimitExceededError(max_results_size)
-    return results
+    if binned:
+        query.update(bin_query(start, end))
+    if filters:
+        query.update(slice_filter_query(filters, feature_type))
+    return query
+
+
+def slice_filter_query(filters: Dict[str, Any], feature_type: str) -> Dict[str, Any]:
+    """
+    MongoDB conditions of the SliceInput filters. They need no index of
+    their own: MongoDB applies them to the features the region (or bin)
+    index scan finds, before the documents are returned and counted
+    """
+    query: Dict[str, Any] = {}
+    if "biotypes" in filters:
+        query["metadata.biotype.value"] = {"$in": filters["biotypes"]}
+    if "strand" in filters:
+        query["slice.strand.value"] = filters["strand"]
+    length = {}
+    if "min_length" in filters:
+        length["$gte"] = filters["min_length"]
+    if "max_length" in filters:
+        length["$lte"] = filters["max_length"]
+    if length:
+        query["slice.location.length"] = length
+    # Genes have no canonical metadata
+    if filters.get("canonical_only") and feature_type == "Transcript":
+        query["metadata.canonical"] = {"$ne": None}
+    return query
 
 
 @PGC_TYPE.field("three_prime_utr")
@@ -550,7 +1197,7 @@ def resolve_utr(pgc: Dict, _: GraphQLResolveInfo) -> Optional[Dict]:
 
 
 @QUERY_TYPE.field("product")
-def resolve_product_by_id(
+async def resolve_product_by_id(
     _,
     info: GraphQLResolveInfo,
     genome_id: Optional[str] = None,
@@ -578,7 +1225,7 @@ def resolve_product_by_id(
         "type": {"$in": ["Protein", "MatureRNA"]},
     }
 
-    set_db_conn_for_uuid(info, genome_id)
+    await set_db_conn_for_uuid(info, genome_id)
     connection_db = get_db_conn(info)
     protein_collection = connection_db["protein"]
     logger.info(
@@ -589,7 +1236,7 @@ def resolve_product_by_id(
     # 1. Keep it collection per type: collection for 'Protein' and another one for 'MatureRNA'
     #    and changing the code logic
     # 2. Put all products in one collection
-    result = protein_collection.find_one(query)
+    result = await protein_collection.find_one(query, get_projection(info))
 
     if not result:
         raise ProductNotFoundError(stable_id, genome_id)
@@ -597,38 +1244,30 @@ def resolve_product_by_id(
 
 
 @PRODUCT_TYPE.field("product_generating_context")
-def resolve_pgc_for_product(product: Dict, info: GraphQLResolveInfo) -> Optional[Dict]:
-    pipeline = [
-        {
-            "$match": {
-                "stable_id": product.get("stable_id"),
-                "genome_id": product.get("genome_id"),
-            }
-        },
-        {
-            "$lookup": {
-                "from": "transcript",
-                "localField": "transcript_id",
-                "foreignField": "unversioned_stable_id",
-                "as": "transcript",
-            }
-        },
-        {"$unwind": {"path": "$transcript"}},
-    ]
+async def resolve_pgc_for_product(
+    product: Dict, info: GraphQLResolveInfo
+) -> Optional[Dict]:
+    query = {
+        "type": "Transcript",
+        "genome_id": product.get("genome_id"),
+        "unversioned_stable_id": product.get("transcript_id"),
+    }
 
-    # get db connection
-    set_db_conn_for_uuid(info, product.get("genome_id"))
-    connection_db = get_db_conn(info)
-    protein_collection = connection_db["protein"]
+    # The root resolver has already looked up the db connection for this genome
+    connection_db = get_db_conn(info, product.get("genome_id"))
+    transcript_collection = connection_db["transcript"]
     logger.info(
-        "[resolve_pgc_for_product] Getting Protein from DB: '%s'", connection_db.name
+        "[resolve_pgc_for_product] Getting Transcript from DB: '%s'",
+        connection_db.name,
     )
 
-    results = list(protein_collection.aggregate(pipeline))
-
-    result = results[0]
+    transcript = await transcript_collection.find_one(
+        query, {"product_generating_contexts": 1}
+    )
+    if not transcript:
+        return None
 
-    pgcs = result.get("transcript", None).get("product_generating_contexts", None)
+    pgcs = transcript.get("product_generating_contexts", None)
 
     if not pgcs or len(pgcs) == 0:
         return None
@@ -654,7 +1293,7 @@ async def resolve_product_by_pgc(pgc: Dict, info: GraphQLResolveInfo) -> Optiona
         return None
 
     data_loader = get_data_loader(info)
-    loader = data_loader.product_loader
+    loader = data_loader.projected("product_loader", get_projection(info))
 
     products = await loader.load(key=pgc["product_foreign_key"])
     # Data loader returns a list because most data-loads are one-many
@@ -679,7 +1318,7 @@ async def resolve_region_from_slice(
 
     data_loader = get_data_loader(info)
 
-    loader = data_loader.region_loader
+    loader = data_loader.projected("region_loader", get_projection(info))
 
     regions = await loader.load(key=region_id)
 
@@ -697,19 +1336,24 @@ async def resolve_assembly_from_region(
         return None
     assembly_id = region["assembly_id"]
 
-    query = {"type": "Assembly", "assembly_id": region["assembly_id"]}
+    data_loader = get_data_loader(info)
+    loader = data_loader.projected("assembly_loader", get_projection(info))
 
-    connection_db = get_db_conn(info)
-    assembly_collection = connection_db["assembly"]
-    logger.info(
-        "[resolve_assembly_from_region] Getting Assembly from DB: '%s'",
-        connection_db.name,
-    )
-    assembly = assembly_collection.find_one(query)
+    assemblies = await loader.load(key=assembly_id)
 
-    if not assembly:
+    if not assemblies:
         raise AssemblyNotFoundError(assembly_id)
-    return assembly
+    return assemblies[0]
+
+
+@REGION_TYPE.field("feature_density")
+async def resolve_region_feature_density(
+    region: Dict, info: GraphQLResolveInfo, bin_size: int
+) -> Dict:
+    "Gene and transcript counts of a region by bin, for zoomed-out views"
+    return await density.feature_density(
+        info.context["mongo_db_client"], get_db_conn(info), region, bin_size
+    )
 
 
 @ASSEMBLY_TYPE.field("regions")
@@ -717,7 +1361,7 @@ async def resolve_regions_from_assembly(
     assembly: Dict, info: GraphQLResolveInfo
 ) -> List[Dict]:
     data_loader = get_data_loader(info)
-    loader = data_loader.region_by_assembly_loader
+    loader = data_loader.projected("region_by_assembly_loader", get_projection(info))
 
     regions = await loader.load(key=assembly["assembly_id"])
 
@@ -731,7 +1375,7 @@ async def resolve_organism_from_assembly(
     assembly: Dict, info: GraphQLResolveInfo
 ) -> Optional[Dict]:
     data_loader = get_data_loader(info)
-    loader = data_loader.organism_loader
+    loader = data_loader.projected("organism_loader", get_projection(info))
 
     organisms = await loader.load(key=assembly["organism_foreign_key"])
     if not organisms:
@@ -751,7 +1395,7 @@ async def resolve_assemblies_from_organism(
     organism: Dict, info: GraphQLResolveInfo
 ) -> List[Dict]:
     data_loader = get_data_loader(info)
-    loader = data_loader.assembly_by_organism_loader
+    loader = data_loader.projected("assembly_by_organism_loader", get_projection(info))
 
     assemblies = await loader.load(key=organism["organism_primary_key"])
     if not assemblies:
@@ -764,7 +1408,7 @@ async def resolve_species_from_organism(
     organism: Dict, info: GraphQLResolveInfo
 ) -> List[Dict]:
     data_loader = get_data_loader(info)
-    loader = data_loader.species_loader
+    loader = data_loader.projected("species_loader", get_projection(info))
 
     species = await loader.load(key=organism["species_foreign_key"])
     if not species:
@@ -777,7 +1421,7 @@ async def resolve_organisms_from_species(
     species: Dict, info: GraphQLResolveInfo
 ) -> List[Dict]:
     data_loader = get_data_loader(info)
-    loader = data_loader.organism_by_species_loader
+    loader = data_loader.projected("organism_by_species_loader", get_projection(info))
 
     organisms = await loader.load(key=species["species_primary_key"])
     if not organisms:
@@ -793,25 +1437,25 @@ async def resolve_region(_, info: GraphQLResolveInfo, by_name: Dict[str, str]) -
         "name": by_name["name"],
     }
 
-    set_db_conn_for_uuid(info, by_name["genome_id"])
+    await set_db_conn_for_uuid(info, by_name["genome_id"])
     connection_db = get_db_conn(info)
     region_collection = connection_db["region"]
     logger.info("[resolve_region] Getting Region from DB: '%s'", connection_db.name)
 
-    result = region_collection.find_one(query)
+    result = await region_collection.find_one(query, get_projection(info))
     if not result:
         raise RegionNotFoundError(genome_id=by_name["genome_id"], name=by_name["name"])
     return result
 
 
 @QUERY_TYPE.field("genomes")
-def resolve_genomes(
+async def resolve_genomes(
     _, info: GraphQLResolveInfo, by_keyword: Optional[Dict[str, str]] = None
 ) -> List:
     """
     Resolve the genomes based on provided keyword arguments.
     Under the hood, this resolver might execute and combine 3 different queries based on the requested data:
-    - The default `get_genome_by_specific_keyword()` gRPC call (Metadata DB)
+    - The default `get_genome_by_specific_keyword()` async gRPC call (Metadata DB)
     - If `assembly` is requested, `fetch_assembly_data()` is triggered fetching data from Mongo DB
     - If `dataset` is requested, `fetch_dataset_data()` is triggered which triggers `get_datasets_list_by_uuid()`
         gRPC call to fetch dataset info (Metadata DB)
@@ -837,7 +1481,7 @@ def resolve_genomes(
         raise GraphQLError("Exactly one of the fields must be provided")
 
     # gRPC metadata service is the source of truth for genome records.
-    grpc_model = info.context["grpc_model"]
+    grpc_model = info.context["async_grpc_model"]
 
     if by_keyword:
         for key in [
@@ -854,12 +1498,12 @@ def resolve_genomes(
             # if one of the keys is provided
             if by_keyword.get(key):
                 if by_keyword.get("release_version"):
-                    result = grpc_model.get_genome_by_release_version(
+                    result = await grpc_model.get_genome_by_release_version(
                         release_version=by_keyword.get("release_version"),
                     )
                 else:
                     # Fetch genomes data from metadata using gRPC
-                    result = grpc_model.get_genome_by_specific_keyword(
+                    result = await grpc_model.get_genome_by_specific_keyword(
                         **{key: by_keyword.get(key)},
                     )
 
@@ -869,14 +1513,12 @@ def resolve_genomes(
 
                 # Only fetch assembly/dataset if the client asked for them.
                 # This avoids extra DB/gRPC calls on small queries.
-                fields_to_check = ["assembly", "dataset"]
-                is_assembly_present, is_dataset_present = utils.check_requested_fields(
-                    info, fields_to_check
-                )
+                is_assembly_present = is_requested(info, "assembly")
+                is_dataset_present = is_requested(info, "dataset")
 
                 combined_results = []
                 for genome in genomes:
-                    set_db_conn_for_uuid(
+                    await set_db_conn_for_uuid(
                         info,
                         genome.genome_uuid,
                         release_version=by_keyword.get("release_version"),
@@ -888,14 +1530,18 @@ def resolve_genomes(
 
                     # Assembly is stored in MongoDB, dataset lives in metadata (gRPC).
                     assembly_data = (
-                        fetch_assembly_data(
+                        await fetch_assembly_data(
                             assembly_collection, genome.assembly.assembly_uuid
                         )
                         if is_assembly_present
                         else None
                     )
+                    if assembly_data:
+                        get_data_loader(info).remember(
+                            "assembly_loader", None, [assembly_data]
+                        )
                     dataset_data = (
-                        fetch_dataset_data(grpc_model, genome.genome_uuid)
+                        await fetch_dataset_data(grpc_model, genome.genome_uuid)
                         if is_dataset_present
                         else None
                     )
@@ -910,35 +1556,38 @@ def resolve_genomes(
 
 
 @QUERY_TYPE.field("genome")
-def resolve_genome(_, info: GraphQLResolveInfo, by_genome_id: Dict[str, str]) -> Dict:
-    grpc_model = info.context["grpc_model"]
+async def resolve_genome(
+    _, info: GraphQLResolveInfo, by_genome_id: Dict[str, str]
+) -> Dict:
+    grpc_model = info.context["async_grpc_model"]
 
     # gRPC fetch first; Mongo access only if assembly is requested.
-    genome = grpc_model.get_genome_by_genome_uuid(
+    genome = await grpc_model.get_genome_by_genome_uuid(
         by_genome_id.get("genome_id"), by_genome_id.get("release_version")
     )
     if not genome.genome_uuid:
         raise GenomeNotFoundError(by_genome_id)
 
     # Check if the assembly and dataset fields are requested in the query
-    fields_to_check = ["assembly", "dataset"]
-    is_assembly_present, is_dataset_present = utils.check_requested_fields(
-        info, fields_to_check
-    )
+    is_assembly_present = is_requested(info, "assembly")
+    is_dataset_present = is_requested(info, "dataset")
 
-    set_db_conn_for_uuid(info, genome.genome_uuid)
+    await set_db_conn_for_uuid(info, genome.genome_uuid)
     connection_db = get_db_conn(info)
     # logging.debug("Collections in the database:", connection_db.list_collection_names())
     assembly_collection = connection_db["assembly"]
     # logging.debug("assembly_collection.name:", assembly_collection.name)
 
     assembly_data = (
-        fetch_assembly_data(assembly_collection, genome.assembly.assembly_uuid)
+        await fetch_assembly_data(assembly_collection, genome.assembly.assembly_uuid)
         if is_assembly_present
         else None
     )
+    if assembly_data:
+        # `assembly { regions { assembly } }` is the assembly itself
+        get_data_loader(info).remember("assembly_loader", None, [assembly_data])
     dataset_data = (
-        fetch_dataset_data(grpc_model, genome.genome_uuid)
+        await fetch_dataset_data(grpc_model, genome.genome_uuid)
         if is_dataset_present
         else None
     )
@@ -997,12 +1646,14 @@ def create_genome_response(
     return response
 
 
-def fetch_assembly_data(assembly_collection: Collection, assembly_id: str) -> Mapping:
+async def fetch_assembly_data(
+    assembly_collection: AsyncCollection, assembly_id: str
+) -> Mapping:
     """
     Fetch assembly data from a collection using the assembly ID.
 
     Args:
-        assembly_collection (Collection): The collection to search for the assembly data.
+        assembly_collection (AsyncCollection): The collection to search for the assembly data.
         assembly_id (str): The ID of the assembly to fetch.
 
     Returns:
@@ -1014,7 +1665,7 @@ def fetch_assembly_data(assembly_collection: Collection, assembly_id: str) -> Ma
     """
     query = {"assembly_id": assembly_id}
     try:
-        assembly = assembly_collection.find_one(query)
+        assembly = await assembly_collection.find_one(query)
     except Exception as coll_exp:
         logging.error("Exception: %s", coll_exp)
         raise (
@@ -1026,18 +1677,18 @@ def fetch_assembly_data(assembly_collection: Collection, assembly_id: str) -> Ma
     return assembly
 
 
-def fetch_dataset_data(grpc_model: GRPC_MODEL, genome_uuid: str) -> List:
+async def fetch_dataset_data(grpc_model: AsyncGrpcModel, genome_uuid: str) -> List:
     """
     Fetch dataset data using a gRPC model based on the genome UUID.
 
     Args:
-        grpc_model (GRPC_MODEL): The gRPC model to use for fetching the dataset data.
+        grpc_model (AsyncGrpcModel): The async gRPC model to use for fetching the dataset data.
         genome_uuid (str): The UUID of the genome for which to fetch dataset data.
 
     Returns:
         List: A list of datasets associated with the given genome UUID.
     """
-    result = grpc_model.get_datasets_list_by_uuid(genome_uuid)
+    result = await grpc_model.get_datasets_list_by_uuid(genome_uuid)
     datasets = list(result.datasets)
     return datasets
 
@@ -1072,24 +1723,7 @@ def get_version_details() -> Dict[str, str]:
     return {"major": "0", "minor": "1", "patch": "0-beta"}
 
 
-async def set_async_db_conn_for_uuid(info, uuid):
-    async_grpc_model = info.context.get("async_grpc_model")
-    db_conn = await info.context["mongo_db_client"].get_async_database_conn(
-        async_grpc_model, uuid
-    )
-    conn = {
-        "db_conn": db_conn,
-        "data_loader": BatchLoaders(db_conn, info.context["mongo_db_client"]),
-        "is_async_connection": True,
-    }
-
-    parent_key = get_path_parent_key(info)
-    info.context[parent_key] = conn
-    # Additional context for querying with multiple ids in a single query
-    info.context[parent_key + uuid] = conn
-
-
-def set_db_conn_for_uuid(info, uuid, release_version=None):
+async def set_db_conn_for_uuid(info, uuid, release_version=None):
     # IMPORTANT:
     # This function must be called from all the root level(@QUERY_TYPE) resolvers.
     #
@@ -1116,16 +1750,19 @@ def set_db_conn_for_uuid(info, uuid, release_version=None):
     # its own copy of the new dynamic context
     # See: https://ariadnegraphql.org/docs/types-reference#dynamic-context-value
 
-    grpc_model = info.context["grpc_model"]
-    # we pass the gRPC model instance and genome_uuid to get the release version used to infer Mongo DB's name
-    db_conn = info.context["mongo_db_client"].get_database_conn(
-        grpc_model, uuid, release_version
-    )
+    if release_version:
+        async_grpc_model = info.context.get("async_grpc_model")
+        db_conn = await info.context["mongo_db_client"].get_async_database_conn(
+            async_grpc_model, uuid, release_version
+        )
+    else:
+        # Genomes requested in the same tick (root aliases, transcript_search)
+        # are resolved to their release database in one batch
+        db_conn = await get_release_loader(info).load(uuid)
 
     conn = {
         "db_conn": db_conn,
-        "data_loader": BatchLoaders(db_conn, info.context["mongo_db_client"]),
-        "is_async_connection": False,
+        "data_loader": BatchLoaders(db_conn, info.context["mongo_db_client"], uuid),
     }
 
     parent_key = get_path_parent_key(info)
@@ -1134,6 +1771,26 @@ def set_db_conn_for_uuid(info, uuid, release_version=None):
     info.context[parent_key + uuid] = conn
 
 
+def get_release_loader(info):
+    """
+    Request-scoped DataLoader of genome_uuid -> release Mongo database.
+    The context is created afresh for every request, so is the loader
+    """
+    if "release_loader" not in info.context:
+        mongo_db_client = info.context["mongo_db_client"]
+        async_grpc_model = info.context.get("async_grpc_model")
+
+        async def batch_load_release_dbs(uuids):
+            return await mongo_db_client.get_async_database_conns(
+                async_grpc_model, uuids
+            )
+
+        info.context["release_loader"] = DataLoader(
+            batch_load_fn=batch_load_release_dbs
+        )
+    return info.context["release_loader"]
+
+
 def get_db_conn(info, uuid=None):
     parent_key = get_path_parent_key(info)
     if uuid:
@@ -0,0 +1,216 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+Turns the GraphQL selection set of a resolver into a MongoDB projection, so
+that documents are fetched without the fields nobody asked for (spliced
+exons, product generating contexts, cross references...).
+
+Projections are top-level: a selected object field (e.g. `slice`) is fetched
+whole, so that nested default resolvers keep working. Fields served by custom
+resolvers declare the document fields they read in RESOLVER_DEPENDENCIES.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+from graphql import GraphQLObjectType, GraphQLResolveInfo, get_named_type
+from graphql.execution.collect_fields import collect_sub_fields
+from graphql.language import FieldNode
+
+# GraphQL fields with a custom resolver -> the document fields it reads.
+# Any other field is read from the document field of the same name
+RESOLVER_DEPENDENCIES: Dict[str, Dict[str, List[str]]] = {
+    "Gene": {
+        "transcripts": ["gene_primary_key"],
+        "transcripts_page": ["gene_primary_key"],
+    },
+    "Transcript": {
+        "gene": ["gene"],
+        "product_generating_contexts": ["product_generating_contexts"],
+    },
+    "Product": {
+        "product_generating_context": ["transcript_id", "product_primary_key"],
+    },
+    "Region": {
+        "assembly": ["assembly_id"],
+        "feature_density": ["genome_id", "region_id", "length"],
+    },
+    "Assembly": {
+        "regions": ["assembly_id"],
+        "organism": ["organism_foreign_key"],
+    },
+    "Organism": {
+        "id": ["organism_primary_key"],
+        "assemblies": ["organism_primary_key"],
+        "species": ["species_foreign_key"],
+    },
+    "Species": {"organisms": ["species_primary_key"]},
+}
+
+# Kept in every projection: genome_id picks the release database of children
+ALWAYS_PROJECTED = ["genome_id", "type"]
+
+# The fields transcript_order.sort_gene_transcripts() reads
+TRANSCRIPT_SORT_FIELDS = [
+    "display_rank",
+    "stable_id",
+    "metadata.canonical",
+    "metadata.mane",
+    "metadata.biotype",
+    "product_generating_contexts.cds",
+    "spliced_exons.exon.slice.location.length",
+    "relative_location.length",
+]
+
+
+def collect_fields(
+    info: GraphQLResolveInfo,
+    field_nodes: Optional[List[FieldNode]] = None,
+    return_type=None,
+) -> Optional[Dict[str, List[FieldNode]]]:
+    """
+    Field name -> field nodes selected below `field_nodes` (by default the
+    field being resolved). Named and inline fragments, aliases and
+    @skip/@include are applied the way the executor applies them.
+
+    Returns None if the selection cannot be analysed, e.g. for abstract types
+    """
+    object_type = get_named_type(
+        info.return_type if return_type is None else return_type
+    )
+    if not isinstance(object_type, GraphQLObjectType):
+        return None
+
+    by_response_name = collect_sub_fields(
+        info.schema,
+        info.fragments,
+        info.variable_values,
+        object_type,
+        info.field_nodes if field_nodes is None else field_nodes,
+    )
+    fields: Dict[str, List[FieldNode]] = {}
+    for nodes in by_response_name.values():
+        # Aliases of the same field are merged
+        fields.setdefault(nodes[0].name.value, []).extend(nodes)
+    return fields
+
+
+def is_requested(info: GraphQLResolveInfo, field_name: str) -> bool:
+    """
+    Whether `field_name` is selected on the value being resolved, through
+    fragments and aliases too. True if the selection cannot be analysed
+    """
+    fields = collect_fields(info)
+    return fields is None or field_name in fields
+
+
+def collapse_paths(paths: Iterable[str]) -> List[str]:
+    "Drop paths covered by one of their prefixes, MongoDB rejects the collision"
+    kept: List[str] = []
+    for path in sorted(set(paths), key=lambda path: path.count(".")):
+        parts = path.split(".")
+        if not any(".".join(parts[:depth]) in kept for depth in range(1, len(parts))):
+            kept.append(path)
+    return sorted(kept)
+
+
+def merge_projections(
+    *projections: Optional[Dict[str, int]],
+) -> Optional[Dict[str, int]]:
+    "A projection covering all of `projections`, None (everything) wins"
+    if any(projection is None for projection in projections):
+        return None
+    return {
+        path: 1
+        for path in collapse_paths(
+            path for projection in projections for path in projection or {}
+        )
+    }
+
+
+def projection_covers(
+    projection: Optional[Dict[str, int]], other: Optional[Dict[str, int]]
+) -> bool:
+    "Whether documents fetched with `projection` have every field of `other`"
+    if projection is None:
+        return True
+    if other is None:
+        return False
+    return all(
+        any(path == kept or path.startswith(kept + ".") for kept in projection)
+        for path in other
+    )
+
+
+def get_projection(
+    info: GraphQLResolveInfo,
+    extra_fields: Iterable[str] = (),
+    field_nodes: Optional[List[FieldNode]] = None,
+    return_type=None,
+) -> Optional[Dict[str, int]]:
+    """
+    MongoDB projection covering what the selection set below `field_nodes`
+    (by default the field being resolved) needs, plus `extra_fields`.
+
+    The result is memoized per request, so the resolvers of every item of a
+    list share one analysis. None means "fetch whole documents"
+    """
+    object_type = get_named_type(
+        info.return_type if return_type is None else return_type
+    )
+    if not isinstance(object_type, GraphQLObjectType):
+        return None
+
+    nodes = info.field_nodes if field_nodes is None else field_nodes
+    extra_fields = tuple(extra_fields)
+    memo = info.context.setdefault("projections", {})
+    # The AST nodes live as long as the request, their ids are stable keys
+    memo_key = (tuple(id(node) for node in nodes), object_type.name, extra_fields)
+    if memo_key not in memo:
+        memo[memo_key] = build_projection(info, extra_fields, nodes, object_type)
+    return memo[memo_key]
+
+
+def build_projection(
+    info: GraphQLResolveInfo,
+    extra_fields: Iterable[str],
+    field_nodes: List[FieldNode],
+    object_type: GraphQLObjectType,
+) -> Dict[str, int]:
+    fields = collect_fields(info, field_nodes, object_type) or {}
+    dependencies = RESOLVER_DEPENDENCIES.get(object_type.name, {})
+    paths = list(ALWAYS_PROJECTED) + list(extra_fields)
+    for field_name in fields:
+        if field_name.startswith("__"):
+            continue
+        paths.extend(dependencies.get(field_name, [field_name]))
+    return {path: 1 for path in collapse_paths(paths)}
+
+
+def get_child_projection(
+    info: GraphQLResolveInfo, field_name: str, extra_fields: Iterable[str] = ()
+) -> Optional[Dict[str, int]]:
+    """
+    Projection for the documents of a child field of the value being resolved,
+    e.g. the genes of a Locus. A child that is not selected only gets the
+    ALWAYS_PROJECTED fields
+    """
+    fields = collect_fields(info)
+    if fields is None:
+        return None
+    if field_name not in fields:
+        return {path: 1 for path in ALWAYS_PROJECTED}
+
+    parent_type = get_named_type(info.return_type)
+    assert isinstance(parent_type, GraphQLObjectType)
+    child_type = parent_type.fields[field_name].type
+    return get_projection(info, extra_fields, fields[field_name], child_type)
@@ -0,0 +1,39 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import mongomock_motor
+import pytest
+
+
+def await_latent_cursor(cursor):
+    "Awaiting a mongomock_motor aggregate() cursor gives the cursor itself"
+
+    async def aggregate_result():
+        return cursor
+
+    return aggregate_result().__await__()
+
+
+@pytest.fixture(autouse=True)
+def awaitable_aggregate_cursors(monkeypatch):
+    """
+    pymongo's AsyncMongoClient aggregate() is a coroutine returning the cursor,
+    motor's (and so mongomock_motor's) returns the cursor straight away
+    """
+    monkeypatch.setattr(
+        mongomock_motor.AsyncLatentCommandCursor,
+        "__await__",
+        await_latent_cursor,
+        raising=False,
+    )
@@ -0,0 +1,136 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+
+from common.db import FakeMongoDbClient
+from graphql_service.resolver import columnar
+
+
+def feature(stable_id, start, end, strand=None, biotype=None):
+    document = {
+        "genome_id": "test_genome_id",
+        "type": "Gene",
+        "stable_id": stable_id,
+        "slice": {
+            "region_id": "test_genome_id_chr1_chromosome",
+            "location": {"start": start, "end": end, "length": end - start + 1},
+        },
+    }
+    if strand is not None:
+        document["slice"]["strand"] = {"value": strand}
+    if biotype is not None:
+        document["metadata"] = {"biotype": {"value": biotype}}
+    return document
+
+
+@pytest.fixture(name="client")
+def fixture_client():
+    mongo_client = FakeMongoDbClient()
+    mongo_client.mongo_db.gene.insert_many(
+        [
+            feature("ENSG002.1", 300, 400, -1, "lncRNA"),
+            feature("ENSG001.1", 10, 100, 1, "protein_coding"),
+            feature("ENSG003.1", 350, 360),
+            feature("ENSG004.1", 5000, 6000, 1, "protein_coding"),
+        ]
+    )
+    app = Starlette()
+    app.add_route(
+        "/features", columnar.features_endpoint(mongo_client, None), methods=["GET"]
+    )
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://thoas"
+    )
+
+
+SLICE = {
+    "genome_id": "test_genome_id",
+    "region_name": "chr1",
+    "start": 1,
+    "end": 1000,
+}
+
+
+def test_encode_round_trip():
+    columns = columnar.FeatureColumns()
+    columns.append(feature("ENSG001.1", 10, 100, 1, "protein_coding"))
+    columns.append(feature("ENSG002.1", 300, 400))
+    columns.append(feature("ENSG003.1", 500, 600, -1, "protein_coding"))
+    data = columns.encode()
+
+    assert data[:4] == b"TFC1"
+    assert columnar.decode(data) == {
+        "stable_ids": ["ENSG001.1", "ENSG002.1", "ENSG003.1"],
+        "starts": [10, 300, 500],
+        "ends": [100, 400, 600],
+        "strands": [1, 0, -1],
+        "biotypes": ["protein_coding", None, "protein_coding"],
+    }
+
+
+@pytest.mark.asyncio
+async def test_features_endpoint(client):
+    response = await client.get("/features", params=SLICE)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == columnar.MEDIA_TYPE
+    assert columnar.decode(response.content) == {
+        "stable_ids": ["ENSG001.1", "ENSG002.1", "ENSG003.1"],
+        "starts": [10, 300, 350],
+        "ends": [100, 400, 360],
+        "strands": [1, -1, 0],
+        "biotypes": ["protein_coding", "lncRNA", None],
+    }
+
+
+@pytest.mark.asyncio
+async def test_features_endpoint_filters(client):
+    response = await client.get(
+        "/features",
+        params={**SLICE, "biotype": ["lncRNA", "protein_coding"], "strand": "-1"},
+    )
+
+    assert columnar.decode(response.content)["stable_ids"] == ["ENSG002.1"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"genome_id": "test_genome_id"},
+        {**SLICE, "start": "one"},
+        {**SLICE, "feature_type": "exon"},
+    ],
+)
+async def test_features_endpoint_invalid_slice(params, client):
+    response = await client.get("/features", params=params)
+
+    assert response.status_code == 400
+    assert response.json()["errors"][0]["extensions"]["code"] == "BAD_USER_INPUT"
+
+
+@pytest.mark.asyncio
+async def test_features_endpoint_limit(client, monkeypatch):
+    monkeypatch.setattr(columnar, "MAX_FEATURES", 2)
+
+    response = await client.get("/features", params=SLICE)
+
+    assert response.status_code == 400
+    assert (
+        response.json()["errors"][0]["extensions"]["code"]
+        == "SLICE_RESULT_LIMIT_EXCEEDED"
+    )
@@ -12,10 +12,17 @@
    limitations under the License.
 """
 
+import asyncio
+import pickle
+
 import pytest
+import redis
 
+from common.cache_codec import ResultCodec
 from common.db import FakeMongoDbClient
+from graphql_service.resolver import data_loaders
 from graphql_service.resolver.data_loaders import BatchLoaders
+from graphql_service.tests.test_db_client import FakeAsyncRedis
 
 
 @pytest.mark.asyncio
@@ -59,7 +66,7 @@ async def test_batch_transcript_load():
             },
         ]
     )
-    loaders = BatchLoaders(database, mongo_client)
+    loaders = BatchLoaders(mongo_client.async_mongo_client.db, mongo_client)
 
     response = await loaders.batch_transcript_by_gene_load(["1_ENSG001.1"])
 
@@ -109,8 +116,200 @@ async def test_batch_product_load():
         ]
     )
 
-    loader = BatchLoaders(database, mongo_client)
+    loader = BatchLoaders(mongo_client.async_mongo_client.db, mongo_client)
 
     response = await loader.batch_product_load(["1_ENSP001.1"])
 
     assert response[0][0]["stable_id"] == "ENSP001.1"
+
+
+class SlowSetRedis(FakeAsyncRedis):
+    async def set(self, key, value, **options):
+        await asyncio.sleep(0.05)
+        return await super().set(key, value, **options)
+
+
+class BrokenRedis(FakeAsyncRedis):
+    async def get(self, key):
+        raise redis.ConnectionError("redis went away")
+
+
+def caching_mongo_client(cache):
+    mongo_client = FakeMongoDbClient()
+    mongo_client.redis_cache_enabled = True
+    mongo_client.redis_expiry = 60
+    mongo_client.async_cache = cache
+    mongo_client.mongo_db.region.insert_one(
+        {"type": "Region", "region_id": "1_chr1", "name": "1"}
+    )
+    return mongo_client
+
+
+@pytest.mark.asyncio
+async def test_cache_population_is_write_behind():
+    cache = SlowSetRedis()
+    mongo_client = caching_mongo_client(cache)
+    loaders = BatchLoaders(mongo_client.async_mongo_client.db, mongo_client)
+
+    response = await loaders.batch_region_load(["1_chr1"])
+
+    # The result is served before the SET has completed
+    assert response[0][0]["name"] == "1"
+    assert not cache.store
+    await data_loaders.flush_cache_writes()
+    # The entry and the query index of the release
+    assert len(cache.store) == 2
+
+    # Drop the document, the next load must come from the cache
+    mongo_client.mongo_db.region.delete_many({})
+    loaders = BatchLoaders(mongo_client.async_mongo_client.db, mongo_client)
+    response = await loaders.batch_region_load(["1_chr1"])
+    assert response[0][0]["name"] == "1"
+
+
+@pytest.mark.asyncio
+async def test_large_payloads_are_serialised_off_loop(monkeypatch):
+    cache = FakeAsyncRedis()
+    mongo_client = caching_mongo_client(cache)
+    monkeypatch.setattr(data_loaders, "OFFLOAD_SERIALIZATION_DOCS", 1)
+    monkeypatch.setattr(data_loaders, "OFFLOAD_SERIALIZATION_BYTES", 1)
+    offloaded = []
+    to_thread = asyncio.to_thread
+
+    async def counting_to_thread(func, *args):
+        offloaded.append(func.__name__)
+        return await to_thread(func, *args)
+
+    monkeypatch.setattr(data_loaders.asyncio, "to_thread", counting_to_thread)
+
+    for _ in range(2):
+        loaders = BatchLoaders(mongo_client.async_mongo_client.db, mongo_client)
+        response = await loaders.batch_region_load(["1_chr1"])
+        assert response[0][0]["name"] == "1"
+        await data_loaders.flush_cache_writes()
+
+    assert offloaded == ["encode_all", "decode_all"]
+
+
+@pytest.mark.asyncio
+async def test_redis_errors_fall_back_to_mongo():
+    mongo_client = caching_mongo_client(BrokenRedis())
+    loaders = BatchLoaders(mongo_client.async_mongo_client.db, mongo_client)
+
+    response = await loaders.batch_region_load(["1_chr1"])
+    await data_loaders.flush_cache_writes()
+
+    assert response[0][0]["name"] == "1"
+
+
+@pytest.mark.asyncio
+async def test_results_over_the_size_cap_are_not_cached():
+    cache = FakeAsyncRedis()
+    mongo_client = caching_mongo_client(cache)
+    mongo_client.cache_codec = ResultCodec(max_bytes=10)
+    loaders = BatchLoaders(mongo_client.async_mongo_client.db, mongo_client)
+
+    response = await loaders.batch_region_load(["1_chr1"])
+    await data_loaders.flush_cache_writes()
+
+    assert response[0][0]["name"] == "1"
+    assert not cache.store
+
+
+@pytest.mark.asyncio
+async def test_legacy_cache_entries_are_refreshed():
+    cache = FakeAsyncRedis()
+    mongo_client = caching_mongo_client(cache)
+    loaders = BatchLoaders(mongo_client.async_mongo_client.db, mongo_client)
+    await loaders.batch_region_load(["1_chr1"])
+    await data_loaders.flush_cache_writes()
+    (key,) = [key for key in cache.store if not key.endswith(":queries")]
+    # A headerless pickle, as written by earlier versions
+    cache.store[key] = pickle.dumps([{"region_id": "1_chr1", "name": "stale"}])
+
+    loaders = BatchLoaders(mongo_client.async_mongo_client.db, mongo_client)
+    response = await loaders.batch_region_load(["1_chr1"])
+
+    assert response[0][0]["name"] == "1"
+
+
+@pytest.mark.asyncio
+async def test_results_are_cached_per_foreign_key():
+    cache = FakeAsyncRedis()
+    mongo_client = caching_mongo_client(cache)
+    mongo_client.mongo_db.region.insert_many(
+        [
+            {"type": "Region", "region_id": "1_chr2", "name": "2"},
+            {"type": "Region", "region_id": "1_chr3", "name": "3"},
+        ]
+    )
+    loaders = BatchLoaders(mongo_client.async_mongo_client.db, mongo_client)
+    await loaders.batch_region_load(["1_chr1", "1_chr2", "absent"])
+    await data_loaders.flush_cache_writes()
+
+    # Only chr3 is left in MongoDB, the other keys must come from the cache
+    mongo_client.mongo_db.region.delete_many({"region_id": {"$ne": "1_chr3"}})
+    mongo_client.mongo_db.region.insert_one(
+        {"type": "Region", "region_id": "absent", "name": "too late"}
+    )
+    loaders = BatchLoaders(mongo_client.async_mongo_client.db, mongo_client)
+    response = await loaders.batch_region_load(["1_chr3", "1_chr1", "absent", "1_chr2"])
+
+    assert [[doc["name"] for doc in docs] for docs in response] == [
+        ["3"],
+        ["1"],
+        [],
+        ["2"],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_projected_loaders_fetch_and_cache_by_projection():
+    cache = FakeAsyncRedis()
+    mongo_client = caching_mongo_client(cache)
+    loaders = BatchLoaders(mongo_client.async_mongo_client.db, mongo_client)
+
+    projected = loaders.projected("region_loader", {"name": 1})
+    assert loaders.projected("region_loader", {"name": 1}) is projected
+    assert loaders.projected("region_loader") is loaders.region_loader
+
+    (region,) = await projected.load("1_chr1")
+    await data_loaders.flush_cache_writes()
+
+    assert set(region) == {"_id", "name", "region_id"}
+    (full_region,) = await loaders.region_loader.load("1_chr1")
+    assert full_region["type"] == "Region"
+    await data_loaders.flush_cache_writes()
+    # One entry per projection, plus the query index
+    assert len(cache.store) == 3
+
+
+@pytest.mark.asyncio
+async def test_transcript_rankings_are_cached():
+    mongo_client = FakeMongoDbClient()
+    mongo_client.redis_cache_enabled = True
+    mongo_client.async_cache = FakeAsyncRedis()
+    mongo_client.mongo_db.transcript.insert_many(
+        [
+            {
+                "type": "Transcript",
+                "stable_id": stable_id,
+                "gene_foreign_key": gene,
+                "metadata": {"biotype": {"value": biotype}},
+            }
+            for stable_id, gene, biotype in [
+                ("ENST001.1", "1_ENSG001.1", "lncRNA"),
+                ("ENST002.1", "1_ENSG001.1", "protein_coding"),
+                ("ENST003.1", "1_ENSG002.1", "protein_coding"),
+            ]
+        ]
+    )
+    loaders = BatchLoaders(mongo_client.async_mongo_client.db, mongo_client)
+    keys = ["1_ENSG001.1", "1_ENSG002.1", "1_ENSG003.1"]
+    expected = [["ENST002.1", "ENST001.1"], ["ENST003.1"], []]
+
+    assert await loaders.batch_transcript_rank_load(keys) == expected
+    await data_loaders.flush_cache_writes()
+    mongo_client.mongo_db.transcript.delete_many({})
+
+    assert await loaders.batch_transcript_rank_load(keys) == expected
@@ -0,0 +1,157 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from unittest.mock import Mock
+
+import pytest
+from ariadne import ObjectType, QueryType, graphql, make_executable_schema
+
+from graphql_service.resolver import projection
+
+TYPE_DEFS = """
+type Query {
+  genes: [Gene!]!
+  locus: Locus
+}
+type Locus {
+  genes: [Gene!]!
+  transcripts: [Transcript!]!
+}
+type Gene {
+  stable_id: String
+  symbol: String
+  slice: Slice
+  transcripts: [Transcript!]!
+}
+type Transcript {
+  stable_id: String
+  gene: Gene
+}
+type Slice {
+  region_id: String
+}
+"""
+
+
+async def run(query, variables=None):
+    "Run `query`, returning the projections computed by the resolvers"
+    captured = []
+    query_type = QueryType()
+    gene_type = ObjectType("Gene")
+
+    @query_type.field("genes")
+    def resolve_genes(_, info):
+        captured.append(projection.get_projection(info))
+        return [{"stable_id": "ENSG1"}, {"stable_id": "ENSG2"}]
+
+    @query_type.field("locus")
+    def resolve_locus(_, info):
+        captured.append(projection.get_child_projection(info, "genes"))
+        captured.append(projection.get_child_projection(info, "transcripts"))
+        return {"genes": [], "transcripts": []}
+
+    @gene_type.field("transcripts")
+    def resolve_transcripts(_, info):
+        captured.append(projection.get_projection(info))
+        return []
+
+    schema = make_executable_schema(TYPE_DEFS, query_type, gene_type)
+    success, result = await graphql(
+        schema, {"query": query, "variables": variables}, context_value={}
+    )
+    assert success and "errors" not in result, result
+    return captured
+
+
+@pytest.mark.asyncio
+async def test_fragments_and_aliases_are_merged():
+    captured = await run(
+        """
+        query {
+          genes {
+            id: stable_id
+            other_id: stable_id
+            ... on Gene { symbol }
+            ...GeneSlice
+            __typename
+          }
+        }
+        fragment GeneSlice on Gene { slice { region_id } }
+        """
+    )
+
+    assert captured == [
+        {"genome_id": 1, "slice": 1, "stable_id": 1, "symbol": 1, "type": 1}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_custom_resolvers_bring_their_dependencies():
+    captured = await run(
+        """
+        query($skip: Boolean!) {
+          genes { stable_id symbol @skip(if: $skip) transcripts { stable_id gene { symbol } } }
+        }
+        """,
+        {"skip": True},
+    )
+
+    gene_projection, *transcript_projections = captured
+    assert gene_projection == {
+        "gene_primary_key": 1,
+        "genome_id": 1,
+        "stable_id": 1,
+        "type": 1,
+    }
+    # One per gene, from the same memoized analysis
+    assert len(transcript_projections) == 2
+    assert transcript_projections[0] is transcript_projections[1]
+    assert transcript_projections[0] == {
+        "gene": 1,
+        "genome_id": 1,
+        "stable_id": 1,
+        "type": 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_child_projections():
+    captured = await run("query { locus { genes { symbol } } }")
+
+    assert captured == [
+        {"genome_id": 1, "symbol": 1, "type": 1},
+        # transcripts are not selected
+        {"genome_id": 1, "type": 1},
+    ]
+
+
+def test_collapse_paths():
+    assert projection.collapse_paths(
+        ["metadata.biotype", "metadata", "slice.location.start", "slice.location"]
+    ) == ["metadata", "slice.location"]
+
+
+def test_projection_covers():
+    assert projection.projection_covers(None, {"stable_id": 1})
+    assert projection.projection_covers({"slice": 1}, {"slice.location.start": 1})
+    assert not projection.projection_covers({"stable_id": 1}, {"symbol": 1})
+    assert not projection.projection_covers({"stable_id": 1}, None)
+
+
+def test_unanalysable_selections_fetch_everything():
+    info = Mock()
+    info.context = {}
+
+    assert projection.get_projection(info) is None
+    assert projection.is_requested(info, "assembly")
@@ -12,14 +12,27 @@
    limitations under the License.
 """
 
+import asyncio
+from typing import List
 from unittest.mock import Mock
 
 import pytest
 from starlette.datastructures import State
 
 import graphql_service.resolver.gene_model as model
+from common import binning
+from common.interval_index import IntervalIndexCache
+from common.tile_cache import OverlapTileCache
+from graphql_service.resolver.data_loaders import BatchLoaders, PENDING_CACHE_WRITES
+from graphql_service.resolver.transcript_order import sort_gene_transcripts
+from graphql_service.resolver.exceptions import (
+    InvalidBinSizeError,
+    InvalidCursorError,
+    SliceGenomesMismatchError,
+)
 from common.crossrefs import XrefResolver
 from graphql_service.tests.snapshot_utils import prepare_mongo_instance
+from graphql_service.tests.test_db_client import FakeAsyncRedis
 
 
 def create_graphql_resolve_info(database_client):
@@ -289,27 +302,28 @@ def fixture_genome_data():
     return mongo_client
 
 
-def test_resolve_gene(basic_data):
+@pytest.mark.asyncio
+async def test_resolve_gene(basic_data):
     "Test the querying of Mongo by gene symbol"
 
     info = create_graphql_resolve_info(basic_data)
 
     # Check we can resolve using byId camelCase
-    result = model.resolve_gene(
+    result = await model.resolve_gene(
         None, info, byId={"stable_id": "ENSG001.1", "genome_id": "1"}
     )
     assert result["symbol"] == "banana"
     result = None
 
     # Check we can resolve using by_id snake_case
-    result = model.resolve_gene(
+    result = await model.resolve_gene(
         None, info, by_id={"stable_id": "ENSG001.1", "genome_id": "1"}
     )
     assert result["symbol"] == "banana"
     result = None
 
     with pytest.raises(model.GeneNotFoundError) as gene_not_found_error:
-        result = model.resolve_gene(
+        result = await model.resolve_gene(
             None, info, byId={"stable_id": "BROKEN BROKEN BROKEN", "genome_id": "1"}
         )
     assert not result
@@ -323,20 +337,21 @@ def test_resolve_gene(basic_data):
     gene_not_found_error = None
 
     # Check unversioned query resolves as well
-    result = model.resolve_gene(
+    result = await model.resolve_gene(
         None, info, byId={"stable_id": "ENSG001", "genome_id": "1"}
     )
 
     assert result["symbol"] == "banana"
 
 
-def test_resolve_gene_by_symbol(basic_data):
+@pytest.mark.asyncio
+async def test_resolve_gene_by_symbol(basic_data):
     "Test querying by gene symbol which can be ambiguous"
 
     info = create_graphql_resolve_info(basic_data)
 
     # Check we can resolve using by_symbol
-    result = model.resolve_genes(
+    result = await model.resolve_genes(
         None, info, by_symbol={"symbol": "banana", "genome_id": "1"}
     )
     assert isinstance(result, list)
@@ -344,7 +359,7 @@ def test_resolve_gene_by_symbol(basic_data):
     result = None
 
     with pytest.raises(model.GeneNotFoundError) as gene_not_found_error:
-        result = model.resolve_genes(
+        result = await model.resolve_genes(
             None, info, by_symbol={"symbol": "very not here", "genome_id": "1"}
         )
     assert not result
@@ -357,11 +372,12 @@ def test_resolve_gene_by_symbol(basic_data):
     assert gene_not_found_error.value.extensions["genome_id"] == "1"
 
 
-def test_resolve_transcript_by_id(transcript_data):
+@pytest.mark.asyncio
+async def test_resolve_transcript_by_id(transcript_data):
     "Test fetching of transcripts by stable ID"
 
     info = create_graphql_resolve_info(transcript_data)
-    result = model.resolve_transcript(
+    result = await model.resolve_transcript(
         None, info, byId={"stable_id": "ENST001.1", "genome_id": "1"}
     )
 
@@ -369,11 +385,12 @@ def test_resolve_transcript_by_id(transcript_data):
     assert result["stable_id"] == "ENST001.1"
 
 
-def test_resolve_transcript_by_id_not_found(transcript_data):
+@pytest.mark.asyncio
+async def test_resolve_transcript_by_id_not_found(transcript_data):
     result = None
     info = create_graphql_resolve_info(transcript_data)
     with pytest.raises(model.TranscriptNotFoundError) as transcript_not_found_error:
-        result = model.resolve_transcript(
+        result = await model.resolve_transcript(
             None, info, byId={"stable_id": "FAKEYFAKEYFAKEY", "genome_id": "1"}
         )
     assert not result
@@ -386,20 +403,22 @@ def test_resolve_transcript_by_id_not_found(transcript_data):
     assert transcript_not_found_error.value.extensions["genome_id"] == "1"
 
 
-def test_resolve_transcript_by_symbol(transcript_data):
+@pytest.mark.asyncio
+async def test_resolve_transcript_by_symbol(transcript_data):
     "Test fetching of transcripts by symbol"
 
     info = create_graphql_resolve_info(transcript_data)
-    result = model.resolve_transcript(
+    result = await model.resolve_transcript(
         None, info, bySymbol={"symbol": "kumquat", "genome_id": "1"}
     )
     assert result["stable_id"] == "ENST001.1"
 
 
-def test_resolve_transcript_by_symbol_not_found(transcript_data):
+@pytest.mark.asyncio
+async def test_resolve_transcript_by_symbol_not_found(transcript_data):
     info = create_graphql_resolve_info(transcript_data)
     with pytest.raises(model.TranscriptNotFoundError) as transcript_not_found_error:
-        model.resolve_transcript(
+        await model.resolve_transcript(
             None,
             info,
             bySymbol={"symbol": "some not existing symbol", "genome_id": "1"},
@@ -423,7 +442,7 @@ async def test_resolve_gene_transcripts(transcript_data):
     info = create_graphql_resolve_info(transcript_data)
 
     # Finding the collection here as we are not using the base resolver
-    model.set_db_conn_for_uuid(info, "1")
+    await model.set_db_conn_for_uuid(info, "1")
 
     result = await model.resolve_gene_transcripts(
         {"stable_id": "ENSG001.1", "genome_id": "1", "gene_primary_key": "1_ENSG001.1"},
@@ -435,6 +454,29 @@ async def test_resolve_gene_transcripts(transcript_data):
         assert hit["symbol"] in ["kumquat", "grape"]
 
 
+@pytest.mark.asyncio
+async def test_resolve_gene_transcripts_with_cached_rankings(transcript_data):
+    "With Redis, transcripts are ordered by the cached ranking of their gene"
+
+    transcript_data.redis_cache_enabled = True
+    transcript_data.async_cache = FakeAsyncRedis()
+    info = create_graphql_resolve_info(transcript_data)
+    await model.set_db_conn_for_uuid(info, "1")
+    gene = {
+        "stable_id": "ENSG001.1",
+        "genome_id": "1",
+        "gene_primary_key": "1_ENSG001.1",
+    }
+
+    result = await model.resolve_gene_transcripts(gene, info)
+    page = await model.resolve_transcripts_page_transcripts(
+        {"gene_primary_key": "1_ENSG001.1", "page": 2, "per_page": 1}, info
+    )
+
+    assert [hit["stable_id"] for hit in result] == ["ENST001.1", "ENST002.2"]
+    assert [hit["stable_id"] for hit in page] == ["ENST002.2"]
+
+
 @pytest.mark.asyncio
 async def test_resolve_gene_from_transcript(transcript_data):
     "Check the DataLoader for gene is working via transcript. Requires event loop for DataLoader"
@@ -442,7 +484,7 @@ async def test_resolve_gene_from_transcript(transcript_data):
     info = create_graphql_resolve_info(transcript_data)
 
     # Finding the collection here as we are not using the base resolver
-    model.set_db_conn_for_uuid(info, "1")
+    await model.set_db_conn_for_uuid(info, "1")
 
     result = await model.resolve_transcript_gene(
         {"gene": "ENSG001.1", "genome_id": "1"}, info
@@ -453,15 +495,66 @@ async def test_resolve_gene_from_transcript(transcript_data):
     assert result["symbol"] == "banana"
 
 
-def test_resolve_overlap(slice_data):
+def spy_loads(monkeypatch) -> List[str]:
+    "The collections BatchLoaders go to (or the cache) for, in order"
+    loads = []
+    load_by_foreign_key = BatchLoaders.load_by_foreign_key
+
+    async def spy(self, doc_type, *args, **kwargs):
+        loads.append(doc_type)
+        return await load_by_foreign_key(self, doc_type, *args, **kwargs)
+
+    monkeypatch.setattr(BatchLoaders, "load_by_foreign_key", spy)
+    return loads
+
+
+@pytest.mark.asyncio
+async def test_transcript_genes_are_batched_per_genome(transcript_data, monkeypatch):
+    "Transcripts of the same gene share one load, scoped to their genome"
+    transcript_data.mongo_db.gene.insert_one(
+        {"genome_id": "2", "type": "Gene", "stable_id": "ENSG001.1", "symbol": "fig"}
+    )
+    info = create_graphql_resolve_info(transcript_data)
+    await model.set_db_conn_for_uuid(info, "1")
+    loads = spy_loads(monkeypatch)
+
+    genes = await asyncio.gather(
+        *[
+            model.resolve_transcript_gene({"gene": "ENSG001.1", "genome_id": "1"}, info)
+            for _ in range(3)
+        ]
+    )
+
+    assert [gene["symbol"] for gene in genes] == ["banana"] * 3
+    assert loads == ["gene"]
+
+
+@pytest.mark.asyncio
+async def test_transcript_gene_reuses_the_loaded_gene(transcript_data, monkeypatch):
+    info = create_graphql_resolve_info(transcript_data)
+    gene = await model.resolve_gene(
+        None, info, by_id={"stable_id": "ENSG001.1", "genome_id": "1"}
+    )
+    loads = spy_loads(monkeypatch)
+
+    result = await model.resolve_transcript_gene(
+        {"gene": "ENSG001.1", "genome_id": "1"}, info
+    )
+
+    assert result is gene
+    assert not loads
+
+
+@pytest.mark.asyncio
+async def test_resolve_overlap(slice_data):
     "Check features can be found via coordinates"
 
     info = create_graphql_resolve_info(slice_data)
 
     # Finding the collection here as we are not using the base resolver
-    model.set_db_conn_for_uuid(info, "test_genome_id")
+    await model.set_db_conn_for_uuid(info, "test_genome_id")
 
-    result = model.resolve_overlap(
+    result = await model.resolve_overlap(
         None,
         info,
         genomeId="test_genome_id",
@@ -470,7 +563,305 @@ def test_resolve_overlap(slice_data):
         end=11,
         by_slice=None,
     )
-    assert {hit["stable_id"] for hit in result["genes"]} == {"ENSG001.1"}
+    genes = await model.resolve_locus_genes(result, info)
+    assert {hit["stable_id"] for hit in genes} == {"ENSG001.1"}
+
+
+@pytest.mark.asyncio
+async def test_resolve_overlap_from_interval_index(slice_data):
+    "The interval index finds the same features as the MongoDB query"
+
+    slice_data.interval_indexes = IntervalIndexCache(max_bytes=10**6)
+    info = create_graphql_resolve_info(slice_data)
+    await model.set_db_conn_for_uuid(info, "test_genome_id")
+
+    result = await model.resolve_overlap(
+        None,
+        info,
+        by_slice={
+            "genome_id": "test_genome_id",
+            "region_name": "chr1",
+            "start": 50,
+            "end": 150,
+        },
+    )
+    genes = await model.resolve_locus_genes(result, info)
+    assert [hit["stable_id"] for hit in genes] == ["ENSG001.1", "ENSG002.2"]
+    assert not await model.resolve_locus_transcripts(result, info)
+
+    result = await model.resolve_overlap(
+        None,
+        info,
+        by_slice={
+            "genome_id": "test_genome_id",
+            "region_name": "chr1",
+            "start": 205,
+            "end": 305,
+        },
+    )
+    with pytest.raises(model.SliceLimitExceededError):
+        await model.resolve_locus_genes(result, info)
+
+
+@pytest.mark.asyncio
+async def test_resolve_overlap_from_tiles(slice_data, monkeypatch):
+    "Shifted windows are assembled from the tiles cached for earlier ones"
+
+    slice_data.overlap_tiles = OverlapTileCache(tile_size=50)
+    slice_data.redis_cache_enabled = True
+    slice_data.async_cache = FakeAsyncRedis()
+    fetched = []
+    fetch_overlap_tiles = model.fetch_overlap_tiles
+
+    async def spy(connection, tile_cache, locus, feature_type, tiles):
+        fetched.append(tiles)
+        return await fetch_overlap_tiles(
+            connection, tile_cache, locus, feature_type, tiles
+        )
+
+    monkeypatch.setattr(model, "fetch_overlap_tiles", spy)
+    info = create_graphql_resolve_info(slice_data)
+    await model.set_db_conn_for_uuid(info, "test_genome_id")
+
+    async def overlap(start, end):
+        locus = await model.resolve_overlap(
+            None,
+            info,
+            by_slice={
+                "genome_id": "test_genome_id",
+                "region_name": "chr1",
+                "start": start,
+                "end": end,
+            },
+        )
+        genes = await model.resolve_locus_genes(locus, info)
+        return [gene["stable_id"] for gene in genes]
+
+    # ENSG001.1 spans tiles 0 and 1, it is returned once
+    assert await overlap(40, 120) == ["ENSG001.1", "ENSG002.2"]
+    assert await overlap(60, 140) == ["ENSG001.1", "ENSG002.2"]
+    assert await overlap(101, 109) == []
+    assert fetched == [[0, 1, 2]]
+
+    # Another worker reads the tiles from Redis
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*[t for t in PENDING_CACHE_WRITES if t.get_loop() is loop])
+    slice_data.overlap_tiles = OverlapTileCache(tile_size=50)
+    assert await overlap(10, 100) == ["ENSG001.1"]
+    assert fetched == [[0, 1, 2]]
+
+    with pytest.raises(model.SliceLimitExceededError):
+        await overlap(205, 305)
+
+
+@pytest.mark.asyncio
+async def test_fetch_overlap_tiles_skips_cached_tiles_between_runs(slice_data):
+    "Missing tiles 0 and 3 are queried without re-reading tiles 1 and 2"
+    slice_data.mongo_db.gene.insert_one(
+        {
+            "genome_id": "test_genome_id",
+            "type": "Gene",
+            "stable_id": "ENSG003.1",
+            "slice": {
+                "region_id": "test_genome_id_chr1_chromosome",
+                "location": {"start": 60, "end": 90},
+            },
+        }
+    )
+    info = create_graphql_resolve_info(slice_data)
+    await model.set_db_conn_for_uuid(info, "test_genome_id")
+    collection = model.get_db_conn(info)["gene"]
+    recording = Mock(wraps=collection)
+    locus = {
+        "genome_id": "test_genome_id",
+        "region_id": "test_genome_id_chr1_chromosome",
+        "binned": False,
+    }
+
+    by_tile = await model.fetch_overlap_tiles(
+        {"gene": recording}, OverlapTileCache(tile_size=50), locus, "Gene", [0, 3]
+    )
+
+    assert [[entry[:2] for entry in by_tile[tile]] for tile in (0, 3)] == [
+        [(10, 100)],
+        [(110, 200)],
+    ]
+    (query, _), _ = recording.find.call_args
+    scanned = await collection.find(query).to_list(length=None)
+    assert {gene["stable_id"] for gene in scanned} == {"ENSG001.1", "ENSG002.2"}
+
+
+@pytest.mark.parametrize("interval_index", [False, True])
+@pytest.mark.asyncio
+async def test_resolve_overlap_with_filters(interval_index, slice_data):
+    "Filters apply in the query, before the 1000 feature limit"
+
+    features = [
+        ("Gene", "ENSG003.1", "lncRNA", 1, 60, None),
+        ("Gene", "ENSG004.1", "lncRNA", -1, 20, None),
+        ("Transcript", "ENST003.1", "lncRNA", 1, 60, {"value": True}),
+        ("Transcript", "ENST004.1", "lncRNA", 1, 20, None),
+    ]
+    for feature_type, stable_id, biotype, strand, length, canonical in features:
+        slice_data.mongo_db[feature_type.lower()].insert_one(
+            {
+                "genome_id": "test_genome_id",
+                "type": feature_type,
+                "stable_id": stable_id,
+                "metadata": {"biotype": {"value": biotype}, "canonical": canonical},
+                "slice": {
+                    "region_id": "test_genome_id_chr1_chromosome",
+                    "location": {"start": 220, "end": 219 + length, "length": length},
+                    "strand": {"value": strand},
+                },
+            }
+        )
+    if interval_index:
+        slice_data.interval_indexes = IntervalIndexCache(max_bytes=10**6)
+    info = create_graphql_resolve_info(slice_data)
+    await model.set_db_conn_for_uuid(info, "test_genome_id")
+
+    async def overlap(**filters):
+        locus = await model.resolve_overlap(
+            None,
+            info,
+            by_slice={
+                "genome_id": "test_genome_id",
+                "region_name": "chr1",
+                "start": 205,
+                "end": 305,
+                **filters,
+            },
+        )
+        genes = await model.resolve_locus_genes(locus, info)
+        transcripts = await model.resolve_locus_transcripts(locus, info)
+        return sorted(feature["stable_id"] for feature in genes + transcripts)
+
+    assert await overlap(biotypes=["lncRNA"]) == [
+        "ENSG003.1",
+        "ENSG004.1",
+        "ENST003.1",
+        "ENST004.1",
+    ]
+    assert await overlap(biotypes=["lncRNA"], strand=-1) == ["ENSG004.1"]
+    assert await overlap(min_length=30, max_length=100) == ["ENSG003.1", "ENST003.1"]
+    assert await overlap(biotypes=["lncRNA"], canonical_only=True) == [
+        "ENSG003.1",
+        "ENSG004.1",
+        "ENST003.1",
+    ]
+    with pytest.raises(model.SliceLimitExceededError):
+        await overlap(canonical_only=False)
+
+
+@pytest.mark.asyncio
+async def test_resolve_overlaps(slice_data, monkeypatch):
+    "The windows of a region are fetched by one query per feature type"
+
+    fetched = []
+    fetch_overlap_batch = model.fetch_overlap_batch
+
+    async def spy(connection, batch, feature_type, projection=None):
+        fetched.append((feature_type, sorted(batch["windows"])))
+        return await fetch_overlap_batch(connection, batch, feature_type, projection)
+
+    monkeypatch.setattr(model, "fetch_overlap_batch", spy)
+    info = create_graphql_resolve_info(slice_data)
+    windows = [(10, 11), (50, 150), (120, 130), (205, 305)]
+
+    loci = await model.resolve_overlaps(
+        None,
+        info,
+        [
+            {
+                "genome_id": "test_genome_id",
+                "region_name": "chr1",
+                "start": start,
+                "end": end,
+            }
+            for start, end in windows
+        ],
+    )
+    genes = await asyncio.gather(
+        *[model.resolve_locus_genes(locus, info) for locus in loci],
+        return_exceptions=True,
+    )
+
+    assert [[gene["stable_id"] for gene in found] for found in genes[:3]] == [
+        ["ENSG001.1"],
+        ["ENSG001.1", "ENSG002.2"],
+        ["ENSG002.2"],
+    ]
+    # The limit still applies to each window
+    assert isinstance(genes[3], model.SliceLimitExceededError)
+    assert fetched == [("Gene", windows)]
+
+
+@pytest.mark.asyncio
+async def test_resolve_overlaps_of_several_genomes(slice_data):
+    info = create_graphql_resolve_info(slice_data)
+    slices = [
+        {"genome_id": genome_id, "region_name": "chr1", "start": 1, "end": 10}
+        for genome_id in ("test_genome_id", "other_genome_id")
+    ]
+
+    with pytest.raises(SliceGenomesMismatchError) as mismatch_error:
+        await model.resolve_overlaps(None, info, slices)
+    assert mismatch_error.value.extensions["code"] == "SLICE_GENOMES_MISMATCH"
+    assert not await model.resolve_overlaps(None, info, [])
+
+
+async def page_through_locus(info, locus, first):
+    "Stable ids of every page of the genes of a locus"
+    pages = []
+    after = None
+    while True:
+        page = await model.resolve_locus_genes_page(locus, info, first, after)
+        pages.append([gene["stable_id"] for gene in page["genes"]])
+        if not page["page_info"]["has_next_page"]:
+            return pages
+        after = page["page_info"]["end_cursor"]
+
+
+@pytest.mark.parametrize("interval_index", [False, True])
+@pytest.mark.asyncio
+async def test_locus_pages(interval_index, slice_data):
+    "Pages stream the 1001 features that overlap_region refuses to return"
+
+    if interval_index:
+        slice_data.interval_indexes = IntervalIndexCache(max_bytes=10**6)
+    info = create_graphql_resolve_info(slice_data)
+    await model.set_db_conn_for_uuid(info, "test_genome_id")
+    locus = {
+        "genome_id": "test_genome_id",
+        "region_id": "test_genome_id_chr1_chromosome",
+        "start": 50,
+        "end": 305,
+        "binned": False,
+    }
+
+    pages = await page_through_locus(info, locus, 400)
+
+    assert [len(page) for page in pages] == [400, 400, 203]
+    stable_ids = [stable_id for page in pages for stable_id in page]
+    assert stable_ids[:2] == ["ENSG001.1", "ENSG002.2"]
+    assert len(set(stable_ids)) == 1003
+
+
+@pytest.mark.asyncio
+async def test_locus_page_with_invalid_cursor(slice_data):
+    info = create_graphql_resolve_info(slice_data)
+    await model.set_db_conn_for_uuid(info, "test_genome_id")
+    locus = {
+        "genome_id": "test_genome_id",
+        "region_id": "test_genome_id_chr1_chromosome",
+        "start": 50,
+        "end": 305,
+        "binned": False,
+    }
+
+    with pytest.raises(InvalidCursorError):
+        await model.resolve_locus_genes_page(locus, info, 10, "not a cursor")
 
 
 query_region_expectations = [
@@ -490,15 +881,16 @@ query_region_expectations = [
 
 
 @pytest.mark.parametrize("start,end,expected_ids", query_region_expectations)
-def test_overlap_region(start, end, expected_ids, slice_data):
+@pytest.mark.asyncio
+async def test_overlap_region(start, end, expected_ids, slice_data):
 
     info = create_graphql_resolve_info(slice_data)
 
     # Finding the collection here as we are not using the base resolver
-    model.set_db_conn_for_uuid(info, "test_genome_id")
+    await model.set_db_conn_for_uuid(info, "test_genome_id")
     connection = model.get_db_conn(info)
 
-    result = model.overlap_region(
+    result = await model.overlap_region(
         connection=connection,
         genome_id="test_genome_id",
         region_id="test_genome_id_chr1_chromosome",
@@ -509,17 +901,40 @@ def test_overlap_region(start, end, expected_ids, slice_data):
     assert {hit["stable_id"] for hit in result} == expected_ids
 
 
-def test_overlap_region_too_many_results(slice_data):
+@pytest.mark.parametrize("start,end,expected_ids", query_region_expectations)
+@pytest.mark.asyncio
+async def test_overlap_region_binned(start, end, expected_ids, slice_data):
+
+    info = create_graphql_resolve_info(slice_data)
+    await model.set_db_conn_for_uuid(info, "test_genome_id")
+    connection = model.get_db_conn(info)
+    await binning.backfill_release(connection)
+
+    result = await model.overlap_region(
+        connection=connection,
+        genome_id="test_genome_id",
+        region_id="test_genome_id_chr1_chromosome",
+        start=start,
+        end=end,
+        feature_type="Gene",
+        binned=True,
+    )
+    assert {hit["stable_id"] for hit in result} == expected_ids
+    assert await slice_data.has_overlap_bins(connection)
+
+
+@pytest.mark.asyncio
+async def test_overlap_region_too_many_results(slice_data):
 
     info = create_graphql_resolve_info(slice_data)
 
     # Finding the collection here as we are not using the base resolver
-    model.set_db_conn_for_uuid(info, "test_genome_id")
+    await model.set_db_conn_for_uuid(info, "test_genome_id")
     connection = model.get_db_conn(info)
 
     result = None
     with pytest.raises(model.SliceLimitExceededError) as slice_limit_exceeded_error:
-        result = model.overlap_region(
+        result = await model.overlap_region(
             connection=connection,
             genome_id="test_genome_id",
             region_id="test_genome_id_chr1_chromosome",
@@ -537,6 +952,62 @@ def test_overlap_region_too_many_results(slice_data):
     )
 
 
+SLICE_REGION = {
+    "genome_id": "test_genome_id",
+    "region_id": "test_genome_id_chr1_chromosome",
+    "length": 350,
+}
+
+
+@pytest.mark.asyncio
+async def test_resolve_region_feature_density(slice_data):
+    info = create_graphql_resolve_info(slice_data)
+    await model.set_db_conn_for_uuid(info, "test_genome_id")
+
+    result = await model.resolve_region_feature_density(SLICE_REGION, info, 100)
+
+    assert result["bin_size"] == 100
+    assert [(b["start"], b["end"]) for b in result["bins"]] == [
+        (1, 100),
+        (101, 200),
+        (201, 300),
+        (301, 350),
+    ]
+    assert [b["counts"] for b in result["bins"]] == [
+        [{"feature_type": "Gene", "biotype": None, "count": 1}],
+        [{"feature_type": "Gene", "biotype": None, "count": 1}],
+        [{"feature_type": "Gene", "biotype": None, "count": 1001}],
+        [],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_resolve_region_feature_density_is_cached(slice_data):
+    slice_data.redis_cache_enabled = True
+    slice_data.async_cache = FakeAsyncRedis()
+    info = create_graphql_resolve_info(slice_data)
+    await model.set_db_conn_for_uuid(info, "test_genome_id")
+
+    first = await model.resolve_region_feature_density(SLICE_REGION, info, 100)
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*[t for t in PENDING_CACHE_WRITES if t.get_loop() is loop])
+    slice_data.mongo_db.gene.delete_many({})
+
+    assert await model.resolve_region_feature_density(SLICE_REGION, info, 100) == first
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("length,bin_size", [(350, 0), (10**9, 1000)])
+async def test_resolve_region_feature_density_bin_size(length, bin_size, slice_data):
+    info = create_graphql_resolve_info(slice_data)
+    await model.set_db_conn_for_uuid(info, "test_genome_id")
+    region = dict(SLICE_REGION, length=length)
+
+    with pytest.raises(InvalidBinSizeError) as bin_size_error:
+        await model.resolve_region_feature_density(region, info, bin_size)
+    assert bin_size_error.value.extensions["code"] == "INVALID_BIN_SIZE"
+
+
 @pytest.mark.asyncio
 async def test_resolve_region_happy_case(region_data):
     slc = {
@@ -548,7 +1019,7 @@ async def test_resolve_region_happy_case(region_data):
     info = create_graphql_resolve_info(region_data)
 
     # Finding the collection here as we are not using the base resolver
-    model.set_db_conn_for_uuid(info, "plasmodium_falciparum_GCA_000002765_2")
+    await model.set_db_conn_for_uuid(info, "plasmodium_falciparum_GCA_000002765_2")
 
     result = await model.resolve_region_from_slice(slc, info)
     assert result["region_id"] == "plasmodium_falciparum_GCA_000002765_2_13"
@@ -560,7 +1031,7 @@ async def test_resolve_region_region_not_exist(region_data):
     slc = {
         "region_id": "some_non_existing_region_id",
     }
-    model.set_db_conn_for_uuid(info, "plasmodium_falciparum_GCA_000002765_2")
+    await model.set_db_conn_for_uuid(info, "plasmodium_falciparum_GCA_000002765_2")
 
     result = None
     with pytest.raises(model.RegionFromSliceNotFoundError) as region_error:
@@ -569,7 +1040,8 @@ async def test_resolve_region_region_not_exist(region_data):
     assert region_error.value.extensions["region_id"] == "some_non_existing_region_id"
 
 
-def test_url_generation(basic_data):
+@pytest.mark.asyncio
+async def test_url_generation(basic_data):
     "Check URLs are attached to cross references"
     xref = {
         "accession_id": "some_molecule",
@@ -608,7 +1080,7 @@ async def test_resolve_transcript_products(transcript_data):
     info = create_graphql_resolve_info(transcript_data)
 
     # Finding the collection here as we are not using the base resolver
-    model.set_db_conn_for_uuid(info, "1")
+    await model.set_db_conn_for_uuid(info, "1")
 
     result = await model.resolve_product_by_pgc(
         {
@@ -633,7 +1105,7 @@ async def test_resolve_transcript_products_product_not_exists(transcript_data):
     info = create_graphql_resolve_info(transcript_data)
 
     # Finding the collection here as we are not using the base resolver
-    model.set_db_conn_for_uuid(info, "1")
+    await model.set_db_conn_for_uuid(info, "1")
 
     result = None
     with pytest.raises(model.FieldNotFoundError) as field_not_found_error:
@@ -647,7 +1119,7 @@ async def test_resolve_nested_products(transcript_data):
     "Test products inside transcripts inside the gene"
 
     info = create_graphql_resolve_info(transcript_data)
-    gene_result = model.resolve_gene(
+    gene_result = await model.resolve_gene(
         None, info, byId={"genome_id": "1", "stable_id": "ENSG001.1"}
     )
     assert gene_result
@@ -666,7 +1138,7 @@ async def test_resolve_assembly_from_region(genome_data):
     info = create_graphql_resolve_info(genome_data)
 
     # Finding the collection here as we are not using the base resolver
-    model.set_db_conn_for_uuid(info, "1")
+    await model.set_db_conn_for_uuid(info, "1")
 
     region = {
         "type": "Region",
@@ -681,12 +1153,31 @@ async def test_resolve_assembly_from_region(genome_data):
     }
 
 
+@pytest.mark.asyncio
+async def test_region_assemblies_are_batched(genome_data, monkeypatch):
+    info = create_graphql_resolve_info(genome_data)
+    await model.set_db_conn_for_uuid(info, "1")
+    loads = spy_loads(monkeypatch)
+
+    assemblies = await asyncio.gather(
+        *[
+            model.resolve_assembly_from_region(
+                {"type": "Region", "assembly_id": assembly_id}, info
+            )
+            for assembly_id in ["test_assembly_id_1", "test_assembly_id_1"]
+        ]
+    )
+
+    assert [assembly["name"] for assembly in assemblies] == ["banana assembly"] * 2
+    assert loads == ["assembly"]
+
+
 @pytest.mark.asyncio
 async def test_resolve_assembly_from_region_not_exists(genome_data):
     info = create_graphql_resolve_info(genome_data)
 
     # Finding the collection here as we are not using the base resolver
-    model.set_db_conn_for_uuid(info, "1")
+    await model.set_db_conn_for_uuid(info, "1")
 
     region = {
         "type": "Region",
@@ -707,7 +1198,7 @@ async def test_resolve_regions_from_assembly(genome_data):
     info = create_graphql_resolve_info(genome_data)
 
     # Finding the collection here as we are not using the base resolver
-    model.set_db_conn_for_uuid(info, "1")
+    await model.set_db_conn_for_uuid(info, "1")
 
     assembly = {
         "type": "Assembly",
@@ -736,7 +1227,7 @@ async def test_resolve_regions_from_assembly_not_exists(genome_data):
     info = create_graphql_resolve_info(genome_data)
 
     # Finding the collection here as we are not using the base resolver
-    model.set_db_conn_for_uuid(info, "1")
+    await model.set_db_conn_for_uuid(info, "1")
 
     assembly = {
         "type": "Assembly",
@@ -755,7 +1246,7 @@ async def test_resolve_organism_from_assembly(genome_data):
     info = create_graphql_resolve_info(genome_data)
 
     # Finding the collection here as we are not using the base resolver
-    model.set_db_conn_for_uuid(info, "1")
+    await model.set_db_conn_for_uuid(info, "1")
 
     assembly = {"type": "Assembly", "organism_foreign_key": "test_organism_id_1"}
 
@@ -775,7 +1266,7 @@ async def test_resolve_organism_from_assembly_not_exists(genome_data):
     info = create_graphql_resolve_info(genome_data)
 
     # Finding the collection here as we are not using the base resolver
-    model.set_db_conn_for_uuid(info, "1")
+    await model.set_db_conn_for_uuid(info, "1")
 
     assembly = {"type": "Assembly", "organism_foreign_key": "blah blah"}
 
@@ -791,7 +1282,7 @@ async def test_resolve_assemblies_from_organism(genome_data):
     info = create_graphql_resolve_info(genome_data)
 
     # Finding the collection here as we are not using the base resolver
-    model.set_db_conn_for_uuid(info, "1")
+    await model.set_db_conn_for_uuid(info, "1")
 
     organism = {
         "type": "Organism",
@@ -822,7 +1313,7 @@ async def test_resolve_assemblies_from_organism(genome_data):
 async def test_resolve_assemblies_from_organism_not_exists(genome_data):
     info = create_graphql_resolve_info(genome_data)
     # Finding the collection here as we are not using the base resolver
-    model.set_db_conn_for_uuid(info, "1")
+    await model.set_db_conn_for_uuid(info, "1")
 
     organism = {
         "type": "Organism",
@@ -844,7 +1335,7 @@ async def test_resolve_species_from_organism(genome_data):
     info = create_graphql_resolve_info(genome_data)
 
     # Finding the collection here as we are not using the base resolver
-    model.set_db_conn_for_uuid(info, "1")
+    await model.set_db_conn_for_uuid(info, "1")
 
     organism = {
         "type": "Organism",
@@ -867,7 +1358,7 @@ async def test_resolve_species_from_organism_not_exists(genome_data):
     info = create_graphql_resolve_info(genome_data)
 
     # Finding the collection here as we are not using the base resolver
-    model.set_db_conn_for_uuid(info, "1")
+    await model.set_db_conn_for_uuid(info, "1")
 
     organism = {
         "type": "Organism",
@@ -887,7 +1378,7 @@ async def test_resolve_organisms_from_species(genome_data):
     info = create_graphql_resolve_info(genome_data)
 
     # Finding the collection here as we are not using the base resolver
-    model.set_db_conn_for_uuid(info, "1")
+    await model.set_db_conn_for_uuid(info, "1")
 
     species = {
         "type": "Species",
@@ -918,7 +1409,7 @@ async def test_resolve_organisms_from_species_not_exists(genome_data):
     info = create_graphql_resolve_info(genome_data)
 
     # Finding the collection here as we are not using the base resolver
-    model.set_db_conn_for_uuid(info, "1")
+    await model.set_db_conn_for_uuid(info, "1")
 
     species = {
         "type": "Species",
@@ -985,7 +1476,7 @@ async def test_resolve_transcripts_page_transcripts(transcript_data):
     info = create_graphql_resolve_info(transcript_data)
 
     # Finding the collection here as we are not using the base resolver
-    model.set_db_conn_for_uuid(info, "1")
+    await model.set_db_conn_for_uuid(info, "1")
 
     transcripts_page = {"gene_primary_key": "1_ENSG001.1", "page": 2, "per_page": 1}
     result = await model.resolve_transcripts_page_transcripts(transcripts_page, info)
@@ -1008,7 +1499,7 @@ async def test_resolve_transcripts_page_transcripts_no_transcripts(transcript_da
     info = create_graphql_resolve_info(transcript_data)
 
     # Finding the collection here as we are not using the base resolver
-    model.set_db_conn_for_uuid(info, "1")
+    await model.set_db_conn_for_uuid(info, "1")
 
     transcripts_page = {"gene_primary_key": "1_ENSG001.1", "page": 3, "per_page": 1}
     result = await model.resolve_transcripts_page_transcripts(transcripts_page, info)
@@ -1020,13 +1511,100 @@ async def test_resolve_transcripts_page_metadata(transcript_data):
     info = create_graphql_resolve_info(transcript_data)
 
     # Finding the collection here as we are not using the base resolver
-    model.set_db_conn_for_uuid(info, "1")
+    await model.set_db_conn_for_uuid(info, "1")
 
     transcripts_page = {"gene_primary_key": "1_ENSG001.1", "page": 2, "per_page": 1}
     result = await model.resolve_transcripts_page_metadata(transcripts_page, info)
     assert result == {"page": 2, "per_page": 1, "total_count": 2}
 
 
+@pytest.mark.asyncio
+async def test_transcripts_page_and_metadata_share_one_load(
+    transcript_data, monkeypatch
+):
+    info = create_graphql_resolve_info(transcript_data)
+    await model.set_db_conn_for_uuid(info, "1")
+    loads = []
+    load_by_foreign_key = BatchLoaders.load_by_foreign_key
+
+    async def spy(self, doc_type, *args, **kwargs):
+        loads.append(doc_type)
+        return await load_by_foreign_key(self, doc_type, *args, **kwargs)
+
+    monkeypatch.setattr(BatchLoaders, "load_by_foreign_key", spy)
+    transcripts_page = {"gene_primary_key": "1_ENSG001.1", "page": 1, "per_page": 1}
+
+    page, metadata = await asyncio.gather(
+        model.resolve_transcripts_page_transcripts(transcripts_page, info),
+        model.resolve_transcripts_page_metadata(transcripts_page, info),
+    )
+
+    assert [hit["stable_id"] for hit in page] == ["ENST001.1"]
+    assert metadata["total_count"] == 2
+    assert loads == ["transcript"]
+
+
+@pytest.mark.asyncio
+async def test_transcripts_pages_of_many_genes_are_batched(
+    transcript_data, monkeypatch
+):
+    "The pages of N genes cost one ranking load and one page fetch"
+    transcripts = [
+        {
+            "genome_id": "1",
+            "type": "Transcript",
+            "stable_id": f"ENST10{gene}.{transcript}",
+            "gene_foreign_key": f"1_ENSG10{gene}.1",
+            "product_generating_contexts": [],
+        }
+        for gene in range(3)
+        for transcript in range(3)
+    ]
+    transcript_data.mongo_db.transcript.insert_many(transcripts)
+    expected_pages = [["ENST002.2"]] + [
+        [
+            transcript["stable_id"]
+            for transcript in sort_gene_transcripts(
+                transcripts[gene * 3 : gene * 3 + 3]
+            )[:2]
+        ]
+        for gene in range(3)
+    ]
+    info = create_graphql_resolve_info(transcript_data)
+    await model.set_db_conn_for_uuid(info, "1")
+    loads, page_batches = [], []
+    load_by_foreign_key = BatchLoaders.load_by_foreign_key
+    batch_transcript_page_load = BatchLoaders.batch_transcript_page_load
+
+    async def spy_load(self, doc_type, *args, **kwargs):
+        loads.append(doc_type)
+        return await load_by_foreign_key(self, doc_type, *args, **kwargs)
+
+    async def spy_pages(self, keys, projection=None):
+        page_batches.append(keys)
+        return await batch_transcript_page_load(self, keys, projection)
+
+    monkeypatch.setattr(BatchLoaders, "load_by_foreign_key", spy_load)
+    monkeypatch.setattr(BatchLoaders, "batch_transcript_page_load", spy_pages)
+    transcripts_pages = [
+        {"gene_primary_key": "1_ENSG001.1", "page": 2, "per_page": 1}
+    ] + [
+        {"gene_primary_key": f"1_ENSG10{gene}.1", "page": 1, "per_page": 2}
+        for gene in range(3)
+    ]
+
+    pages = await asyncio.gather(
+        *[
+            model.resolve_transcripts_page_transcripts(transcripts_page, info)
+            for transcripts_page in transcripts_pages
+        ]
+    )
+
+    assert [[hit["stable_id"] for hit in page] for page in pages] == expected_pages
+    assert loads == ["transcript"]
+    assert len(page_batches) == 1
+
+
 def remove_ids(test_output):
     if isinstance(test_output, dict):
         del test_output["_id"]
@@ -1035,3 +1613,25 @@ def remove_ids(test_output):
             del output["_id"]
 
     return test_output
+
+
+@pytest.mark.asyncio
+async def test_release_lookups_are_batched_per_request(basic_data):
+    "Genomes resolved in the same tick share one batch lookup"
+    batches = []
+    get_async_database_conns = basic_data.get_async_database_conns
+
+    async def record_batch(grpc_model, uuids):
+        batches.append(list(uuids))
+        return await get_async_database_conns(grpc_model, uuids)
+
+    basic_data.get_async_database_conns = record_batch
+    info = create_graphql_resolve_info(basic_data)
+
+    await asyncio.gather(
+        model.set_db_conn_for_uuid(info, "1"),
+        model.set_db_conn_for_uuid(info, "2"),
+        model.set_db_conn_for_uuid(info, "1"),
+    )
+
+    assert batches == [["1", "2"]]
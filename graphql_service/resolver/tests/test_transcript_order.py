@@ -14,7 +14,12 @@
 
 import copy
 
-from graphql_service.resolver.transcript_order import sort_gene_transcripts
+from graphql_service.resolver.transcript_order import (
+    order_by_ranking,
+    rank_transcripts_by_gene,
+    sort_gene_transcripts,
+    top_gene_transcripts,
+)
 from graphql_service.resolver.tests.dummy_transcripts_sample import (
     dummy_transcripts_sample,
 )
@@ -98,3 +103,43 @@ def test_sort_honors_display_rank_override():
         "high_rank",
         "low_rank",
     ]
+
+
+def test_top_transcripts_match_sort():
+    """The heap selection returns the first transcripts of the full sort."""
+    transcripts = copy.deepcopy(dummy_transcripts_sample)
+    ranked = [
+        dict(tr, display_rank=len(transcripts) - i) for i, tr in enumerate(transcripts)
+    ]
+
+    for sample in (transcripts, ranked):
+        for count in range(len(sample) + 2):
+            assert (
+                top_gene_transcripts(sample, count)
+                == sort_gene_transcripts(sample)[:count]
+            )
+
+
+def test_rank_transcripts_by_gene_matches_sort():
+    """Rankings of several genes scored at once are those of the per-gene sort."""
+    transcripts = copy.deepcopy(dummy_transcripts_sample)
+    for position, transcript in enumerate(transcripts):
+        transcript["gene_foreign_key"] = f"gene_{position % 2}"
+
+    rankings = rank_transcripts_by_gene(transcripts)
+
+    assert set(rankings) == {"gene_0", "gene_1"}
+    for gene, ranking in rankings.items():
+        gene_transcripts = [tr for tr in transcripts if tr["gene_foreign_key"] == gene]
+        assert ranking == [
+            tr["stable_id"] for tr in sort_gene_transcripts(gene_transcripts)
+        ]
+
+
+def test_order_by_ranking():
+    """Transcripts follow the ranking, unranked ones come last."""
+    transcripts = [{"stable_id": stable_id} for stable_id in ["c", "x", "a", "b"]]
+
+    ordered = order_by_ranking(transcripts, ["a", "b", "c"])
+
+    assert [tr["stable_id"] for tr in ordered] == ["a", "b", "c", "x"]
@@ -12,6 +12,10 @@
    limitations under the License.
 """
 
+import heapq
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Mapping
+
 # Sorting logic shamelessly stolen from:
 # https://github.com/Ensembl/ensembl-dauphin-style-compiler/blob/master/backend-server/app/data/v16/gene/transcriptorder.py
 
@@ -47,12 +51,13 @@ def _transcript_value(transcript):
     is_canonical = canonical_meta is not None
     mane_meta = transcript_metadata.get("mane", {})
     is_mane_select = (
-        isinstance(mane_meta, dict) and mane_meta.get("value", "").lower() == "select"
+        isinstance(mane_meta, Mapping)
+        and mane_meta.get("value", "").lower() == "select"
     )
 
     if is_canonical or is_mane_select:
         designation_value = 2
-    elif isinstance(mane_meta, dict) and mane_meta.get("value"):
+    elif isinstance(mane_meta, Mapping) and mane_meta.get("value"):
         designation_value = 1
     else:
         designation_value = 0
@@ -163,6 +168,64 @@ def sort_gene_transcripts(transcripts):
     return sorted(transcripts, key=_transcript_value, reverse=True)
 
 
+def top_gene_transcripts(transcripts, count):
+    """The first ``count`` transcripts of ``sort_gene_transcripts``.
+
+    Only ``count`` transcripts are kept in a heap rather than all of them
+    sorted, so the first page of a gene with hundreds of transcripts does not
+    pay for ranking the rest.
+
+    Args:
+        transcripts (list of dict): The transcripts of a single gene.
+        count (int): The number of transcripts wanted.
+
+    Returns:
+        list of dict: The same transcripts as ``sort_gene_transcripts(transcripts)[:count]``.
+    """
+    transcripts = list(transcripts)
+    if not transcripts or count <= 0:
+        return []
+
+    if transcripts[0].get("display_rank") is not None:
+        return heapq.nsmallest(count, transcripts, key=lambda x: x["display_rank"])
+    return heapq.nlargest(count, transcripts, key=_transcript_value)
+
+
+def rank_transcripts_by_gene(
+    transcripts: Iterable[Mapping], gene_key: str = "gene_foreign_key"
+) -> Dict[Any, List[str]]:
+    """Rank the transcripts of many genes in one pass.
+
+    Args:
+        transcripts: The transcripts of any number of genes, with the fields
+            ``sort_gene_transcripts`` reads and ``gene_key``.
+        gene_key: The field grouping the transcripts by gene.
+
+    Returns:
+        dict: The stable ids of the transcripts of each gene, in the order of
+        ``sort_gene_transcripts``.
+    """
+    by_gene = defaultdict(list)
+    for transcript in transcripts:
+        by_gene[transcript[gene_key]].append(transcript)
+    return {
+        gene: [transcript["stable_id"] for transcript in sort_gene_transcripts(group)]
+        for gene, group in by_gene.items()
+    }
+
+
+def order_by_ranking(transcripts: Iterable[Mapping], ranking: List[str]) -> List:
+    """Put transcripts in the order of a ranking of their stable ids.
+
+    Transcripts missing from the ranking come last.
+    """
+    positions = {stable_id: position for position, stable_id in enumerate(ranking)}
+    return sorted(
+        transcripts,
+        key=lambda transcript: positions.get(transcript.get("stable_id"), len(ranking)),
+    )
+
+
 """ 
 The code below is kept for debugging purposes
 Usage:
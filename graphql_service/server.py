@@ -38,6 +38,7 @@ from graphql import print_schema
 from dotenv import load_dotenv
 from common import crossrefs, db, extensions, utils, logger
 from grpc_service import grpc_model, async_grpc_model
+from graphql_service.resolver import columnar, data_loaders
 from graphql_service.ariadne_app import (
     prepare_executable_schema,
     prepare_context_provider,
@@ -205,9 +206,11 @@ class CustomExplorerGraphiQL(
 # https://starlette.dev/lifespan/
 @asynccontextmanager
 async def lifespan(_app):
+    MONGO_DB_CLIENT.start_background_tasks()
     try:
         yield
     finally:
+        await data_loaders.flush_cache_writes()
         await MONGO_DB_CLIENT.close()
         await ASYNC_GRPC_CLIENT.close()
         GRPC_SERVER.close()
@@ -243,6 +246,14 @@ def sdl_endpoint(request) -> Response:
 # Dedicated read-only route for schema introspection via SDL text (separate from `/graphql`).
 APP.add_route("/sdl", sdl_endpoint, methods=["GET"])
 
+# Features of a slice as typed-array columns for genome browsers, see
+# graphql_service.resolver.columnar
+APP.add_route(
+    "/features",
+    columnar.features_endpoint(MONGO_DB_CLIENT, ASYNC_GRPC_MODEL),
+    methods=["GET"],
+)
+
 APP.mount(
     "/",
     GraphQL(
@@ -1,3 +1,5 @@
+import fnmatch
+
 import mongomock_motor
 
 
@@ -7,6 +9,99 @@ class FakeAsyncMongoDbClient:
         self.mongo_db = self.async_mongo_client.db
         self.redis_cache_enabled = False
 
-    async def get_async_database_conn(self, _grpc_model, _uuid):
+    async def get_async_database_conn(self, _grpc_model, _uuid, _release_version=None):
         # we pretend that we did a gRPC call and got the chosen db
         return self.async_mongo_client["db"]
+
+    async def get_async_database_conns(self, _grpc_model, uuids):
+        return [self.async_mongo_client["db"] for _ in uuids]
+
+
+class FakeAsyncRedis:
+    """
+    Minimal dict backed stand-in for redis.asyncio.Redis
+    """
+
+    def __init__(self):
+        self.store = {}
+        self.expiries = {}
+        self.pipelines_executed = 0
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def mget(self, keys):
+        return [self.store.get(key) for key in keys]
+
+    async def set(self, key, value, **options):
+        if options.get("nx") and key in self.store:
+            return None
+        if not isinstance(value, bytes):
+            value = str(value).encode("utf-8")
+        self.store[key] = value
+        self.expiries[key] = options.get("ex")
+        return True
+
+    async def mset(self, mapping):
+        for key, value in mapping.items():
+            await self.set(key, value)
+        return True
+
+    async def delete(self, *keys):
+        return sum(1 for key in keys if self.store.pop(key, None) is not None)
+
+    async def unlink(self, *keys):
+        return await self.delete(*keys)
+
+    async def hset(self, name, key, value):
+        self.store.setdefault(name, {})[key.encode("utf-8")] = value.encode("utf-8")
+        return 1
+
+    async def hgetall(self, name):
+        return dict(self.store.get(name, {}))
+
+    async def hlen(self, name):
+        return len(self.store.get(name, {}))
+
+    async def hdel(self, name, *keys):
+        fields = self.store.get(name, {})
+        return sum(1 for key in keys if fields.pop(key, None) is not None)
+
+    async def hscan_iter(self, name, count=None):  # pylint: disable=unused-argument
+        for item in list(self.store.get(name, {}).items()):
+            yield item
+
+    async def exists(self, *keys):
+        return sum(1 for key in keys if key in self.store)
+
+    async def expire(self, name, _seconds):
+        return name in self.store
+
+    async def scan_iter(self, match="*", count=None):  # pylint: disable=unused-argument
+        for key in list(self.store):
+            if fnmatch.fnmatchcase(key, match):
+                yield key
+
+    def pipeline(self, transaction=True):
+        return FakeAsyncRedisPipeline(self)
+
+
+class FakeAsyncRedisPipeline:
+    "Queues commands of FakeAsyncRedis and runs them on execute()"
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.commands = []
+
+    def __getattr__(self, name):
+        command = getattr(self.redis_client, name)
+
+        def queue(*args, **kwargs):
+            self.commands.append(command(*args, **kwargs))
+            return self
+
+        return queue
+
+    async def execute(self):
+        self.redis_client.pipelines_executed += 1
+        return [await command for command in self.commands]
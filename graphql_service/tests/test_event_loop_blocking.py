@@ -0,0 +1,162 @@
+"""
+.. See the NOTICE file distributed with this work for additional information
+   regarding copyright ownership.
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+       http://www.apache.org/licenses/LICENSE-2.0
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from ariadne import graphql
+
+from common.crossrefs import XrefResolver
+from graphql_service.ariadne_app import prepare_executable_schema
+from graphql_service.tests.snapshot_utils import prepare_mongo_instance
+from graphql_service.tests.test_db_client import FakeAsyncRedis
+
+GENOME_ID = "homo_sapiens_GCA_000001405_28"
+
+
+class SyncDriverTripwire:  # pylint: disable=too-few-public-methods
+    """
+    Stands in for a synchronous pymongo/redis/gRPC handle. Any use of it from
+    a resolver means the event loop would have been blocked on network I/O.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        raise AssertionError(
+            f"Synchronous {self.name}.{attr} called inside the running event loop"
+        )
+
+
+class FakeAsyncGrpcModel:
+    async def get_genome_by_genome_uuid(self, genome_uuid, _release_version=None):
+        return SimpleNamespace(
+            genome_uuid=genome_uuid,
+            url_name="grch38",
+            assembly=SimpleNamespace(
+                accession="GCA_000001405.28",
+                assembly_uuid="GRCh38.p13",
+                is_reference=True,
+            ),
+            organism=SimpleNamespace(
+                scientific_name="Homo sapiens",
+                tol_id=None,
+                scientific_parlance_name="Human",
+            ),
+            release=SimpleNamespace(release_version=110.1, release_date="2023-01-01"),
+            taxon=SimpleNamespace(taxonomy_id=9606),
+        )
+
+    async def get_datasets_list_by_uuid(self, _genome_uuid, _release_version=None):
+        return SimpleNamespace(datasets=[])
+
+
+def async_only_context():
+    mongo_client = prepare_mongo_instance()
+    # Only the async handles are left usable
+    mongo_client.get_database_conn = SyncDriverTripwire("MongoDbClient")
+    mongo_client.mongo_client = SyncDriverTripwire("pymongo")
+    mongo_client.cache = SyncDriverTripwire("redis")
+    mongo_client.redis_cache_enabled = True
+    mongo_client.redis_expiry = 60
+    mongo_client.async_cache = FakeAsyncRedis()
+
+    return {
+        "mongo_db_client": mongo_client,
+        "XrefResolver": XrefResolver(from_file="common/tests/mini_identifiers.json"),
+        "grpc_model": SyncDriverTripwire("grpc"),
+        "async_grpc_model": FakeAsyncGrpcModel(),
+    }
+
+
+QUERIES = {
+    "gene": f"""{{
+      gene(by_id: {{ genome_id: "{GENOME_ID}", stable_id: "ENSG00000139618.15" }}) {{
+        stable_id
+        transcripts {{ stable_id gene {{ stable_id }} }}
+        transcripts_page(page: 1, per_page: 1) {{
+          transcripts {{ stable_id }}
+          page_metadata {{ total_count }}
+        }}
+        slice {{
+          region {{
+            name
+            assembly {{ name organism {{ scientific_name species {{ scientific_name }} }} }}
+          }}
+        }}
+      }}
+    }}""",
+    "genes": f"""{{
+      genes(by_symbol: {{ genome_id: "{GENOME_ID}", symbol: "BRCA2" }}) {{ stable_id }}
+    }}""",
+    "transcript": f"""{{
+      transcript(by_id: {{ genome_id: "{GENOME_ID}", stable_id: "ENST00000380152.7" }}) {{
+        stable_id
+        gene {{ stable_id }}
+        product_generating_contexts {{ product {{ stable_id }} }}
+      }}
+    }}""",
+    "product": f"""{{
+      product(by_id: {{ genome_id: "{GENOME_ID}", stable_id: "ENSP00000369497.3" }}) {{
+        stable_id
+      }}
+    }}""",
+    "region": f"""{{
+      region(by_name: {{ genome_id: "{GENOME_ID}", name: "13" }}) {{
+        name
+        assembly {{ name }}
+      }}
+    }}""",
+    "overlap_region": f"""{{
+      overlap_region(by_slice: {{
+        genome_id: "{GENOME_ID}", region_name: "13", start: 32315086, end: 32400266
+      }}) {{
+        genes {{ stable_id }}
+        transcripts {{ stable_id }}
+      }}
+    }}""",
+    "transcript_search": f"""{{
+      transcript_search(search_payload: {{
+        query: "ENST00000380152.7", genome_ids: ["{GENOME_ID}"], page: 1, per_page: 10
+      }}) {{
+        meta {{ total_hits }}
+        matches {{ stable_id gene {{ stable_id }} }}
+      }}
+    }}""",
+    "genome": f"""{{
+      genome(by_genome_id: {{ genome_id: "{GENOME_ID}" }}) {{
+        genome_id
+        assembly {{ name }}
+        dataset {{ name }}
+      }}
+    }}""",
+}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("query_name", sorted(QUERIES))
+async def test_resolvers_do_not_use_sync_drivers(query_name):
+    "Every root query must be served by the async Mongo, Redis and gRPC clients only"
+    executable_schema = prepare_executable_schema()
+
+    success, result = await graphql(
+        executable_schema,
+        {"query": QUERIES[query_name]},
+        context_value=async_only_context(),
+    )
+
+    assert success
+    assert "errors" not in result, result.get("errors")
+    assert result["data"][query_name]
@@ -14,6 +14,8 @@
 import pytest
 from ariadne import graphql
 
+from graphql_service.resolver import gene_model
+from graphql_service.resolver.data_loaders import BatchLoaders
 from .snapshot_utils import setup_test
 
 executable_schema, context = setup_test()
@@ -79,3 +81,229 @@ async def test_slice_retrieval_by_slice_input(snapshot):
     )
     assert success
     snapshot.assert_match(result["data"])
+
+
+@pytest.mark.asyncio
+async def test_slice_retrieval_pages():
+    "Paging through a locus returns the features of the complete lists"
+
+    query = """query ($after: String) {
+      overlap_region(
+          by_slice: {
+              genome_id: "homo_sapiens_GCA_000001405_28",
+              region_name: "13",
+              start: 32315086,
+              end: 32400266
+          }
+      )
+      {
+        transcripts {
+          stable_id
+        }
+        transcripts_page(first: 1, after: $after) {
+          transcripts {
+            stable_id
+          }
+          page_info {
+            end_cursor
+            has_next_page
+          }
+        }
+      }
+    }"""
+
+    paged = []
+    after = None
+    while True:
+        query_data = {"query": query, "variables": {"after": after}}
+        (success, result) = await graphql(
+            executable_schema, query_data, context_value=context()
+        )
+        assert success
+        locus = result["data"]["overlap_region"]
+        page = locus["transcripts_page"]
+        paged.extend(transcript["stable_id"] for transcript in page["transcripts"])
+        if not page["page_info"]["has_next_page"]:
+            break
+        after = page["page_info"]["end_cursor"]
+
+    assert len(paged) > 1
+    assert sorted(paged) == sorted(
+        transcript["stable_id"] for transcript in locus["transcripts"]
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "start,expected_fetches",
+    [
+        # BRCA2 lies in the locus: its transcripts are primed from the locus
+        (32315086, ["Transcript"]),
+        # BRCA2 sticks out, some of its transcripts could be missing
+        (32315474, ["Transcript", "transcript_loader"]),
+    ],
+)
+async def test_locus_transcripts_prime_gene_transcripts(
+    start, expected_fetches, monkeypatch
+):
+    "The genes' transcripts come from the locus transcripts when complete"
+
+    fetches = []
+    find_overlapping = gene_model.find_overlapping
+    load_by_foreign_key = BatchLoaders.load_by_foreign_key
+
+    async def spy_find_overlapping(info, locus, feature_type, projection=None):
+        if feature_type == "Transcript":
+            fetches.append(feature_type)
+        return await find_overlapping(info, locus, feature_type, projection)
+
+    async def spy_load_by_foreign_key(self, doc_type, *args, **kwargs):
+        if doc_type == "transcript":
+            fetches.append("transcript_loader")
+        return await load_by_foreign_key(self, doc_type, *args, **kwargs)
+
+    monkeypatch.setattr(gene_model, "find_overlapping", spy_find_overlapping)
+    monkeypatch.setattr(BatchLoaders, "load_by_foreign_key", spy_load_by_foreign_key)
+
+    query = """query ($start: Int!) {
+      overlap_region(
+          by_slice: {
+              genome_id: "homo_sapiens_GCA_000001405_28",
+              region_name: "13",
+              start: $start,
+              end: 32400266
+          }
+      )
+      {
+        genes {
+          stable_id
+          transcripts {
+            stable_id
+            symbol
+          }
+        }
+        transcripts {
+          stable_id
+        }
+      }
+    }"""
+
+    query_data = {"query": query, "variables": {"start": start}}
+    (success, result) = await graphql(
+        executable_schema, query_data, context_value=context()
+    )
+    assert success
+    assert fetches == expected_fetches
+    (gene,) = result["data"]["overlap_region"]["genes"]
+    assert {transcript["stable_id"] for transcript in gene["transcripts"]} == {
+        "ENST00000380152.7",
+        "ENST00000528762.1",
+    }
+    assert all(transcript["symbol"] for transcript in gene["transcripts"])
+
+
+@pytest.mark.asyncio
+async def test_aliased_locus_transcripts_share_one_fetch(monkeypatch):
+    "Aliases of `transcripts` next to `genes { transcripts }` fetch them once"
+
+    fetches = []
+    find_overlapping = gene_model.find_overlapping
+
+    async def spy_find_overlapping(info, locus, feature_type, projection=None):
+        if feature_type == "Transcript":
+            fetches.append(projection)
+        return await find_overlapping(info, locus, feature_type, projection)
+
+    monkeypatch.setattr(gene_model, "find_overlapping", spy_find_overlapping)
+
+    query = """{
+      overlap_region(
+          by_slice: {
+              genome_id: "homo_sapiens_GCA_000001405_28",
+              region_name: "13",
+              start: 32315086,
+              end: 32400266
+          }
+      )
+      {
+        genes {
+          transcripts {
+            stable_id
+          }
+        }
+        a: transcripts {
+          stable_id
+        }
+        b: transcripts {
+          symbol
+        }
+      }
+    }"""
+
+    (success, result) = await graphql(
+        executable_schema, {"query": query}, context_value=context()
+    )
+    assert success
+    assert "errors" not in result
+    locus = result["data"]["overlap_region"]
+    assert len(fetches) == 1
+    assert "stable_id" in fetches[0] and "symbol" in fetches[0]
+    assert len(locus["a"]) == len(locus["b"]) > 1
+    assert all(transcript["symbol"] for transcript in locus["b"])
+    (gene,) = locus["genes"]
+    assert gene["transcripts"]
+
+
+@pytest.mark.asyncio
+async def test_overlap_regions():
+    "Each slice gets the features of its own window, as overlap_region would"
+
+    windows = [(32315086, 32400266), (32315474, 32315500), (1, 1000)]
+    query = """query ($slices: [SliceInput!]!) {
+      overlap_regions(slices: $slices) {
+        genes {
+          stable_id
+          transcripts {
+            stable_id
+          }
+        }
+        transcripts {
+          stable_id
+        }
+      }
+    }"""
+    slices = [
+        {
+            "genome_id": "homo_sapiens_GCA_000001405_28",
+            "region_name": "13",
+            "start": start,
+            "end": end,
+        }
+        for start, end in windows
+    ]
+    (success, result) = await graphql(
+        executable_schema,
+        {"query": query, "variables": {"slices": slices}},
+        context_value=context(),
+    )
+    assert success
+    assert "errors" not in result
+
+    for by_slice, locus in zip(slices, result["data"]["overlap_regions"]):
+        (success, single) = await graphql(
+            executable_schema,
+            {
+                "query": """query ($by_slice: SliceInput) {
+                  overlap_region(by_slice: $by_slice) {
+                    genes { stable_id transcripts { stable_id } }
+                    transcripts { stable_id }
+                  }
+                }""",
+                "variables": {"by_slice": by_slice},
+            },
+            context_value=context(),
+        )
+        assert success
+        assert locus == single["data"]["overlap_region"]
+    assert result["data"]["overlap_regions"][1]["genes"]
+    assert not result["data"]["overlap_regions"][2]["genes"]
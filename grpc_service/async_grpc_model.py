@@ -9,6 +9,54 @@ class AsyncGrpcModel:
         self.grpc_stub = grpc_stub
         self.reflector = grpc_reflector
 
+    def _build_request(self, rpc_name, message_name, **fields):
+        logger.debug("Received RPC for %s with %s", rpc_name, fields)
+        request_class = self.reflector.message_class(f"ensembl_metadata.{message_name}")
+        return request_class(**fields)
+
+    async def get_genome_by_genome_uuid(self, genome_uuid, release_version=None):
+        request = self._build_request(
+            "GetGenomeByUUID",
+            "GenomeUUIDRequest",
+            genome_uuid=genome_uuid,
+            release_version=release_version,
+        )
+        return await self.grpc_stub.GetGenomeByUUID(request)
+
+    async def get_genome_by_specific_keyword(self, **keywords):
+        """
+        Accepts the same keywords as GRPC_MODEL.get_genome_by_specific_keyword
+        (tolid, assembly_accession_id, ..., release_version)
+        """
+        request = self._build_request(
+            "GetGenomesBySpecificKeyword", "GenomeBySpecificKeywordRequest", **keywords
+        )
+        # This RPC streams genomes back, collect them all for the resolver
+        return [
+            genome
+            async for genome in self.grpc_stub.GetGenomesBySpecificKeyword(request)
+        ]
+
+    async def get_genome_by_release_version(self, release_version=None):
+        request = self._build_request(
+            "GetGenomesByReleaseVersion",
+            "GenomeByReleaseVersionRequest",
+            release_version=release_version,
+        )
+        return [
+            genome
+            async for genome in self.grpc_stub.GetGenomesByReleaseVersion(request)
+        ]
+
+    async def get_datasets_list_by_uuid(self, genome_uuid, release_version=None):
+        request = self._build_request(
+            "GetDatasetsListByUUID",
+            "DatasetsRequest",
+            genome_uuid=genome_uuid,
+            release_version=release_version,
+        )
+        return await self.grpc_stub.GetDatasetsListByUUID(request)
+
     async def get_release_by_genome_uuid(self, genome_uuid):
         request_class = self.reflector.message_class(
             "ensembl_metadata.ReleaseVersionRequest"